@@ -9,6 +9,7 @@ parser.add_argument('--a2', default=False, action='store_true', help="Run evo_tr
 parser.add_argument('--a3', default=False, action='store_true', help="Run predictivity")
 parser.add_argument('--a4', default=False, action='store_true', help="Run predictivity with mutation and steps")
 parser.add_argument('--a5', default=False, action='store_true', help="Founders analysis")
+parser.add_argument('--array', default=False, action='store_true', help="Use the array-backed models")
 
 
 args = parser.parse_args()
@@ -37,12 +38,12 @@ short_tradeoff_params = {'bacteria_per_step': 10,
                          'shape' : [0,1,2]}
 
 a0 = Analysis("short_tradeoff",
-              STimeseriesRunner("TradeOffSpikeIn"),
+              STimeseriesRunner("TradeOffSpikeIn", array_engine=args.array),
               short_tradeoff_params,
               200, 1, 1, args.repo)
 
 a1 = Analysis("short_tradeoff",
-              STimeseriesRunner("TradeOffSpikeIn"),
+              STimeseriesRunner("TradeOffSpikeIn", array_engine=args.array),
               short_tradeoff_params,
               200, 10, 3, args.repo)
 
@@ -64,7 +65,7 @@ evolve_params['re_degrade_foreign_1'] = [0.999,0.99,0]
 evolve_params['epi_inheritance'] = [-2,-1,1,0.5,0.25,0.1]
 
 a2 = Analysis("evo_trade",
-              SBatchRunner("TradeOff"),
+              SBatchRunner("TradeOff", array_engine=args.array),
               evolve_params, 200, 10,  1, args.repo)
 
 if args.a2:
@@ -84,7 +85,7 @@ predict_params['fraction_b_m1'] = [0.1,0.5,0.9]
 del predict_params['shape']
 
 a3 = Analysis("predictivity",
-              STimeseriesRunner("SpikeIn"),
+              STimeseriesRunner("SpikeIn", array_engine=args.array),
               predict_params, 200, 10,  3, args.repo)
 
 if args.a3:
@@ -96,7 +97,8 @@ predict_with_mut_and_steps_params = short_tradeoff_params.copy()
 predict_with_mut_and_steps_params['phage_mutation_freq'] = [0.01, 0.1]
 
 a4 = Analysis("predict_with_mut_and_steps",
-              STimeseriesRunner("TradeOffSpikeIn", time="25:00", mem=2000),
+              STimeseriesRunner("TradeOffSpikeIn", time="25:00", mem=2000,
+                                array_engine=args.array),
               predict_with_mut_and_steps_params , [100,200,400,500], 10, 3,
               args.repo)
 
@@ -117,7 +119,8 @@ founders_params['re_degrade_foreign_0'] = [0.999, 0]
 founders_params['re_degrade_foreign_1'] = [0.999, 0]
 
 a5 = Analysis("founders",
-              STimeseriesRunner("TradeOff", agent_aggregator="helper_functions.founders_analysis"),
+              STimeseriesRunner("TradeOff", agent_aggregator="aggregators.FoundersAggregator()",
+                                array_engine=args.array),
               founders_params, 200, 10, 10, args.repo)
 
 if args.a5:
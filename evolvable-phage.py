@@ -1,7 +1,8 @@
 from rm_abm.rm_abm import *
 from rm_abm import evolvable, helper_functions, timeseries_runner
 from rm_abm import hdf_functions
-from mesa.batchrunner import BatchRunner
+from rm_abm.batch_runner import ColumnarBatchRunner
+from functools import partial
 
 parameters = {"phage_off_diagonal": [0.05, 0.5],
               "fraction_b_m1" : [0.1,0.5,0.9],
@@ -14,22 +15,22 @@ parameters = {"phage_off_diagonal": [0.05, 0.5],
 
 
 
-batch_run = BatchRunner(BaseModel, 
-                        parameters, 
-                        iterations=10, 
-                        max_steps=200,
-                        agent_reporters = {
-                                "breed" : lambda a : a.breed,
-                                "methylation" : lambda a: a.methylation,
-                                "genotype" : lambda a: a.genotype,
-                                "affinity_0" : helper_functions.get_affinity(0),
-                                "affinity_1" : helper_functions.get_affinity(1)},
-                       model_reporters={
-                                "phage" : lambda m : m.schedule.get_breed_count(Phage),
-                                "bacteria" : lambda m : m.schedule.get_breed_count(Bacteria),
-                                "bacteria_meth_1" : lambda m: get_breed_filtered_count(Bacteria,by_methylation(1))(m),
-                                "phage_meth_1" : lambda m: get_breed_filtered_count(Phage,by_methylation(1))(m),
-                                "avg_affinity" : helper_functions.avg_phage_affinity
+batch_run = ColumnarBatchRunner(partial(BaseModel, collection_policy="off"), # only the end is used
+                                parameters, 
+                                iterations=10, 
+                                max_steps=200,
+                                agent_reporters = {
+                                        "breed" : lambda a : a.breed,
+                                        "methylation" : lambda a: a.methylation,
+                                        "genotype" : lambda a: a.genotype,
+                                        "affinity_0" : helper_functions.get_affinity(0),
+                                        "affinity_1" : helper_functions.get_affinity(1)},
+                               model_reporters={
+                                        "phage" : lambda m : m.schedule.get_breed_count(Phage),
+                                        "bacteria" : lambda m : m.schedule.get_breed_count(Bacteria),
+                                        "bacteria_meth_1" : lambda m: get_breed_filtered_count(Bacteria,by_methylation(1))(m),
+                                        "phage_meth_1" : lambda m: get_breed_filtered_count(Phage,by_methylation(1))(m),
+                                        "avg_affinity" : helper_functions.avg_phage_affinity
         })
 
 batch_run.run_all()
@@ -0,0 +1,132 @@
+'''
+Runs each parameter point only as many times as it takes to know chosen
+outputs to a given precision.
+
+The runs are made in rounds. After each round, a parameter point gets
+more iterations only if the confidence interval of the mean of one of
+the outputs is still wider than its target, and it has had fewer than
+max_iterations. Quiet corners of the parameter grid stop early, noisy
+ones get more runs.
+'''
+import numpy as np
+from scipy import stats
+
+from .timeseries_aggregator import TimeseriesRunner
+from .parallel import run_in_pool
+
+
+def half_width(values, confidence=0.95):
+    '''Half-width of the t confidence interval of the mean of values.
+    Infinite with fewer than two (finite) values.
+
+    '''
+    values = np.asarray(values, dtype=float)
+    values = values[np.isfinite(values)]
+    n = len(values)
+    if n < 2:
+        return np.inf
+    t = stats.t.ppf((1 + confidence) / 2, n - 1)
+    return t * values.std(ddof=1) / np.sqrt(n)
+
+
+def run_value(frames, var):
+    '''The value of var in the aggregated frames of a run (a tuple
+    yielded by dataframes): the mean of its column in the agent or model
+    aggregated frame'''
+    for df in frames[3:]:
+        if df is not None and var in df:
+            values = df[var].values.astype(float)
+            values = values[np.isfinite(values)]
+            return values.mean() if len(values) > 0 else np.nan
+    raise KeyError("%s is not an aggregated variable" % var)
+
+
+class AdaptiveTimeseriesRunner(TimeseriesRunner):
+    '''A TimeseriesRunner that runs each parameter point until the
+    aggregated variables in precision are known well enough.
+
+    '''
+
+    def __init__(self, model_class, parameters, max_steps, iterations,
+                 precision, max_iterations, confidence=0.95,
+                 round_iterations=None, **kwargs):
+        '''
+        Args:
+        iterations (int): runs of each parameter point in the first
+            round (at least 2)
+        precision (dict): aggregated variable -> largest half-width of
+            the confidence interval of its mean across iterations. The
+            variables are columns of the agent or model aggregated frames
+        max_iterations (int): most runs of a parameter point
+        confidence (float): level of the confidence intervals
+        round_iterations (int): runs added to an unfinished point in
+            each later round, by default iterations
+        Other arguments as TimeseriesRunner.
+        '''
+        TimeseriesRunner.__init__(self, model_class, parameters, max_steps,
+                                  max(iterations, 2), **kwargs)
+        self.precision = precision
+        self.max_iterations = max_iterations
+        self.confidence = confidence
+        self.round_iterations = round_iterations or self.iterations
+        # runs and values of the precision variables at each point
+        self.counts = [0] * len(self.parameters)
+        self.values = [{var : [] for var in precision}
+                       for _ in self.parameters]
+
+    def point_tasks(self, point, n, aggregated_only):
+        '''Tasks for n more runs of a parameter point. Runs are numbered
+        so that they don't depend on the rounds.
+
+        '''
+        kwargs = self.parameters[point]
+        start = self.counts[point]
+        for iteration in range(start, start + n):
+            key = [point * self.max_iterations + iteration, iteration] +\
+                  [kwargs[i] for i in self.param_keys]
+            yield point, key, kwargs, aggregated_only
+
+    def run_point_task(self, task):
+        point, key, kwargs, aggregated_only = task
+        return point, self.run_task((key, kwargs, aggregated_only))
+
+    def half_widths(self, point):
+        return {var : half_width(values, self.confidence)
+                for var, values in self.values[point].items()}
+
+    def finished(self, point):
+        if self.counts[point] >= self.max_iterations:
+            return True
+        widths = self.half_widths(point)
+        return all(widths[var] <= target
+                   for var, target in self.precision.items())
+
+    def dataframes(self, workers=None, chunksize=1, ordered=True,
+                   aggregated_only=False):
+        '''As TimeseriesRunner.dataframes, round by round. A round runs
+        every unfinished parameter point in parallel if workers is given.
+
+        '''
+        self.counts = [0] * len(self.parameters)
+        self.values = [{var : [] for var in self.precision}
+                       for _ in self.parameters]
+        pending = list(range(len(self.parameters)))
+        n = self.iterations
+        while pending:
+            tasks = []
+            for point in pending:
+                n_point = min(n, self.max_iterations - self.counts[point])
+                tasks += list(self.point_tasks(point, n_point,
+                                               aggregated_only))
+                self.counts[point] += n_point
+            if workers is None:
+                results = map(self.run_point_task, tasks)
+            else:
+                results = run_in_pool(self, "run_point_task", tasks, workers,
+                                      chunksize, ordered)
+            for point, frames in results:
+                for var in self.precision:
+                    self.values[point][var].append(run_value(frames, var))
+                yield frames
+            pending = [point for point in pending if not self.finished(point)]
+            n = self.round_iterations
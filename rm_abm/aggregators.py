@@ -0,0 +1,253 @@
+'''
+Agent aggregators that TimeseriesRunner feeds step by step as a run
+goes, rather than with the whole agent data frame at the end.
+
+An aggregator has three methods:
+
+init(columns)         called at the start of a run with the names of
+                      the agent columns (Step, AgentID and the agent
+                      reporters)
+update(batch)         called at each collected step with that step's
+                      record batch, a dict of column -> array
+finalize(key_names, key)  called at the end of the run. Returns the
+                      aggregated data frame; key_names and key are the
+                      Run, Iteration and parameter columns
+
+The runner gives every run a fresh copy of its aggregator. The copy is
+saved with the model, so checkpointed and forked runs carry on from the
+aggregator's state. An aggregator only holds what it needs, so the
+memory of a run no longer grows as steps x agents.
+
+DescendentsAggregator and FoundersAggregator give what
+helper_functions.get_manipulated_descendents and founders_analysis give
+from the whole agent data frame (they need the columns of
+parameters.agent_reporters). Pass them to the runner instead of those
+functions to keep the memory of a run bounded. Functions of the agent
+data frame, those two included, are run by DataFrameAggregator, which
+holds the whole history.
+'''
+from abc import ABCMeta, abstractmethod
+
+import numpy as np
+import pandas as pd
+
+from .datacollection import batch_to_df
+from .lineage import LINEAGE_VARIABLES, SPIKE_IN_LINEAGE
+from .online_stats import RunningStats
+
+
+class AgentAggregator(metaclass=ABCMeta):
+    '''Base class of aggregators, see above. Subclasses implement
+    finalize, and update unless they only need the columns.'''
+
+    def init(self, columns):
+        self.columns = list(columns)
+
+    def update(self, batch):
+        pass
+
+    @abstractmethod
+    def finalize(self, key_names, key):
+        '''The aggregated data frame of the run'''
+
+    def restore(self, prototype):
+        '''Put back what was left out when the aggregator was pickled,
+        from the runner's prototype'''
+        pass
+
+    def to_df(self, batches, key_names, key):
+        '''A data frame of record batches, as TimeseriesRunner builds'''
+        if len(batches) == 0:
+            return pd.DataFrame(columns=list(key_names) + self.columns)
+        return pd.concat([batch_to_df(batch, key_names, key, self.columns)
+                          for batch in batches], ignore_index=True)
+
+
+class DataFrameAggregator(AgentAggregator):
+    '''Adapts any other function of the whole agent data frame. It has
+    to keep every batch until the end of the run, so the memory of a
+    run grows as steps x agents again.
+
+    '''
+
+    def __init__(self, function):
+        self.function = function
+
+    def init(self, columns):
+        AgentAggregator.init(self, columns)
+        self.batches = []
+
+    def update(self, batch):
+        self.batches.append(batch)
+
+    def finalize(self, key_names, key):
+        return self.function(self.to_df(self.batches, key_names, key))
+
+    def __getstate__(self):
+        '''The function is left out, as it may be a lambda'''
+        state = dict(self.__dict__)
+        state["function"] = None
+        return state
+
+    def restore(self, prototype):
+        self.function = prototype.function
+
+
+def as_float(values):
+    '''A column of a batch as floats, None as nan'''
+    return np.asarray(pd.to_numeric(values), dtype=float)
+
+
+def select(batch, rows):
+    return {col : values[rows] for col, values in batch.items()}
+
+
+def concatenate(batches):
+    return {col : np.concatenate([batch[col] for batch in batches])
+            for col in batches[0]}
+
+
+def mean_std(values):
+    '''Mean and std (ddof=0) of values, without nans'''
+    values = values[~np.isnan(values)]
+    if len(values) == 0:
+        return np.nan, np.nan
+    return values.mean(), values.std()
+
+
+class DescendentsAggregator(AgentAggregator):
+    '''helper_functions.get_manipulated_descendents, fed step by step.
+
+    Keeps the IDs of the phage descended from root (the parent of the
+    spike-ins), RunningStats of their affinities by last_infected and
+    the counts of the last step, instead of the agent data.
+    '''
+
+    def __init__(self, root=SPIKE_IN_LINEAGE):
+        self.root = root
+
+    def init(self, columns):
+        AgentAggregator.init(self, columns)
+        self.lineage = np.array([self.root], dtype=float) # sorted
+        # affinity of the lineage for genotype k, by last_infected g
+        self.affinity = [[RunningStats(), RunningStats()] for g in [0, 1]]
+        self.last = {"descendents" : 0, "descendents_in_0" : 0,
+                     "n_phage" : 0, "n_phage_in_0" : 0,
+                     "population_affinity_0" : np.nan,
+                     "population_affinity_1" : np.nan,
+                     "population_affinity_0_std" : np.nan,
+                     "population_affinity_1_std" : np.nan}
+
+    def update(self, batch):
+        ids = batch["AgentID"]
+        phage = batch["breed"] == "Phage"
+        # add the children of the lineage, until there are no new ones
+        # (a parent may be in the same batch as its children)
+        while True:
+            children = ids[phage & np.isin(batch["parent"], self.lineage)]
+            new = np.setdiff1d(children, self.lineage)
+            if len(new) == 0:
+                break
+            self.lineage = np.union1d(self.lineage, new)
+        in_lineage = phage & np.isin(ids, self.lineage)
+        last_infected = as_float(batch["last_infected"])
+        in_0 = last_infected == 0
+        for g in [0, 1]:
+            rows = in_lineage & (last_infected == g)
+            for k in [0, 1]:
+                values = batch["affinity_%i" % k][rows].astype(float)
+                self.affinity[g][k].update(values[~np.isnan(values)])
+        self.last = {"descendents" : int(in_lineage.sum()),
+                     "descendents_in_0" : int((in_lineage & in_0).sum()),
+                     "n_phage" : len(ids),
+                     "n_phage_in_0" : int(in_0.sum())}
+        for k in [0, 1]:
+            mean, std = mean_std(batch["affinity_%i" % k].astype(float))
+            self.last["population_affinity_%i" % k] = mean
+            self.last["population_affinity_%i_std" % k] = std
+
+    def finalize(self, key_names, key):
+        values = dict(self.last)
+        for g in [0, 1]:
+            for k in [0, 1]:
+                stats = self.affinity[g][k]
+                values["affinity_in_%i_for_%i" % (g, k)] =\
+                    stats.mean if stats.n > 0 else np.nan
+        return pd.DataFrame({var : [values[var]] for var in LINEAGE_VARIABLES})
+
+
+class FoundersAggregator(AgentAggregator):
+    '''helper_functions.founders_analysis, fed step by step.
+
+    Keeps the affinity summaries of each step, and until the first
+    phage to infect genotype has been seen, the last rows of the phage
+    that have left the data and are still inside a bacterium (any of
+    them may burst into that first phage). Then only the founders' rows
+    are kept.
+    '''
+
+    def __init__(self, genotype=0):
+        self.genotype = genotype
+
+    def init(self, columns):
+        AgentAggregator.init(self, columns)
+        self.steps = [] # Step, mean, std, median, max, min
+        self.previous = None # the phage of the last batch
+        self.inside = None # their last rows, once they have left
+        self.founders = None
+
+    def update(self, batch):
+        if len(batch["Step"]) == 0:
+            return
+        phage = batch["breed"] == "Phage"
+        affinity = batch["affinity_0"][phage].astype(float)
+        affinity = affinity[~np.isnan(affinity)]
+        if len(affinity) > 0:
+            std = affinity.std(ddof=1) if len(affinity) > 1 else np.nan
+            self.steps.append([batch["Step"][0], affinity.mean(), std,
+                               np.median(affinity), affinity.max(),
+                               affinity.min()])
+        if self.founders is not None:
+            return
+        current = select(batch, phage)
+        if self.inside is None:
+            self.inside = select(current, np.zeros(len(current["Step"]),
+                                                   dtype=bool))
+        candidates = [self.inside]
+        if self.previous is not None:
+            left = ~np.isin(self.previous["AgentID"], current["AgentID"])
+            candidates.append(select(self.previous, left))
+        candidates = concatenate(candidates)
+        invaders = as_float(current["last_infected"]) == self.genotype
+        if invaders.any():
+            parents = np.unique(current["parent"][invaders])
+            rows = concatenate([candidates, current])
+            rows = select(rows, np.isin(rows["AgentID"], parents))
+            if len(rows["Step"]) > 0:
+                rows = select(rows, rows["Step"] == rows["Step"].max())
+            self.founders = rows
+            self.previous = self.inside = None
+            return
+        self.inside = select(candidates, np.isin(candidates["AgentID"],
+                                                 batch["infected"]))
+        self.previous = current
+
+    def finalize(self, key_names, key):
+        stats = pd.DataFrame(self.steps,
+                             columns=["Step", "pop_mean", "pop_std",
+                                      "pop_median", "pop_max", "pop_min"])
+        keys = dict(zip(key_names, key))
+        stats.insert(1, "Run", keys["Run"])
+        stats.insert(2, "Iteration", keys["Iteration"])
+        batches = [] if self.founders is None else [self.founders]
+        return pd.merge(stats, self.to_df(batches, key_names, key))
+
+
+def get_aggregator(aggregator):
+    '''An aggregator from an aggregator, a function of the agent data
+    frame (adapted by DataFrameAggregator) or None'''
+    if aggregator is None or isinstance(aggregator, AgentAggregator):
+        return aggregator
+    if hasattr(aggregator, "update") and hasattr(aggregator, "finalize"):
+        return aggregator
+    return DataFrameAggregator(aggregator)
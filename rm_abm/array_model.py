@@ -0,0 +1,578 @@
+'''
+Array-backed (struct-of-arrays) versions of the models in rm_abm.
+
+Phage and bacteria are kept in NumPy arrays rather than as one
+mesa Agent per individual, and each step is advanced with vectorized
+operations. The models take the same keyword arguments and report
+the same columns as their agent-based counterparts, so they can be
+used in place of them by the runners.
+'''
+import numpy as np
+
+from .rm_abm import (BaseModel, SpikeIn, TradeOff, TradeOffSpikeIn,
+                     Phage, Bacteria)
+from .encounter import EncounterIndex
+from .infection import resolve_infections
+from .burst import burst_progeny, NO_METHYLATION
+from .wolfsheep_schedule import ANY
+from .lineage import FOUNDING_LINEAGE, SPIKE_IN_LINEAGE
+
+NO_GENOTYPE = -1 # stands in for a last_infected of None
+
+PHAGE_FIELDS = {"unique_id" : (np.int64, ()),
+                "genotype" : (np.int8, ()),
+                "methylation" : (np.int8, ()),
+                "inactivation" : (np.int64, ()),
+                "affinity" : (np.float64, (2,)),
+                "parent" : (np.int64, ()),
+                "lineage" : (np.int64, ()),
+                "last_infected" : (np.int8, ()),
+                "dead" : (np.bool_, ())}
+
+BACTERIA_FIELDS = {"unique_id" : (np.int64, ()),
+                   "genotype" : (np.int8, ()),
+                   "methylation" : (np.int8, ()),
+                   "re_degrade_foreign" : (np.float64, ()),
+                   "established" : (np.bool_, ()),
+                   "infected" : (np.bool_, ()),
+                   # the phage infecting the cell
+                   "phage_id" : (np.int64, ()),
+                   "phage_genotype" : (np.int8, ()),
+                   "phage_methylation" : (np.int8, ()),
+                   "phage_affinity" : (np.float64, (2,)),
+                   "phage_lineage" : (np.int64, ()),
+                   "phage_last_infected" : (np.int8, ())}
+
+
+def to_methylation(code):
+    '''Convert a methylation code back to the agent representation'''
+    if code == NO_METHYLATION:
+        return None
+    return code
+
+def from_methylation(methylation):
+    '''Convert an agent methylation to its code'''
+    if methylation is None:
+        return NO_METHYLATION
+    return methylation
+
+
+class AgentArrays(object):
+    '''Struct-of-arrays storage for a single breed. Every field is a
+    NumPy array with one entry (or row) per agent.
+
+    '''
+
+    def __init__(self, fields):
+        '''
+        Args:
+        fields (dict) : field name -> (dtype, shape of one entry)
+        '''
+        self.fields = fields
+        for name, (dtype, shape) in fields.items():
+            setattr(self, name, np.empty((0,) + shape, dtype=dtype))
+
+    def __len__(self):
+        return len(self.unique_id)
+
+    def append(self, **columns):
+        '''Append new agents. Every field must be supplied.'''
+        for name, (dtype, shape) in self.fields.items():
+            new = np.asarray(columns[name], dtype=dtype)
+            if new.ndim == len(shape): # a scalar broadcast to all agents
+                new = np.broadcast_to(new, (len(columns["unique_id"]),) + shape)
+            setattr(self, name, np.concatenate([getattr(self, name), new]))
+
+    def keep(self, mask):
+        '''Keep only the agents where mask is True (or the given indices)'''
+        for name in self.fields:
+            setattr(self, name, getattr(self, name)[mask])
+
+
+class AffinityView(object):
+    '''Stands in for an EvolvableVector when reporting'''
+    __slots__ = ("vector",)
+
+    def __init__(self, vector):
+        self.vector = vector
+
+
+class PhageView(object):
+    '''Read-only stand in for a Phage agent, used by agent reporters'''
+    __slots__ = ("unique_id", "genotype", "methylation", "inactivation",
+                 "affinity", "parent", "last_infected", "dead", "lineage")
+    breed = "Phage"
+
+    def __init__(self, unique_id, genotype, methylation, inactivation,
+                 affinity, parent, last_infected, dead, lineage):
+        self.unique_id = unique_id
+        self.genotype = genotype
+        self.methylation = to_methylation(methylation)
+        self.inactivation = inactivation
+        self.affinity = AffinityView(affinity)
+        self.parent = parent
+        if last_infected == NO_GENOTYPE:
+            last_infected = None
+        self.last_infected = last_infected
+        self.dead = dead
+        self.lineage = lineage
+
+
+class BacteriaView(object):
+    '''Read-only stand in for a Bacteria agent, used by agent reporters'''
+    __slots__ = ("unique_id", "genotype", "methylation",
+                 "re_degrade_foreign", "established", "phage")
+    breed = "Bacteria"
+    inactivation = np.nan
+    last_infected = None
+
+    def __init__(self, unique_id, genotype, methylation,
+                 re_degrade_foreign, established, phage):
+        self.unique_id = unique_id
+        self.genotype = genotype
+        self.methylation = methylation
+        self.re_degrade_foreign = re_degrade_foreign
+        self.established = established
+        self.phage = phage
+
+
+class InfectingPhageView(object):
+    '''The phage inside an infected BacteriaView'''
+    __slots__ = ("unique_id", "genotype", "methylation", "affinity",
+                 "lineage", "last_infected")
+    breed = "Phage"
+
+    def __init__(self, unique_id, genotype, methylation, affinity, lineage,
+                 last_infected):
+        self.unique_id = unique_id
+        self.genotype = genotype
+        self.methylation = to_methylation(methylation)
+        self.affinity = AffinityView(affinity)
+        self.lineage = lineage
+        if last_infected == NO_GENOTYPE:
+            last_infected = None
+        self.last_infected = last_infected
+
+
+def as_reported(values, missing):
+    '''values as np.asarray makes them from the values the reporters
+    give for each view: None where missing, so objects if any are'''
+    if len(values) == 0:
+        return np.asarray([])
+    if not missing.any():
+        return values.astype(np.int64)
+    values = values.astype(object)
+    values[missing] = None
+    return values
+
+
+def nan_where(values, missing):
+    '''values as floats, nan where missing (ints if none are)'''
+    if len(values) > 0 and not missing.any():
+        return values.astype(np.int64)
+    values = values.astype(float)
+    values[missing] = np.nan
+    return values
+
+
+class AgentColumns(object):
+    '''The agents of an array model as columns, in the order of
+    ArraySchedule.agents (phage, then bacteria), or only the rows in
+    index. The columnar versions of the agent reporters (see
+    datacollection.columnar) read these instead of views.
+
+    '''
+
+    def __init__(self, model, index=None):
+        self.phage = model.phage
+        self.bacteria = model.bacteria
+        self.index = index
+
+    def __len__(self):
+        if self.index is None:
+            return len(self.phage) + len(self.bacteria)
+        return len(self.index)
+
+    def take(self, index):
+        '''The columns of the rows in index'''
+        if self.index is not None:
+            index = self.index[index]
+        return AgentColumns(self, index)
+
+    def column(self, phage_values, bacteria_values):
+        values = np.concatenate([phage_values, bacteria_values])
+        if self.index is None:
+            return values
+        return values[self.index]
+
+    def bacteria_nan(self):
+        return np.full(len(self.bacteria), np.nan)
+
+    @property
+    def unique_id(self):
+        return self.column(self.phage.unique_id, self.bacteria.unique_id)
+
+    @property
+    def breed(self):
+        is_phage = self.column(np.ones(len(self.phage), dtype=bool),
+                               np.zeros(len(self.bacteria), dtype=bool))
+        return np.where(is_phage, PhageView.breed, BacteriaView.breed)
+
+    @property
+    def genotype(self):
+        return self.column(self.phage.genotype,
+                           self.bacteria.genotype).astype(np.int64)
+
+    @property
+    def methylation(self):
+        codes = self.column(self.phage.methylation, self.bacteria.methylation)
+        missing = self.column(self.phage.methylation == NO_METHYLATION,
+                              np.zeros(len(self.bacteria), dtype=bool))
+        return as_reported(codes, missing)
+
+    @property
+    def last_infected(self):
+        genotypes = self.column(self.phage.last_infected,
+                                np.full(len(self.bacteria), NO_GENOTYPE))
+        return as_reported(genotypes, genotypes == NO_GENOTYPE)
+
+    @property
+    def parent(self):
+        '''The parent of phage, nan for bacteria (get_parent)'''
+        parents = self.column(self.phage.parent.astype(float),
+                              self.bacteria_nan())
+        return nan_where(parents, np.isnan(parents))
+
+    @property
+    def infected_id(self):
+        '''The ID of the phage in bacteria, else nan (get_infected_ID)'''
+        b = self.bacteria
+        ids = self.column(np.full(len(self.phage), np.nan),
+                          np.where(b.infected, b.phage_id, np.nan))
+        return nan_where(ids, np.isnan(ids))
+
+    def affinity(self, genotype):
+        '''The affinity of phage, or of the phage in bacteria, for
+        genotype (get_affinity)'''
+        b = self.bacteria
+        return self.column(self.phage.affinity[:, genotype],
+                           np.where(b.infected, b.phage_affinity[:, genotype],
+                                    np.nan))
+
+
+class ArraySchedule(object):
+    '''Stands in for RandomActivationByBreed on an array model. Keeps
+    the step counters and exposes the agents as read-only views so
+    that the usual model and agent reporters keep working. The views
+    are only made when a reporter asks for them, once per step.
+
+    '''
+
+    def __init__(self, model):
+        self.model = model
+        self.steps = 0
+        self.time = 0
+        self.counters = {}
+        self.views = None
+        self.views_key = None
+
+    def __getstate__(self):
+        '''The views are left out'''
+        state = dict(self.__dict__)
+        state["views"] = state["views_key"] = None
+        return state
+
+    def agent_columns(self):
+        return AgentColumns(self.model)
+
+    def phage_views(self):
+        p = self.model.phage
+        columns = zip(p.unique_id.tolist(), p.genotype.tolist(),
+                      p.methylation.tolist(), p.inactivation.tolist(),
+                      p.affinity, p.parent.tolist(),
+                      p.last_infected.tolist(), p.dead.tolist(),
+                      p.lineage.tolist())
+        return {c[0] : PhageView(*c) for c in columns}
+
+    def bacteria_views(self):
+        b = self.model.bacteria
+        views = {}
+        columns = zip(b.unique_id.tolist(), b.genotype.tolist(),
+                      b.methylation.tolist(), b.re_degrade_foreign.tolist(),
+                      b.established.tolist(), b.infected.tolist(),
+                      b.phage_id.tolist(), b.phage_genotype.tolist(),
+                      b.phage_methylation.tolist(), b.phage_affinity,
+                      b.phage_lineage.tolist(),
+                      b.phage_last_infected.tolist())
+        for (unique_id, genotype, methylation, re_degrade, established,
+             infected, phage_id, phage_genotype, phage_methylation,
+             phage_affinity, phage_lineage, phage_last_infected) in columns:
+            if infected:
+                phage = InfectingPhageView(phage_id, phage_genotype,
+                                           phage_methylation, phage_affinity,
+                                           phage_lineage, phage_last_infected)
+            else:
+                phage = None
+            views[unique_id] = BacteriaView(unique_id, genotype, methylation,
+                                            re_degrade, established, phage)
+        return views
+
+    def cached_views(self):
+        '''The views by breed and of all agents. They are made again
+        when the step or the agents (the arrays, which are replaced when
+        agents are added or removed) have changed.
+
+        '''
+        key = (self.steps, self.model.phage.unique_id,
+               self.model.bacteria.unique_id)
+        old = self.views_key
+        if old is None or old[0] != key[0] or old[1] is not key[1] or\
+           old[2] is not key[2]:
+            by_breed = {Phage : self.phage_views(),
+                        Bacteria : self.bacteria_views()}
+            agents = dict(by_breed[Phage])
+            agents.update(by_breed[Bacteria])
+            self.views = (by_breed, agents)
+            self.views_key = key
+        return self.views
+
+    @property
+    def agents_by_breed(self):
+        return self.cached_views()[0]
+
+    @property
+    def agents(self):
+        return self.cached_views()[1]
+
+    def get_breed_count(self, breed_class):
+        arrays = self.breed_arrays(breed_class)
+        if arrays is None:
+            return 0
+        return len(arrays)
+
+    def get_agent_count(self):
+        return len(self.model.phage) + len(self.model.bacteria)
+
+    def breed_arrays(self, breed_class):
+        if breed_class is Phage:
+            return self.model.phage
+        if breed_class is Bacteria:
+            return self.model.bacteria
+        return None
+
+    def count(self, breed_class, methylation=ANY, genotype=ANY, lineage=ANY):
+        '''As RandomActivationByBreed.count, counted on the arrays'''
+        arrays = self.breed_arrays(breed_class)
+        if arrays is None:
+            return 0
+        mask = np.ones(len(arrays), dtype=bool)
+        if methylation is not ANY:
+            mask &= arrays.methylation == from_methylation(methylation)
+        if genotype is not ANY:
+            mask &= arrays.genotype == genotype
+        if lineage is not ANY:
+            if not hasattr(arrays, "lineage"):
+                return 0 # only phage have a lineage
+            mask &= arrays.lineage == lineage
+        return int(np.count_nonzero(mask))
+
+    def register_counter(self, name, breed_class, predicate):
+        '''As RandomActivationByBreed.register_counter, except that the
+        predicate is vectorized: it is given the breed's AgentArrays and
+        returns a boolean mask.
+
+        '''
+        self.counters[name] = (breed_class, predicate)
+
+    def get_counter(self, name):
+        breed_class, predicate = self.counters[name]
+        arrays = self.breed_arrays(breed_class)
+        if arrays is None:
+            return 0
+        return int(np.count_nonzero(predicate(arrays)))
+
+
+class ArrayBaseModel(BaseModel):
+    '''
+    Phage-Bacteria with RM systems, stored as arrays. Takes the same
+    arguments as BaseModel.
+    '''
+
+    def make_schedule(self):
+        self.phage = AgentArrays(PHAGE_FIELDS)
+        self.bacteria = AgentArrays(BACTERIA_FIELDS)
+        return ArraySchedule(self)
+
+    def get_next_IDs(self, n):
+        ids = np.arange(self.current_ID + 1, self.current_ID + n + 1)
+        self.current_ID += n
+        return ids
+
+    def add_phage(self):
+        affinity = np.array([[1-self.phage_off_diagonal, self.phage_off_diagonal],
+                             [self.phage_off_diagonal, 1-self.phage_off_diagonal]])
+        n = self.initial_phage
+        rm = self.rng.choice([0,1], n, p=[1-self.initial_fraction_p_m1,
+                                          self.initial_fraction_p_m1])
+        g = self.rng.choice([0,1], n, p=[1-self.initial_fraction_p_g1,
+                                         self.initial_fraction_p_g1])
+        self.phage.append(unique_id = self.get_next_IDs(n),
+                          genotype = g,
+                          methylation = rm,
+                          inactivation = self.phage_inactivation_time,
+                          affinity = self.get_evolvable_population(affinity[g,:]).matrix,
+                          parent = 0, # parent is 0 for first generation
+                          lineage = FOUNDING_LINEAGE,
+                          last_infected = NO_GENOTYPE,
+                          dead = False)
+
+    def add_bacteria(self, num):
+        g = self.rng.choice([0,1], num, p=[1-self.fraction_b_m1, self.fraction_b_m1])
+        re_degrade = np.where(g == 0, self.re_degrade_foreign_0,
+                              self.re_degrade_foreign_1)
+        self.bacteria.append(unique_id = self.get_next_IDs(num),
+                             genotype = g,
+                             methylation = g,
+                             re_degrade_foreign = re_degrade,
+                             established = False,
+                             infected = False,
+                             phage_id = 0,
+                             phage_genotype = NO_GENOTYPE,
+                             phage_methylation = NO_METHYLATION,
+                             phage_affinity = np.zeros((num, 2)),
+                             phage_lineage = FOUNDING_LINEAGE,
+                             phage_last_infected = NO_GENOTYPE)
+
+    def add_spike_in(self, affinity_0, methylation):
+        self.spiked = True
+        n = max(self.phage_burst_size - 1, 0)
+        affinity = self.get_evolvable_population([affinity_0, 1-affinity_0]).matrix
+        self.phage.append(unique_id = np.arange(1, n+1) * -10,
+                          genotype = 0,
+                          methylation = from_methylation(methylation),
+                          inactivation = self.phage_inactivation_time,
+                          affinity = np.repeat(affinity, n, axis=0),
+                          parent = -1, # all have parent -1
+                          lineage = SPIKE_IN_LINEAGE,
+                          last_infected = NO_GENOTYPE,
+                          dead = False)
+        # a burn-in that was absorbed (or stopped) has phage again
+        self.absorbed = False
+        self.running = True
+
+    def step_phage(self):
+        '''Inactivate phage, then let the remaining phage infect.'''
+        phage = self.phage
+        bacteria = self.bacteria
+        phage.inactivation -= 1
+        phage.keep((phage.inactivation >= 0) & ~phage.dead)
+        # Shuffle the location of agents each time
+        index = EncounterIndex(self.rng.random(len(bacteria)),
+                               self.agent_width)
+        phage_idx, bacteria_idx = index.pairs(self.rng.random(len(phage)),
+                                              self.encounter_width)
+        probs = phage.affinity[phage_idx, bacteria.genotype[bacteria_idx]]
+        dead, infecting, infected = resolve_infections(phage_idx, bacteria_idx,
+                                                       probs, bacteria.infected,
+                                                       self.rng)
+        phage.dead[dead] = True
+        bacteria.infected[infected] = True
+        bacteria.phage_id[infected] = phage.unique_id[infecting]
+        bacteria.phage_genotype[infected] = phage.genotype[infecting]
+        bacteria.phage_methylation[infected] = phage.methylation[infecting]
+        bacteria.phage_affinity[infected] = phage.affinity[infecting]
+        bacteria.phage_lineage[infected] = phage.lineage[infecting]
+        bacteria.phage_last_infected[infected] = phage.last_infected[infecting]
+
+    def step_bacteria(self):
+        '''Degrade or establish phage in infected bacteria, then lyse.'''
+        bacteria = self.bacteria
+        infected = np.flatnonzero(bacteria.infected)
+        unestablished = infected[~bacteria.established[infected]]
+        foreign = unestablished[bacteria.methylation[unestablished] !=\
+                                bacteria.phage_methylation[unestablished]]
+        degrades = self.rng.random(len(foreign)) <\
+                   bacteria.re_degrade_foreign[foreign]
+        bacteria.infected[foreign[degrades]] = False
+        bacteria.established[foreign[~degrades]] = True
+        infected = np.flatnonzero(bacteria.infected)
+        lysed = infected[self.rng.random(len(infected)) < self.latency]
+        if len(lysed) > 0:
+            ## cell dies, phage are produced
+            progeny = burst_progeny(self.phage_burst_size,
+                                    self.epi_inheritance,
+                                    self.mutate_affinity,
+                                    bacteria.phage_id[lysed],
+                                    bacteria.phage_genotype[lysed],
+                                    bacteria.phage_methylation[lysed],
+                                    bacteria.phage_affinity[lysed],
+                                    bacteria.phage_lineage[lysed],
+                                    bacteria.genotype[lysed],
+                                    bacteria.methylation[lysed],
+                                    bacteria.re_degrade_foreign[lysed],
+                                    self.rng)
+            progeny["affinity"] = progeny["affinity"].matrix
+            n_progeny = len(progeny["parent"])
+            self.phage.append(unique_id = self.get_next_IDs(n_progeny),
+                              inactivation = self.phage_inactivation_time,
+                              dead = False,
+                              **progeny)
+        survivors = np.ones(len(bacteria), dtype=bool)
+        survivors[lysed] = False
+        bacteria.keep(survivors)
+
+    def step(self):
+        if self.absorbed:
+            self.step_absorbed()
+            return
+        self.datacollector.collect(self)
+        self.step_phage()
+        self.step_bacteria()
+        self.end_step()
+
+    def is_absorbing(self):
+        return len(self.phage) == 0 and not self.bacteria.infected.any()
+
+    def lineage_extinct(self, lineage):
+        b = self.bacteria
+        return self.schedule.count(Phage, lineage=lineage) == 0 and\
+            not (b.phage_lineage[b.infected] == lineage).any()
+
+    def phage_arrays(self, infecting=False):
+        if infecting:
+            b = self.bacteria
+            return {"lineage" : b.phage_lineage[b.infected],
+                    "methylation" : b.phage_methylation[b.infected],
+                    "last_infected" : b.phage_last_infected[b.infected],
+                    "affinity" : b.phage_affinity[b.infected]}
+        return {"lineage" : self.phage.lineage,
+                "methylation" : self.phage.methylation,
+                "last_infected" : self.phage.last_infected,
+                "affinity" : self.phage.affinity}
+
+
+class ArraySpikeIn(ArrayBaseModel, SpikeIn):
+    pass
+
+
+class ArrayTradeOff(ArrayBaseModel, TradeOff):
+    pass
+
+
+class ArrayTradeOffSpikeIn(ArrayTradeOff, TradeOffSpikeIn):
+    pass
+
+
+ARRAY_MODELS = {BaseModel : ArrayBaseModel,
+                SpikeIn : ArraySpikeIn,
+                TradeOff : ArrayTradeOff,
+                TradeOffSpikeIn : ArrayTradeOffSpikeIn}
+
+def get_array_model(model_class):
+    '''Return the array-backed version of a model class'''
+    if model_class in ARRAY_MODELS.values():
+        return model_class
+    try:
+        return ARRAY_MODELS[model_class]
+    except KeyError:
+        raise ValueError("No array engine for %s" % model_class.__name__)
@@ -0,0 +1,133 @@
+'''
+A BatchRunner for end-of-run sweeps that can run the parameter points
+in worker processes and keeps the results in columns.
+'''
+from itertools import product
+
+import numpy as np
+import pandas as pd
+
+from .datacollection import ColumnarDataCollector
+from .parallel import run_in_pool
+
+
+def concatenate(arrays):
+    '''Concatenate the columns of several runs, as objects if their
+    types don't mix'''
+    try:
+        return np.concatenate(arrays)
+    except TypeError:
+        return np.concatenate([a.astype(object) for a in arrays])
+
+
+class ColumnarBatchRunner(object):
+    '''Runs a model at every combination of parameter values, like the
+    mesa BatchRunner, and collects the model and agent variables at the
+    end of each run. Takes the same arguments and returns the same data
+    frames. The agent reporters can also be anything
+    ColumnarDataCollector takes.
+
+    '''
+
+    def __init__(self, model_cls, parameter_values, iterations=1,
+                 max_steps=1000, model_reporters=None, agent_reporters=None,
+                 workers=None, chunksize=1):
+        '''
+        Args:
+        model_cls: the class of model to run, or any function returning
+            a model
+        parameter_values (dict): parameter -> value or list of values
+        iterations (int): runs at each combination of parameters
+        max_steps (int): steps per run, unless the model stops itself
+        model_reporters, agent_reporters (dict): the variables to
+            collect at the end of each run
+        workers (int): if given, run in that many processes, chunksize
+            runs at a time (see parallel.run_in_pool)
+        '''
+        self.model_cls = model_cls
+        self.parameter_values = {param : self.make_iterable(vals)
+                                 for param, vals in parameter_values.items()}
+        self.iterations = iterations
+        self.max_steps = max_steps
+        self.model_reporters = model_reporters or {}
+        self.agent_reporters = agent_reporters or {}
+        self.workers = workers
+        self.chunksize = chunksize
+        self.results = []
+
+    @staticmethod
+    def make_iterable(val):
+        if hasattr(val, "__iter__") and not isinstance(val, str):
+            return val
+        return [val]
+
+    def tasks(self):
+        '''(parameter values, run) for every run'''
+        run = 0
+        for param_values in product(*self.parameter_values.values()):
+            for _ in range(self.iterations):
+                yield param_values, run
+                run += 1
+
+    def run_model(self, model):
+        while model.running and model.schedule.steps < self.max_steps:
+            model.step()
+
+    def run_task(self, task):
+        '''Run one model. Returns its model variables and its agent
+        columns.
+
+        '''
+        param_values, run = task
+        kwargs = dict(zip(self.parameter_values.keys(), param_values))
+        model = self.model_cls(**kwargs)
+        self.run_model(model)
+        model_vars = {var : reporter(model)
+                      for var, reporter in self.model_reporters.items()}
+        agent_columns = None
+        if self.agent_reporters:
+            collector = ColumnarDataCollector(
+                agent_reporters=self.agent_reporters)
+            collector.collect_model_agents(model, model.schedule.steps)
+            agent_columns = collector.get_agent_columns()
+        return task, model_vars, agent_columns
+
+    def run_all(self):
+        '''Run the model at all parameter combinations and store results.'''
+        tasks = list(self.tasks())
+        if self.workers is None:
+            self.results = [self.run_task(task) for task in tasks]
+        else:
+            self.results = list(run_in_pool(self, "run_task", tasks,
+                                            self.workers, self.chunksize))
+
+    def key_columns(self, lengths):
+        '''The parameter and Run columns, each value repeated lengths
+        times'''
+        columns = {}
+        names = list(self.parameter_values.keys()) + ["Run"]
+        keys = [tuple(param_values) + (run,)
+                for (param_values, run), _, _ in self.results]
+        for i, name in enumerate(names):
+            columns[name] = np.repeat(np.asarray([key[i] for key in keys]),
+                                      lengths)
+        return columns
+
+    def get_model_vars_dataframe(self):
+        '''A data frame with a row for each run'''
+        columns = self.key_columns(1)
+        for var in self.model_reporters:
+            columns[var] = [model_vars[var]
+                            for _, model_vars, _ in self.results]
+        return pd.DataFrame(columns)
+
+    def get_agent_vars_dataframe(self):
+        '''A data frame with a row for each agent at the end of each run'''
+        if not self.agent_reporters:
+            return pd.DataFrame()
+        agents = [agent_columns for _, _, agent_columns in self.results]
+        lengths = [len(c["AgentID"]) for c in agents]
+        columns = self.key_columns(lengths)
+        for var in ["AgentID"] + list(self.agent_reporters.keys()):
+            columns[var] = concatenate([c[var] for c in agents])
+        return pd.DataFrame(columns, copy=False)
@@ -0,0 +1,66 @@
+import numpy as np
+
+NO_METHYLATION = -1 # stands in for a methylation of None
+
+
+def progeny_methylation(burst_size, epi_inheritance, phage_methylation,
+                        bacteria_methylation, re_degrade_foreign,
+                        rng=np.random):
+    '''Methylation of each of the progeny of the lysed bacteria. The
+    progeny of each cell are contiguous.
+
+    epi_inheritance is the odds that the progeny gets the bacteria's
+    methylation state, otherwise it gets None. If -1 the progeny
+    inherits its parent's methylation, mutating at
+    1-re_degrade_foreign. If -2 the methylation is random.
+    '''
+    n = len(bacteria_methylation) * burst_size
+    if (epi_inheritance != -1) and\
+       (epi_inheritance != -2): # This is epigenetic inheritance
+        inherits = rng.random(n) < epi_inheritance
+        return np.where(inherits,
+                        np.repeat(bacteria_methylation, burst_size),
+                        NO_METHYLATION) # Can get a "None" inheritance
+    elif epi_inheritance == -1: # This is genetic inheritance
+        parent = np.repeat(phage_methylation, burst_size)
+        keeps = rng.random(n) <\
+                np.repeat(re_degrade_foreign, burst_size)
+        flipped = np.where(parent == 0, 1, 0) # methylation mutation
+        return np.where(keeps, parent, flipped)
+    elif epi_inheritance == -2: #Flip a coin for methylations state
+        return rng.choice([0,1], n)
+    else:
+        raise ValueError("Don't know how to deal with inheritance")
+
+
+def burst_progeny(burst_size, epi_inheritance, mutate,
+                  phage_id, phage_genotype, phage_methylation, phage_affinity,
+                  phage_lineage, bacteria_genotype, bacteria_methylation, re_degrade_foreign,
+                  rng=np.random):
+    '''Produce the progeny of every bacteria that lyses in a step.
+
+    Args:
+    burst_size (int): number of phage produced per cell
+    epi_inheritance: see progeny_methylation
+    mutate: function that returns mutated copies of affinity rows, as
+        an EvolvablePopulation
+    phage_* (np.array): the phage infecting each lysed cell. Methylation
+        None is given as NO_METHYLATION
+    bacteria_* (np.array): the lysed cells
+    rng: the source of randomness, np.random or a RandomStream
+
+    Returns a dict with one entry per progeny: genotype, methylation,
+    affinity (the population returned by mutate), parent, lineage and
+    last_infected.
+    '''
+    phage_affinity = np.asarray(phage_affinity, dtype=float).reshape(-1, 2)
+    return {"genotype" : np.repeat(phage_genotype, burst_size),
+            "methylation" : progeny_methylation(burst_size, epi_inheritance,
+                                                phage_methylation,
+                                                bacteria_methylation,
+                                                re_degrade_foreign, rng),
+            ## mutations possible here
+            "affinity" : mutate(np.repeat(phage_affinity, burst_size, axis=0)),
+            "parent" : np.repeat(phage_id, burst_size),
+            "lineage" : np.repeat(phage_lineage, burst_size),
+            "last_infected" : np.repeat(bacteria_genotype, burst_size)}
@@ -0,0 +1,85 @@
+'''
+Snapshots of a running model, so that a long run can be resumed.
+
+A snapshot is the pickled model (schedule, agents, affinities, ID
+counter, its RandomStream and the data collected so far) together
+with the NumPy and Python random states, gzipped. Reporter functions
+are not saved; they are put back when the snapshot is loaded. A
+snapshot can carry a key (e.g. the run and its parameters), which is
+checked when it is loaded, so a snapshot of another run is never
+resumed.
+'''
+import gzip
+import os
+import pickle
+import random
+
+import numpy as np
+
+
+def save_snapshot(model, path, key=None):
+    '''Write a snapshot of model to path. The file is replaced at once,
+    so a run killed while saving leaves the last snapshot intact.
+
+    '''
+    state = {"key" : key,
+             "model" : model,
+             "np_random" : np.random.get_state(),
+             "random" : random.getstate()}
+    tmp_path = path + ".tmp"
+    with gzip.open(tmp_path, "wb", compresslevel=1) as f:
+        pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+
+def load_snapshot(path, model_reporters=None, agent_reporters=None,
+                  restore_random=True, key=None):
+    '''Load the model saved at path. The datacollector gets the given
+    reporters back, or else the model's default_reporters. If
+    restore_random, the NumPy and Python random states are set to
+    where they were, so the run continues as if never stopped. If key
+    is given, the snapshot must have been saved with it.
+
+    '''
+    with gzip.open(path, "rb") as f:
+        state = pickle.load(f)
+    if key is not None and state.get("key") != key:
+        raise ValueError("The snapshot %s is of %r, not %r"
+                         % (path, state.get("key"), key))
+    model = state["model"]
+    if model_reporters is None and agent_reporters is None and\
+       hasattr(model, "default_reporters"):
+        model_reporters, agent_reporters = model.default_reporters()
+    model.datacollector.set_reporters(model_reporters, agent_reporters)
+    if restore_random:
+        np.random.set_state(state["np_random"])
+        random.setstate(state["random"])
+    return model
+
+
+class Checkpoint(object):
+    '''Saves a snapshot of a model to path every `every` steps, with
+    key. Pass it to BaseModel.run_model, and remove it once the run is
+    done.
+
+    '''
+
+    def __init__(self, path, every=50, key=None):
+        self.path = path
+        self.every = every
+        self.key = key
+
+    def exists(self):
+        return os.path.isfile(self.path)
+
+    def step(self, model):
+        if model.schedule.steps % self.every == 0:
+            save_snapshot(model, self.path, self.key)
+
+    def load(self, model_reporters=None, agent_reporters=None):
+        return load_snapshot(self.path, model_reporters, agent_reporters,
+                             key=self.key)
+
+    def remove(self):
+        if self.exists():
+            os.remove(self.path)
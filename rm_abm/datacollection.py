@@ -0,0 +1,358 @@
+'''
+A data collector that stores agent variables in NumPy columns.
+
+Takes the same model_reporters and agent_reporters as the mesa
+DataCollector. An agent reporter may also be the name of an agent
+attribute, or a function marked with vectorized, which is called once
+per step with the list of agents and returns one value per agent.
+
+The array models (array_model.py) have no agents, only views of them
+made from the arrays. If every agent reporter is the name of an
+attribute or is marked with columnar, the collector reads the array
+model's AgentColumns instead and no views are made.
+
+A CollectionPolicy sets the steps at which agent variables are
+collected, and how many agents. Model variables are collected at
+every step. Each collected step can also be handed to an agent_sink
+(see aggregators.py), with or without keeping it.
+'''
+from operator import attrgetter
+
+import numpy as np
+import pandas as pd
+
+from .random_stream import state_seed
+
+
+def vectorized(f):
+    '''Mark f as an agent reporter that takes the list of all agents and
+    returns one value for each'''
+    f.vectorized = True
+    return f
+
+
+def columnar(array_reporter):
+    '''Mark an agent reporter as having array_reporter, a function of
+    the AgentColumns of an array model that returns what the reporter
+    gives for each agent'''
+    def mark(f):
+        f.columnar = array_reporter
+        return f
+    return mark
+
+
+class ColumnBuffer(object):
+    '''A growable typed column. The capacity doubles when it is full,
+    and the dtype is widened (to object if need be) when a new batch
+    doesn't fit.
+
+    '''
+
+    def __init__(self, dtype=None, capacity=1024):
+        self.dtype = dtype
+        self.capacity = capacity
+        self.data = None
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def widen(self, dtype):
+        # NumPy would turn numbers mixed with strings into strings
+        strings = [np.dtype(d).kind in "SU" for d in (self.data.dtype, dtype)]
+        try:
+            dtype = np.result_type(self.data.dtype, dtype)
+        except TypeError:
+            dtype = np.dtype(object)
+        if strings[0] != strings[1]:
+            dtype = np.dtype(object)
+        if dtype != self.data.dtype:
+            self.data = self.data.astype(dtype)
+
+    def append(self, values):
+        values = np.asarray(values, dtype=self.dtype)
+        n = len(values)
+        if n == 0: # keep the dtype from being set by an empty batch
+            return
+        if self.data is None:
+            self.data = np.empty(max(self.capacity, n), dtype=values.dtype)
+        elif values.dtype != self.data.dtype:
+            self.widen(values.dtype)
+        if self.size + n > len(self.data):
+            capacity = max(2 * len(self.data), self.size + n)
+            data = np.empty(capacity, dtype=self.data.dtype)
+            data[:self.size] = self.data[:self.size]
+            self.data = data
+        self.data[self.size:self.size + n] = values
+        self.size += n
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state["data"] = None if self.data is None else self.values.copy()
+        return state
+
+    @property
+    def values(self):
+        '''The filled part of the buffer, without a copy'''
+        if self.data is None:
+            return np.empty(0, dtype=self.dtype)
+        return self.data[:self.size]
+
+
+class CollectionPolicy(object):
+    '''When agent variables are collected, and for how many agents.'''
+
+    def __init__(self, when="every", every=1, base=2, sample=None):
+        '''
+        Args:
+        when (str): "every" collects every `every` steps, "off" never,
+            "final" at the last step of run_model, and "log" at steps 0
+            and 1, then each time floor(log_base(step)) goes up, and at
+            the last step
+        sample (int): if given, collect at most this many agents per
+            step, chosen at random
+        '''
+        if when not in ("every", "off", "final", "log"):
+            raise ValueError("Unknown collection policy: %s" % when)
+        self.when = when
+        self.every = every
+        self.base = base
+        self.sample = sample
+
+    def collects(self, step, final_step=None):
+        '''Whether agent variables are collected at step'''
+        if self.when == "every":
+            return step % self.every == 0
+        if self.when == "off":
+            return False
+        if step == final_step:
+            return True
+        if self.when == "log":
+            if step < 2:
+                return True
+            return np.floor(np.log(step) / np.log(self.base)) >\
+                   np.floor(np.log(step - 1) / np.log(self.base))
+        return False
+
+    def select_index(self, n, rng=np.random):
+        '''The indices of the agents to collect out of n, in order, or
+        None for all of them'''
+        if self.sample is None or n <= self.sample:
+            return None
+        return np.sort(rng.permutation(n)[:self.sample])
+
+    def select(self, agents, rng=np.random):
+        '''The agents to collect, keeping their order'''
+        chosen = self.select_index(len(agents), rng)
+        if chosen is None:
+            return agents
+        return [agents[i] for i in chosen.tolist()]
+
+
+def get_collection_policy(policy):
+    '''A CollectionPolicy from a policy, a "when" string, the number of
+    steps between collections, or None (every step)'''
+    if policy is None:
+        return CollectionPolicy()
+    if isinstance(policy, CollectionPolicy):
+        return policy
+    if isinstance(policy, str):
+        return CollectionPolicy(policy)
+    return CollectionPolicy("every", every=int(policy))
+
+
+class ColumnarDataCollector(object):
+    '''Collects model variables as lists, like the mesa DataCollector,
+    and agent variables into one ColumnBuffer per reporter, alongside
+    Step and AgentID columns. The agent variables are collected
+    according to policy.
+
+    '''
+
+    def __init__(self, model_reporters=None, agent_reporters=None,
+                 policy=None):
+        '''
+        Args:
+        model_reporters (dict): name -> function of the model, or the
+            name of a model attribute
+        agent_reporters (dict): name -> function of an agent, the name
+            of an agent attribute, or a vectorized function
+        policy: anything get_collection_policy takes
+        '''
+        self.model_reporters = dict(model_reporters or {})
+        self.agent_reporters = dict(agent_reporters or {})
+        self.policy = get_collection_policy(policy)
+        self.final_step = None # set by run_model
+        self.model_vars = {var : [] for var in self.model_reporters}
+        self.steps = ColumnBuffer(np.int64)
+        self.agent_ids = ColumnBuffer(np.int64)
+        self.agent_vars = {var : ColumnBuffer()
+                           for var in self.agent_reporters}
+        self.agent_sink = None # gets the record batch of each step
+        self.keep_agents = True
+        self.sample_rng = None # see sample_random
+
+    def __getstate__(self):
+        '''Reporter functions are left out, as they are often lambdas.
+        Restore them with set_reporters.'''
+        state = dict(self.__dict__)
+        for name in ["model_reporters", "agent_reporters"]:
+            state[name] = {var : reporter if isinstance(reporter, str) else None
+                           for var, reporter in state[name].items()}
+        return state
+
+    def set_reporters(self, model_reporters=None, agent_reporters=None):
+        '''Put back the reporter functions left out when pickled'''
+        for reporters, new in [(self.model_reporters, model_reporters),
+                               (self.agent_reporters, agent_reporters)]:
+            for var in reporters:
+                if reporters[var] is None and new and var in new:
+                    reporters[var] = new[var]
+
+    def report_agents(self, reporter, agents):
+        '''One value per agent'''
+        if isinstance(reporter, str):
+            return list(map(attrgetter(reporter), agents))
+        if getattr(reporter, "vectorized", False):
+            return reporter(agents)
+        return [reporter(agent) for agent in agents]
+
+    def column_reporters(self):
+        '''The reporters as functions of AgentColumns, or None if one of
+        them has no columnar version'''
+        reporters = {}
+        for var, reporter in self.agent_reporters.items():
+            if isinstance(reporter, str):
+                reporters[var] = attrgetter(reporter)
+            elif getattr(reporter, "columnar", None) is not None:
+                reporters[var] = reporter.columnar
+            else:
+                return None
+        return reporters
+
+    def collect(self, model):
+        '''Collect all the data for the given model object.'''
+        for var, reporter in self.model_reporters.items():
+            if isinstance(reporter, str):
+                self.model_vars[var].append(getattr(model, reporter))
+            else:
+                self.model_vars[var].append(reporter(model))
+
+        step = model.schedule.steps
+        if self.agent_reporters and\
+           self.policy.collects(step, self.final_step):
+            self.collect_model_agents(model, step)
+
+    def collect_model_agents(self, model, step):
+        '''Collect the agent variables of model's agents (a sample of
+        them, as the policy says) at step. Reads the columns of an array
+        model when the reporters allow it.
+
+        '''
+        rng = self.sample_random(model)
+        reporters = None
+        if hasattr(model.schedule, "agent_columns"):
+            reporters = self.column_reporters()
+        if reporters is not None:
+            agents = model.schedule.agent_columns()
+            chosen = self.policy.select_index(len(agents), rng)
+            if chosen is not None:
+                agents = agents.take(chosen)
+            self.collect_agents(step, agents, reporters)
+        else:
+            agents = list(model.schedule.agents.values())
+            self.collect_agents(step, self.policy.select(agents, rng))
+
+    def sample_random(self, model):
+        '''The generator agents are sampled with. It is the collector's
+        own, seeded from model.seed, so sampling doesn't change the
+        draws of the model.
+
+        '''
+        if self.sample_rng is None:
+            seed = getattr(model, "seed", None)
+            if not isinstance(seed, (int, np.integer)):
+                seed = state_seed()
+            self.sample_rng = np.random.RandomState(int(seed) % 2**32)
+        return self.sample_rng
+
+    def collect_agents(self, step, agents, column_reporters=None):
+        '''Append the agent variables of some agents at step, unless
+        keep_agents is False, and hand them to the agent_sink. agents is
+        a list of agents, or AgentColumns read by column_reporters.
+
+        '''
+        if column_reporters is not None:
+            ids = agents.unique_id
+        else:
+            ids = [agent.unique_id for agent in agents]
+        batch = {"Step" : np.full(len(agents), step, dtype=np.int64),
+                 "AgentID" : np.asarray(ids, dtype=np.int64)}
+        for var, reporter in self.agent_reporters.items():
+            if column_reporters is not None:
+                values = column_reporters[var](agents)
+            else:
+                values = self.report_agents(reporter, agents)
+            batch[var] = np.asarray(values)
+        if self.keep_agents:
+            self.steps.append(batch["Step"])
+            self.agent_ids.append(batch["AgentID"])
+            for var in self.agent_reporters:
+                self.agent_vars[var].append(batch[var])
+        if self.agent_sink is not None:
+            self.agent_sink.update(batch)
+
+    def get_model_vars_dataframe(self):
+        return pd.DataFrame(self.model_vars)
+
+    def get_agent_columns(self):
+        '''dict of Step, AgentID and each agent variable, as arrays'''
+        columns = {"Step" : self.steps.values,
+                   "AgentID" : self.agent_ids.values}
+        for var, buffer in self.agent_vars.items():
+            columns[var] = buffer.values
+        return columns
+
+    def agent_batches(self, steps_per_batch=1):
+        '''Yield the agent columns as record batches (dicts of arrays)
+        of steps_per_batch collected steps each, or of everything if
+        steps_per_batch is None. The arrays are views of the buffers.
+
+        '''
+        columns = self.get_agent_columns()
+        steps = columns["Step"]
+        if len(steps) == 0:
+            return
+        if steps_per_batch is None:
+            yield columns
+            return
+        # where each collected step starts
+        bounds = np.concatenate([[0], np.flatnonzero(np.diff(steps)) + 1,
+                                 [len(steps)]])
+        for i in range(0, len(bounds) - 1, steps_per_batch):
+            start = bounds[i]
+            stop = bounds[min(i + steps_per_batch, len(bounds) - 1)]
+            yield {name : column[start:stop]
+                   for name, column in columns.items()}
+
+    def get_agent_vars_dataframe(self):
+        '''A data frame indexed by Step and AgentID, as from the mesa
+        DataCollector'''
+        df = pd.DataFrame(self.get_agent_columns(), copy=False)
+        return df.set_index(["Step", "AgentID"])
+
+
+def batch_to_df(batch, key_names, key, columns=None):
+    '''A data frame of a record batch, with a constant column for each
+    of key_names, set from key, in front. columns selects and orders the
+    batch's columns.
+
+    '''
+    if columns is None:
+        columns = list(batch.keys())
+    n = len(batch[columns[0]]) if columns else 0
+    data = {name : np.repeat(np.asarray([value]), n)
+            for name, value in zip(key_names, key)}
+    for name in columns:
+        data[name] = batch[name]
+    return pd.DataFrame(data, copy=False)
@@ -0,0 +1,86 @@
+import numpy as np
+
+
+class EncounterIndex(object):
+    '''Finds which agents fall inside an encounter window on the
+    circular world [0,1]. An agent at position p occupies
+    [p, p + agent_width). Built on a sorted array of positions so that
+    the windows of many phage can be answered with one searchsorted.
+
+    '''
+
+    def __init__(self, positions, agent_width):
+        '''
+        Args:
+        positions (np.array): position of each agent in [0,1)
+        agent_width (float): the width of each agent
+        '''
+        self.order = np.argsort(positions)
+        self.sorted_positions = positions[self.order]
+        self.agent_width = agent_width
+
+    def __len__(self):
+        return len(self.sorted_positions)
+
+    def ranges(self, centers, encounter_width):
+        '''Returns (start, stop, wrap_start, wrap_stop), the ranges of the
+        sorted positions that overlap each window. The second range is
+        the part of the window that wraps around 0/1 (empty otherwise).
+
+        '''
+        sorted_pos = self.sorted_positions
+        agent_width = self.agent_width
+        radius = encounter_width/2
+        lwr = centers - radius
+        upr = centers + radius
+        # window clipped to [0,1]
+        start = np.searchsorted(sorted_pos, np.maximum(lwr, 0) - agent_width,
+                                side="right")
+        stop = np.searchsorted(sorted_pos, np.minimum(upr, 1), side="left")
+        wrap_start = np.zeros_like(start)
+        wrap_stop = np.zeros_like(stop)
+        below = lwr < 0 # if near lower boundary
+        wrap_start[below] = np.searchsorted(sorted_pos,
+                                            1 + lwr[below] - agent_width,
+                                            side="right")
+        wrap_stop[below] = len(sorted_pos)
+        ## don't count an agent twice
+        wrap_start[below] = np.maximum(wrap_start[below], stop[below])
+        above = upr > 1 # if near upper boundary
+        wrap_stop[above] = np.searchsorted(sorted_pos, upr[above] - 1,
+                                           side="left")
+        wrap_stop[above] = np.minimum(wrap_stop[above], start[above])
+        return start, stop, wrap_start, wrap_stop
+
+    def query(self, centers, encounter_width):
+        '''Find the agents encountered by windows of encounter_width
+        around each of the centers.
+
+        Returns (indptr, indices) in CSR form: the agents encountered by
+        window i are indices[indptr[i]:indptr[i+1]], given as positions in
+        the array the index was built from.
+
+        '''
+        centers = np.asarray(centers, dtype=float)
+        start, stop, wrap_start, wrap_stop = self.ranges(centers,
+                                                         encounter_width)
+        n_main = np.maximum(stop - start, 0)
+        n_wrap = np.maximum(wrap_stop - wrap_start, 0)
+        counts = n_main + n_wrap
+        indptr = np.zeros(len(centers) + 1, dtype=np.int64)
+        np.cumsum(counts, out=indptr[1:])
+        window = np.repeat(np.arange(len(centers)), counts)
+        offset = np.arange(indptr[-1]) - indptr[window]
+        in_main = offset < n_main[window]
+        sorted_idx = np.where(in_main,
+                              start[window] + offset,
+                              wrap_start[window] + offset - n_main[window])
+        return indptr, self.order[sorted_idx]
+
+    def pairs(self, centers, encounter_width):
+        '''Like query, but returns (window index, agent index) for every
+        encounter.
+
+        '''
+        indptr, indices = self.query(centers, encounter_width)
+        return np.repeat(np.arange(len(indptr) - 1), np.diff(indptr)), indices
@@ -1,103 +1,254 @@
 import numpy as np
 
+
+def constrain_to_unit(x):
+    '''Clamp every entry to [0,1]'''
+    return np.clip(x, 0, 1)
+
+def bound_to_set(on_line, points):
+    '''Move each row of points that falls above the bounding line to the
+    closest point on the line. Each distinct point is only projected
+    once.
+
+    '''
+    if len(points) > 1:
+        unique, inverse = np.unique(points, axis=0, return_inverse=True)
+        if len(unique) < len(points):
+            return bound_to_set(on_line, unique)[inverse.reshape(-1)]
+    # Calculate distance to each point on the line
+    to_line = ((on_line[np.newaxis,:,:] - points[:,np.newaxis,:])**2).sum(axis=2)
+    closest_on_line = on_line[to_line.argmin(axis=1),:]
+    diff = closest_on_line - points
+    above = (diff > 0).all(axis=1) # falls above line
+    return np.where(above[:,np.newaxis], points, closest_on_line)
+
+
+class TradeOffProjection(object):
+    '''Projects affinities onto the trade-off curve
+    ((1-s)^shape, s^shape). The curve is built once per shape and
+    shared between models; use get_tradeoff_projection.
+
+    '''
+
+    def __init__(self, shape):
+        self.shape = shape
+        vec = np.array(np.arange(0.0,1.1,0.01))
+        max_x = np.array(list(map(lambda s: (1-s)**shape, vec)))
+        max_y = np.array(list(map(lambda s: (s)**shape, vec)))
+        bounding_line = np.array([max_x,max_y]).transpose()
+        bounding_line.flags.writeable = False
+        self.bounding_line = bounding_line
+
+    def project(self, points):
+        '''Project many points, given as the rows of an array'''
+        points = constrain_to_unit(np.array(points, dtype=float, ndmin=2))
+        return bound_to_set(self.bounding_line, points)
+
+
+_projections = {}
+
+def get_tradeoff_projection(shape):
+    '''Return the shared TradeOffProjection for shape'''
+    if shape not in _projections:
+        _projections[shape] = TradeOffProjection(shape)
+    return _projections[shape]
+
+
 class EvolvableVector(object):
     '''A class to implement an evolving vector. Returns a mutated
-    version of the vector when copied'''
+    version of the vector when copied. The vector is read-only, so an
+    unmutated copy is the same object.'''
+    __slots__ = ("vector", "mutation_size", "mutation_frequency", "rng")
 
-    def __init__(self, vector,  mutation_size, mutation_frequency):
+    def __init__(self, vector,  mutation_size, mutation_frequency,
+                 rng=np.random):
         '''
         Args:
-        
+
         vector (np.array): the vector that should be evolving
         mutation_size (float): size of mutational jumps
         mutation_frequency (float): probability of a jump
+        rng: the source of randomness, np.random or a RandomStream
         '''
-        
+
         self.vector = self.constrain(vector)
+        self.vector.flags.writeable = False
         self.mutation_size = mutation_size
         self.mutation_frequency = mutation_frequency
+        self.rng = rng
 
     def __str__(self):
         return self.vector.__str__()
-    
+
     def mutate(self, vector):
         '''
         Step through the vector, make mutations to each entry.
         '''
-        def get_sign(x):
-            if x:
-                return np.random.choice([ 1, -1])
-            else:
-                return 0
-            
-        to_mutate = np.random.binomial(1, self.mutation_frequency, len(vector))
-        signs =  map(get_sign, to_mutate)
-        mutations = np.array(list(map(lambda x: x*self.mutation_size, signs)))
-        return vector + mutations
+        to_mutate = self.rng.binomial(1, self.mutation_frequency, len(vector))
+        signs = self.rng.choice([1, -1], len(vector))
+        return vector + to_mutate * signs * self.mutation_size
 
     def constrain(self, vector):
-        def constrainer(x):
-            if x < 0:
-                return 0
-            if x > 1:
-                return 1
-            return x
-        return np.array( list( map(constrainer, vector)))
+        return constrain_to_unit(np.asarray(vector, dtype=float))
 
     def copy(self):
         '''
         Return a new EvolvableVector with mutated parameters.
         '''
         new_vector = self.mutate(self.vector.copy())
+        if np.array_equal(new_vector, self.vector):
+            return self
         new_vector = self.constrain(new_vector)
         return EvolvableVector(new_vector,
                                self.mutation_size,
-                               self.mutation_frequency)
-    
+                               self.mutation_frequency,
+                               self.rng)
+
 
 
 
 class EvolvableVectorConstrained(EvolvableVector):
     """bounding_line is an array of shape (2,X)
     """
+    __slots__ = ("bounding_line",)
+
     def __init__(self,
                  vector,
                  mutation_size,
                  mutation_frequency,
-                 bounding_line):
-        
+                 bounding_line,
+                 rng=np.random):
+
         self.bounding_line = bounding_line
-        EvolvableVector.__init__(self, vector,  mutation_size, mutation_frequency)
+        EvolvableVector.__init__(self, vector,  mutation_size, mutation_frequency,
+                                 rng)
 
     def constrain(self, vector):
-        def constrainer(x):
-            if x < 0:
-                return 0
-            if x > 1:
-                return 1
-            return x
-
-        def bound_to_set(on_line, the_point):
-            # Calculate distance to point
-            to_line = ((on_line - the_point)**2).sum(axis=1)
-            closest_on_line = on_line[to_line.argmin(),:]
-            diff = closest_on_line - the_point
-            if (diff > 0).all(): # falls above line
-                return the_point
-            else:
-                return closest_on_line
-        
-        vector = np.array( list( map(constrainer, vector)))
-        return bound_to_set(self.bounding_line, vector)
+        vector = EvolvableVector.constrain(self, vector)
+        return bound_to_set(self.bounding_line, vector[np.newaxis,:])[0]
 
     def copy(self):
         '''
         Return a new EvolvableVector with mutated parameters.
         '''
         new_vector = self.mutate(self.vector.copy())
+        if np.array_equal(new_vector, self.vector):
+            return self
         new_vector = self.constrain(new_vector)
         return EvolvableVectorConstrained(new_vector,
                                           self.mutation_size,
                                           self.mutation_frequency,
-                                          self.bounding_line)
-        
+                                          self.bounding_line,
+                                          self.rng)
+
+
+class EvolvablePopulation(object):
+    '''A population of evolving vectors, held as the rows of a
+    matrix. Mutates many offspring at once. The matrix is read-only.
+
+    '''
+
+    def __init__(self, matrix, mutation_size, mutation_frequency,
+                 rng=np.random):
+        '''
+        Args:
+
+        matrix (np.array): one row per vector
+        mutation_size (float): size of mutational jumps
+        mutation_frequency (float): probability of a jump
+        rng: the source of randomness, np.random or a RandomStream
+        '''
+        self.matrix = self.constrain(np.array(matrix, dtype=float, ndmin=2))
+        self.matrix.flags.writeable = False
+        self.mutated = None
+        self.mutation_size = mutation_size
+        self.mutation_frequency = mutation_frequency
+        self.rng = rng
+
+    def __len__(self):
+        return len(self.matrix)
+
+    def __getitem__(self, i):
+        return self.view(i)
+
+    def mutate(self, matrix):
+        '''Mutate each entry with probability mutation_frequency, by
+        mutation_size in a random direction.
+
+        '''
+        to_mutate = self.rng.binomial(1, self.mutation_frequency, matrix.shape)
+        signs = self.rng.choice([1, -1], matrix.shape)
+        return matrix + to_mutate * signs * self.mutation_size
+
+    def constrain(self, matrix):
+        return constrain_to_unit(matrix)
+
+    def offspring(self, rows=None):
+        '''Return a new population of mutated copies of the given rows
+        (all rows by default). Its mutated attribute marks the rows
+        where a mutation was drawn; the others equal their parent.
+
+        '''
+        if rows is None:
+            parents = self.matrix
+        else:
+            parents = self.matrix[rows]
+        mutated = self.mutate(parents)
+        offspring = self.like(mutated) # constrained by like
+        offspring.mutated = (mutated != parents).any(axis=1)
+        return offspring
+
+    def like(self, matrix):
+        '''A new population with the same mutation parameters'''
+        return EvolvablePopulation(matrix,
+                                   self.mutation_size,
+                                   self.mutation_frequency,
+                                   self.rng)
+
+    def view(self, i):
+        '''An EvolvableVector for row i that shares this population's
+        memory.
+
+        '''
+        vector = EvolvableVector.__new__(EvolvableVector)
+        vector.vector = self.matrix[i]
+        vector.mutation_size = self.mutation_size
+        vector.mutation_frequency = self.mutation_frequency
+        vector.rng = self.rng
+        return vector
+
+
+class EvolvablePopulationConstrained(EvolvablePopulation):
+    """A population of EvolvableVectorConstrained, constrained by a
+    TradeOffProjection, which projects the whole matrix at once.
+    """
+
+    def __init__(self,
+                 matrix,
+                 mutation_size,
+                 mutation_frequency,
+                 projection,
+                 rng=np.random):
+
+        self.projection = projection
+        EvolvablePopulation.__init__(self, matrix, mutation_size,
+                                     mutation_frequency, rng)
+
+    def constrain(self, matrix):
+        return self.projection.project(matrix)
+
+    def like(self, matrix):
+        return EvolvablePopulationConstrained(matrix,
+                                              self.mutation_size,
+                                              self.mutation_frequency,
+                                              self.projection,
+                                              self.rng)
+
+    def view(self, i):
+        vector = EvolvableVectorConstrained.__new__(EvolvableVectorConstrained)
+        vector.vector = self.matrix[i]
+        vector.mutation_size = self.mutation_size
+        vector.mutation_frequency = self.mutation_frequency
+        vector.bounding_line = self.projection.bounding_line
+        vector.rng = self.rng
+        return vector
@@ -0,0 +1,166 @@
+'''
+Forks many spike-in runs from one burned-in model.
+
+The spike-in models only differ from their base model by the phage
+added in add_spike_in. So rather than building and running the same
+population once for every spike-in, the base model is run up to the
+spike-in step once, cloned, and each clone gets its own spike-in.
+'''
+import io
+import pickle
+from collections import OrderedDict
+
+import numpy as np
+
+from .rm_abm import BaseModel, SpikeIn, TradeOff, TradeOffSpikeIn
+from .array_model import (ArrayBaseModel, ArraySpikeIn, ArrayTradeOff,
+                          ArrayTradeOffSpikeIn)
+from .timeseries_aggregator import TimeseriesRunner
+from .parallel import run_in_pool
+
+BURN_IN_MODELS = {SpikeIn : BaseModel,
+                  TradeOffSpikeIn : TradeOff,
+                  ArraySpikeIn : ArrayBaseModel,
+                  ArrayTradeOffSpikeIn : ArrayTradeOff}
+
+SPIKE_IN_PARAMETERS = ["spike_in_affinity_0", "spike_in_methylation"]
+
+
+def get_burn_in_model(model_class):
+    '''Return the class a spike-in model class is forked from'''
+    try:
+        return BURN_IN_MODELS[model_class]
+    except KeyError:
+        raise ValueError("Can't fork %s" % model_class.__name__)
+
+
+class ModelFork(object):
+    '''A saved model state that can be cloned many times.
+
+    Read-only arrays (the affinity vectors) are shared by the clones
+    rather than copied. Everything else is copied, so the clones run
+    independently.
+    '''
+
+    def __init__(self, model):
+        collector = model.datacollector
+        self.model_reporters = dict(collector.model_reporters)
+        self.agent_reporters = dict(collector.agent_reporters)
+        self.shared = []
+        f = io.BytesIO()
+        pickler = pickle.Pickler(f, protocol=pickle.HIGHEST_PROTOCOL)
+        pickler.persistent_id = self.persistent_id
+        pickler.dump(model)
+        self.state = f.getvalue()
+
+    def persistent_id(self, obj):
+        if isinstance(obj, np.ndarray) and not obj.flags.writeable:
+            self.shared.append(obj)
+            return len(self.shared) - 1
+        return None
+
+    def clone(self):
+        '''A new copy of the model'''
+        unpickler = pickle.Unpickler(io.BytesIO(self.state))
+        unpickler.persistent_load = lambda i: self.shared[i]
+        model = unpickler.load()
+        model.datacollector.set_reporters(self.model_reporters,
+                                          self.agent_reporters)
+        # otherwise every clone would draw the same rest of the block
+        model.rng.reset()
+        return model
+
+
+def spike_in(model, spike_in_affinity_0=0, spike_in_methylation=0):
+    '''Add spike-in phage to model, as SpikeIn does when it is made'''
+    model.spike_in_affinity_0 = spike_in_affinity_0
+    model.spike_in_methylation = spike_in_methylation
+    model.add_spike_in(spike_in_affinity_0, spike_in_methylation)
+    return model
+
+
+def fork_spike_ins(model, spike_ins):
+    '''Yield a clone of model for each dict of spike-in parameters in
+    spike_ins, with its spike-in added.
+
+    '''
+    fork = ModelFork(model)
+    for kwargs in spike_ins:
+        yield spike_in(fork.clone(), **kwargs)
+
+
+class ForkedTimeseriesRunner(TimeseriesRunner):
+    '''A TimeseriesRunner for SpikeIn and TradeOffSpikeIn (or their
+    array versions) that runs each combination of the other parameters
+    once up to fork_step, and forks every spike-in from it. Gives the
+    same data frames as TimeseriesRunner, where the steps before
+    fork_step are shared by the runs of a fork.
+
+    fork_step 0 adds the spike-in when the model is made, as SpikeIn
+    does.
+    '''
+
+    def __init__(self, model_class, parameters, max_steps, iterations,
+                 fork_step=0, **kwargs):
+        TimeseriesRunner.__init__(self, model_class, parameters, max_steps,
+                                  iterations, **kwargs)
+        self.burn_in_class = get_burn_in_model(self.model_class)
+        self.fork_step = fork_step
+
+    def groups(self):
+        '''The runs, grouped by the burned-in model they are forked
+        from: a list of (kwargs, [(key, kwargs), ...]).
+
+        '''
+        groups = OrderedDict()
+        for key, kwargs in self.tasks():
+            iteration = key[1]
+            base = tuple((param, value) for param, value in kwargs.items()
+                         if param not in SPIKE_IN_PARAMETERS)
+            groups.setdefault((base, iteration), (kwargs, []))[1].append(
+                (key, kwargs))
+        return list(groups.values())
+
+    def create_burn_in(self, kwargs):
+        model = self.burn_in_class(on_absorbing=self.on_absorbing, **kwargs)
+        model.datacollector = self.create_collector()
+        model.datacollector.final_step = self.max_steps - 1
+        return model
+
+    def run_group(self, group, aggregated_only=False):
+        '''Burn in the model of a group, then run each of its forks.
+        Returns the tuples yielded by dataframes.
+
+        '''
+        kwargs, tasks = group
+        model = self.create_burn_in(kwargs)
+        model.datacollector.keep_agents = not aggregated_only
+        for i in range(self.fork_step):
+            model.step()
+        spike_ins = [{param : task_kwargs[param]
+                      for param in SPIKE_IN_PARAMETERS if param in task_kwargs}
+                     for _, task_kwargs in tasks]
+        results = []
+        for (key, _), forked in zip(tasks, fork_spike_ins(model, spike_ins)):
+            results.append(self.frames(key, forked, aggregated_only))
+        return results
+
+    def run_group_task(self, task):
+        group, aggregated_only = task
+        return self.run_group(group, aggregated_only)
+
+    def dataframes(self, workers=None, chunksize=1, ordered=True,
+                   aggregated_only=False):
+        '''As TimeseriesRunner.dataframes. With workers, each worker
+        runs whole groups of forks.
+
+        '''
+        tasks = [(group, aggregated_only) for group in self.groups()]
+        if workers is None:
+            results = map(self.run_group_task, tasks)
+        else:
+            results = run_in_pool(self, "run_group_task", tasks, workers,
+                                  chunksize, ordered)
+        for group_frames in results:
+            for frames in group_frames:
+                yield frames
@@ -1,7 +1,16 @@
 import os
+import numpy as np
+import pandas as pd
 from pandas import HDFStore
+from pandas.api.types import is_integer_dtype, is_string_dtype
 from uuid import uuid4
 
+# the columns that are indexed, and can be selected on, by default
+DATA_COLUMNS = ["Run", "Step", "breed"]
+# agent reporters that may be None, e.g. the methylation of phage
+# with epi_inheritance between 0 and 1
+NULLABLE_COLUMNS = ["methylation", "last_infected", "parent", "infected"]
+
 def hdf_exist_p(store, data_name):
     """Tests if hdf5 storage exists and contains the data_name"""
     if not data_name.startswith("/"):
@@ -11,22 +20,191 @@ def hdf_exist_p(store, data_name):
             return data_name in hdf.keys()
     else:
         return False
-    
-    
-def write_to_hdf(store_path, df, data_name, hash_id=None):
-    """Adds a hash_ID to the results, writes to hdf5. Initializes file if
-    needed.
+
+
+def compact_dtypes(df, float_dtype=np.float64, exact=(), nullable=()):
+    """The dtypes df is stored with: numeric object columns (e.g. a
+    reporter that is sometimes None, such as parent) and the numeric
+    columns in nullable become float64, so that later rows can be
+    missing. Other integers that fit become int32 and floats, other
+    than those in exact, become float_dtype (float32 halves their size
+    but keeps only about 7 digits). Strings are stored as objects.
 
     """
-    if not hash_id:
-        df["hash"] = uuid4().hex
-    else:
-        df["hash"] = hash_id
-    cols = df.columns
-    if not hdf_exist_p(store_path, data_name):
-        with HDFStore(store_path) as hdf:
-            hdf.put(data_name, df, columns = cols, 
-                    format='table', data_columns=True)
-    else:
-        with HDFStore(store_path) as hdf:
-            hdf.append(data_name, df, format='table', data_columns=True)
+    dtypes = {}
+    for col in df.columns:
+        values = df[col]
+        if is_string_dtype(values.dtype):
+            try:
+                pd.to_numeric(values)
+            except (ValueError, TypeError):
+                dtypes[col] = object
+            else:
+                dtypes[col] = np.float64
+            continue
+        kind = values.dtype.kind
+        if col in nullable and kind in "iuf":
+            dtypes[col] = np.float64
+        elif kind in "iu":
+            info = np.iinfo(np.int32)
+            small = len(values) == 0 or \
+                (values.min() >= info.min and values.max() <= info.max)
+            dtypes[col] = np.int32 if small else np.int64
+        elif kind == "f":
+            dtypes[col] = np.float64 if col in exact else float_dtype
+        else:
+            dtypes[col] = values.dtype
+    return dtypes
+
+
+class HDFWriter(object):
+    """Appends data frames to one table of an hdf5 store.
+
+    The store is opened once and kept open, and the data frames are
+    buffered until they take buffer_bytes, so that each append to the
+    table is large. The table is compressed, and its dtypes are fixed
+    by compact_dtypes on the first write, keeping the data_columns
+    exact and the nullable columns float. Floats are kept as float64
+    unless float_dtype is given. Only data_columns (those of them in
+    the data) can be selected on, and they are indexed when the writer
+    is closed. With buffer_rows, the buffer is also written once it
+    holds that many rows.
+
+    Rather than a hash column, the rows written are recorded in the
+    table's attributes: attrs.runs is a list of dicts of hash, start
+    and stop row (see read_hdf_runs).
+
+    Use as a context manager, or call close.
+    """
+
+    def __init__(self, store_path, data_name, hash_id=None,
+                 data_columns=DATA_COLUMNS, complib="blosc", complevel=5,
+                 buffer_bytes=64 * 2**20, float_dtype=np.float64,
+                 string_size=16, nullable=NULLABLE_COLUMNS,
+                 buffer_rows=None):
+        self.data_name = data_name
+        self.hash_id = hash_id or uuid4().hex
+        self.data_columns = list(data_columns)
+        self.buffer_bytes = buffer_bytes
+        self.buffer_rows = buffer_rows
+        self.float_dtype = float_dtype
+        self.string_size = string_size
+        self.nullable = list(nullable)
+        self.store = HDFStore(store_path, mode="a", complib=complib,
+                              complevel=complevel)
+        self.dtypes = None
+        if data_name in self.store:
+            self.start = self.store.get_storer(data_name).nrows
+        else:
+            self.start = 0
+        self.rows = 0
+        self.buffer = []
+        self.buffered = 0
+        self.buffered_rows = 0
+
+    def append(self, df):
+        self.buffer.append(df)
+        self.buffered += df.memory_usage(deep=True).sum()
+        self.buffered_rows += len(df)
+        if self.buffered >= self.buffer_bytes or\
+           (self.buffer_rows is not None and
+            self.buffered_rows >= self.buffer_rows):
+            self.flush()
+
+    def cast(self, df):
+        if self.dtypes is None:
+            if self.data_name in self.store:
+                # carry on with the dtypes of the table
+                stored = self.store.select(self.data_name, stop=0).dtypes
+                self.dtypes = {col : object if is_string_dtype(stored[col])
+                               else stored[col] for col in df.columns}
+            else:
+                self.dtypes = compact_dtypes(df, self.float_dtype,
+                                             self.data_columns, self.nullable)
+        for col, dtype in self.dtypes.items():
+            if is_integer_dtype(dtype) and len(df) > 0:
+                if df[col].isnull().any():
+                    raise ValueError("Column %s has missing values but is "
+                                     "stored as %s, make it nullable"
+                                     % (col, np.dtype(dtype)))
+                values = pd.to_numeric(df[col])
+                info = np.iinfo(dtype)
+                if values.min() < info.min or values.max() > info.max:
+                    raise ValueError("Column %s doesn't fit in %s"
+                                     % (col, np.dtype(dtype)))
+        return df.astype(self.dtypes)
+
+    def flush(self):
+        """Write the buffered data frames"""
+        if len(self.buffer) == 0:
+            return
+        df = self.cast(pd.concat(self.buffer, ignore_index=True))
+        self.buffer = []
+        self.buffered = 0
+        self.buffered_rows = 0
+        strings = [col for col in df.columns if df[col].dtype == object]
+        data_columns = [col for col in self.data_columns if col in df.columns]
+        min_itemsize = None
+        if self.data_name not in self.store and len(strings) > 0:
+            # later data frames may have longer strings
+            longest = {col : int(df[col].astype(str).str.len().max())
+                       for col in strings}
+            min_itemsize = {col : max(self.string_size, length)
+                            for col, length in longest.items()
+                            if col in data_columns}
+            rest = [length for col, length in longest.items()
+                    if col not in data_columns]
+            if rest:
+                min_itemsize["values"] = max([self.string_size] + rest)
+        self.store.append(self.data_name, df, format="table",
+                          data_columns=data_columns,
+                          min_itemsize=min_itemsize, index=False)
+        self.rows += len(df)
+
+    def close(self):
+        if not self.store.is_open:
+            return
+        try:
+            self.flush()
+        finally:
+            try:
+                if self.rows > 0:
+                    self.finish()
+            finally:
+                self.store.close()
+
+    def finish(self):
+        """Record the rows written and index the data columns"""
+        storer = self.store.get_storer(self.data_name)
+        runs = list(getattr(storer.attrs, "runs", []))
+        runs.append({"hash" : self.hash_id, "start" : self.start,
+                     "stop" : self.start + self.rows})
+        storer.attrs.runs = runs
+        columns = [col for col in self.data_columns
+                   if col in storer.data_columns]
+        self.store.create_table_index(self.data_name, columns=columns,
+                                      optlevel=6, kind="medium")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_hdf_runs(store_path, data_name):
+    """The hash and rows of each writing of data_name, as a data
+    frame"""
+    with HDFStore(store_path, mode="r") as hdf:
+        runs = getattr(hdf.get_storer(data_name).attrs, "runs", [])
+    return pd.DataFrame(runs, columns=["hash", "start", "stop"])
+
+
+def write_to_hdf(store_path, df, data_name, hash_id=None, **kwargs):
+    """Writes df to hdf5 with an HDFWriter, recording hash_id (or a new
+    hash) for its rows. Initializes file if needed. Writing many data
+    frames is faster with one HDFWriter.
+
+    """
+    with HDFWriter(store_path, data_name, hash_id, **kwargs) as writer:
+        writer.append(df)
@@ -1,5 +1,6 @@
-import functools
 from .rm_abm import Phage
+from .lineage import LINEAGE_VARIABLES, LineageIndex
+from .datacollection import columnar
 import numpy as np
 import pandas as pd
 import statsmodels
@@ -12,6 +13,7 @@ def get_affinity(genotype):
     is a bacteria, returns the affinity of the phage that infected it, or
     -1 if it is not infected.
     """
+    @columnar(lambda agents: agents.affinity(genotype))
     def wrapper(agent):
         if agent.breed == "Phage":
             return agent.affinity.vector[genotype]
@@ -22,14 +24,14 @@ def get_affinity(genotype):
 
 def avg_phage_affinity(model):
     """Gets the average phage affinity for genotype 0"""
-    phage = model.schedule.agents_by_breed[Phage].values()
-    affinities = [i.affinity.vector[0] for i in phage]
+    affinities = model.phage_arrays()["affinity"][:, 0]
     if len(affinities) > 0:
-        return functools.reduce(lambda x, y: x+y, affinities)/len(affinities)
+        return affinities.mean()
     else:
         return np.nan
 
 
+@columnar(lambda agents: agents.parent)
 def get_parent(a):
     '''Get the parent of a phage agent, otherwise, return -1'''
     if a.breed == "Phage":
@@ -37,6 +39,7 @@ def get_parent(a):
     else:
         return np.nan
     
+@columnar(lambda agents: agents.infected_id)
 def get_infected_ID(a):
     '''Get the ID of a phage infecting a bacteria, otherwise, return -1'''
     if a.breed == "Phage":
@@ -69,30 +72,21 @@ def get_all_founders(experiment, meth):
     latest ancestor that had the opposite pattern
 
     '''
-    def get_first_item(series):
-        try:
-            return list(series)[0]
-        except IndexError:
-            return None
     invaders = experiment[np.logical_and(experiment.breed=="Phage", 
                                          experiment.methylation == meth)]
     last_step = invaders.Step.max()
     final_invaders = invaders[invaders.Step == last_step].AgentID
-    founders = set([]) # These will be the first of a lineage that has the opposite of the supplied methylation
-    for invader in final_invaders:
-        parent = invaders[invaders.AgentID == invader].parent # multiple timesteps
-        parent = get_first_item(parent)
-        while parent in invaders.AgentID:
-            parent = invaders[invaders.AgentID == parent].parent # find parent of parent
-            parent = get_first_item(parent)
-        founders.add(parent)
+    # These will be the first of a lineage that has the opposite of the supplied methylation
+    founders = LineageIndex(experiment).nearest_ancestors(final_invaders,
+                                                          invaders.AgentID)
     founder_df = experiment[experiment.AgentID.isin(founders)]  # each ID can have multiple steps
     return founder_df
 
 def get_population_means(experiment, variables, methylation = "both"):
     '''
     Calculate the mean, median, and standard deviation of the affinity
-    of phage for genotype 0 grouped by step
+    of phage for genotype 0 grouped by step. The model reporters of
+    online_stats.affinity_reporters give the same without agent data.
     '''
     phage = experiment[experiment.breed == "Phage"]
     if methylation == "both":
@@ -101,13 +95,8 @@ def get_population_means(experiment, variables, methylation = "both"):
         phage = phage[phage.methylation == methylation]
     grouped = phage.groupby(["Step"] + variables)
     affinity_by_step = grouped.affinity_0.\
-        agg({"pop_mean" : np.mean,
-             "pop_std" : np.std,
-             "pop_median" : np.median,
-             "pop_max" : np.max,
-             "pop_min" : np.min#,
-             #"ecdf" : statsmodels.tools.tools.ECDF
-        })
+        agg(["mean", "std", "median", "max", "min"])
+    affinity_by_step.columns = ["pop_" + c for c in affinity_by_step.columns]
     return affinity_by_step.reset_index()
     
 
@@ -150,16 +139,13 @@ def unpack_params(parameter_values):
 ## Used for predictivity analyses
 
 def get_descendents(data, ID):
+    '''The set of ID (an int or a set of ints) and the IDs of all their
+    descendents in data'''
     if type(ID) is int:
         lineage_IDs = [ID]
     if type(ID) is set:
         lineage_IDs = list(ID)
-    descendents = data[data.parent.isin(lineage_IDs)]
-    while descendents.shape[0] > 0:
-        child_IDs = list(descendents.AgentID)
-        lineage_IDs = lineage_IDs + child_IDs
-        descendents = data[data.parent.isin(child_IDs)]
-    return set(lineage_IDs)
+    return set(LineageIndex(data).descendents(lineage_IDs).tolist())
 
 
 def get_manipulated_descendents(agent_dataframe):
@@ -184,6 +170,13 @@ def get_manipulated_descendents(agent_dataframe):
          "population_affinity_0_std" : [np.std(agent_dataframe[agent_dataframe.Step == last_step].affinity_0)],
          "population_affinity_1_std" : [np.std(agent_dataframe[agent_dataframe.Step == last_step].affinity_1)]})
 
+def get_lineage_descendents(model_dataframe):
+    '''What get_manipulated_descendents gives, read from the last step
+    of the lineage model reporters (lineage.lineage_reporters)'''
+    last_step = model_dataframe.Step.max()
+    last = model_dataframe[model_dataframe.Step == last_step]
+    return last[LINEAGE_VARIABLES].reset_index(drop=True)
+
 ## Founder analysis
 
 def founders_analysis(df):
@@ -0,0 +1,45 @@
+import numpy as np
+
+
+def choose_targets(window, encountered, probs, rng=np.random):
+    '''Each encounter infects with probability probs. Every phage goes
+    for one of its successful encounters, chosen at random. This is the
+    same as shuffling the encounters and taking the first success.
+
+    Args:
+    window (np.array): index of the phage in each encounter
+    encountered (np.array): index of the bacteria in each encounter
+    probs (np.array): infection probability of each encounter
+    rng: the source of randomness, np.random or a RandomStream
+
+    Returns (phage, target), the phage that reached a target and the
+    index of that target.
+    '''
+    success = rng.random(len(probs)) < probs
+    window = window[success]
+    encountered = encountered[success]
+    shuffled = rng.permutation(len(window))
+    chosen, first = np.unique(window[shuffled], return_index=True)
+    return chosen, encountered[shuffled[first]]
+
+
+def resolve_infections(window, encountered, probs, infected, rng=np.random):
+    '''Resolve the infections of all phage in a step at once.
+
+    Phage act in a random order. The first phage to reach an
+    uninfected bacterium infects it. A phage that reaches a bacterium
+    that is already infected dies, as does a phage that infects.
+
+    Args:
+    window, encountered, probs, rng: as in choose_targets
+    infected (np.array): whether each bacterium is already infected
+
+    Returns (dead, infecting, targets). dead are the phage that reached
+    a target. The phage infecting[i] infects the bacterium targets[i].
+    '''
+    chosen, target = choose_targets(window, encountered, probs, rng)
+    order = rng.permutation(len(chosen))
+    _, first = np.unique(target[order], return_index=True)
+    winners = order[first]
+    winners = winners[~infected[target[winners]]]
+    return chosen, chosen[winners], target[winners]
@@ -0,0 +1,174 @@
+'''
+Follows the descendents of a lineage of phage as the model runs.
+
+Every phage carries a lineage tag that its progeny inherit at burst.
+The initial phage are the FOUNDING_LINEAGE and the spike-in phage the
+SPIKE_IN_LINEAGE (-1, the parent they are given). A LineageTracker
+gives, at every step, what helper_functions.get_manipulated_descendents
+finds in the agent data up to that step, without collecting any agent
+data.
+
+LineageIndex answers the same kind of questions from agent data after
+a run, for the helper_functions that used to scan the data once per
+generation.
+'''
+import numpy as np
+
+FOUNDING_LINEAGE = 0
+SPIKE_IN_LINEAGE = -1
+
+LINEAGE_VARIABLES = ["descendents", "descendents_in_0",
+                     "n_phage", "n_phage_in_0",
+                     "affinity_in_0_for_0", "affinity_in_0_for_1",
+                     "affinity_in_1_for_0", "affinity_in_1_for_1",
+                     "population_affinity_0", "population_affinity_1",
+                     "population_affinity_0_std", "population_affinity_1_std"]
+
+
+def nan_ratio(a, b):
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(b > 0, a / np.maximum(b, 1), np.nan)
+
+
+class LineageTracker(object):
+    '''Summaries of one lineage, updated once per step.
+
+    As in get_manipulated_descendents, n_phage counts every agent, the
+    affinity_in_g_for_k are means over all the steps so far, and the
+    population affinities include the phage inside bacteria.
+    '''
+
+    def __init__(self, lineage=SPIKE_IN_LINEAGE):
+        self.lineage = lineage
+        self.step = None
+        self.values = {}
+        # affinity sums of the lineage by last_infected and genotype
+        self.sums = np.zeros((2, 2))
+        self.counts = np.zeros(2)
+
+    def update(self, model):
+        '''The summaries at the model's current step'''
+        if model.schedule.steps == self.step:
+            return self.values
+        self.step = model.schedule.steps
+        phage = model.phage_arrays()
+        hosted = model.phage_arrays(infecting=True)
+        in_lineage = phage["lineage"] == self.lineage
+        in_0 = phage["last_infected"] == 0
+        for g in [0, 1]:
+            rows = in_lineage & (phage["last_infected"] == g)
+            self.sums[g] += phage["affinity"][rows].sum(axis=0)
+            self.counts[g] += rows.sum()
+        means = nan_ratio(self.sums, self.counts[:, None])
+        population = np.concatenate([phage["affinity"], hosted["affinity"]])
+        values = {"descendents" : int(in_lineage.sum()),
+                  "descendents_in_0" : int((in_lineage & in_0).sum()),
+                  "n_phage" : model.schedule.get_agent_count(),
+                  "n_phage_in_0" : int(in_0.sum())}
+        for g in [0, 1]:
+            for k in [0, 1]:
+                values["affinity_in_%i_for_%i" % (g, k)] = means[g, k]
+        for k in [0, 1]:
+            if len(population) > 0:
+                mean, std = population[:, k].mean(), population[:, k].std()
+            else:
+                mean, std = np.nan, np.nan
+            values["population_affinity_%i" % k] = mean
+            values["population_affinity_%i_std" % k] = std
+        self.values = values
+        return values
+
+
+def get_lineage_tracker(model, lineage=SPIKE_IN_LINEAGE):
+    '''The model's tracker of lineage, made on first use'''
+    if lineage not in model.lineage_trackers:
+        model.lineage_trackers[lineage] = LineageTracker(lineage)
+    return model.lineage_trackers[lineage]
+
+
+def lineage_reporters(lineage=SPIKE_IN_LINEAGE):
+    '''Model reporters for each of LINEAGE_VARIABLES. The means over
+    steps only include the steps that were reported.
+
+    '''
+    def reporter(var):
+        return lambda m : get_lineage_tracker(m, lineage).update(m)[var]
+    return {var : reporter(var) for var in LINEAGE_VARIABLES}
+
+
+class LineageIndex(object):
+    '''The family tree of the phage in agent data, for lineage queries
+    after a run.
+
+    Each agent and each parent that isn't an agent (such as -1, the
+    parent of the spike-ins) is a node. The parent of every node is
+    kept in an array, and its children in CSR form: the children of
+    node i are children[indptr[i]:indptr[i+1]]. Queries take time
+    linear in the number of agents.
+    '''
+
+    def __init__(self, agent_data):
+        '''agent_data needs AgentID and parent columns. Rows without a
+        parent (bacteria) are left out.'''
+        phage = agent_data[agent_data.parent.notnull()]
+        ids, first = np.unique(phage.AgentID.values, return_index=True)
+        parents = phage.parent.values[first].astype(np.int64)
+        self.nodes = np.unique(np.concatenate([ids, parents]))
+        n = len(self.nodes)
+        self.parent = np.full(n, -1, dtype=np.int64) # -1: no parent
+        self.parent[np.searchsorted(self.nodes, ids)] =\
+            np.searchsorted(self.nodes, parents)
+        children = np.flatnonzero(self.parent >= 0)
+        order = np.argsort(self.parent[children], kind="stable")
+        self.children = children[order]
+        self.indptr = np.zeros(n + 1, dtype=np.int64)
+        self.indptr[1:] = np.cumsum(np.bincount(self.parent[children],
+                                                minlength=n))
+
+    def index(self, ids):
+        '''The nodes of those ids that are in the index'''
+        ids = np.asarray(ids, dtype=np.int64).ravel()
+        if len(self.nodes) == 0:
+            return np.empty(0, dtype=np.int64)
+        idx = np.minimum(np.searchsorted(self.nodes, ids), len(self.nodes) - 1)
+        return idx[self.nodes[idx] == ids]
+
+    def get_children(self, idx):
+        '''The children of all the nodes idx, at once'''
+        starts = self.indptr[idx]
+        lengths = self.indptr[idx + 1] - starts
+        offsets = np.cumsum(lengths) - lengths
+        positions = np.repeat(starts - offsets, lengths) +\
+                    np.arange(lengths.sum())
+        return self.children[positions]
+
+    def descendents(self, ids):
+        '''ids and the IDs of all their descendents, walking down one
+        generation at a time'''
+        found = [np.asarray(ids, dtype=np.int64).ravel()]
+        frontier = self.index(ids)
+        while len(frontier) > 0:
+            frontier = self.get_children(frontier)
+            found.append(self.nodes[frontier])
+        return np.unique(np.concatenate(found))
+
+    def nearest_ancestors(self, ids, within):
+        '''For each of ids, its closest ancestor that is not one of
+        within (e.g. the founder of a run of phage with one methylation).
+
+        Rather than walking up from each agent, every node points at
+        its parent if it is in within, or else at itself, and pointers
+        are replaced by their targets' pointers until nothing changes,
+        which takes log(depth) passes.
+        '''
+        n = len(self.nodes)
+        inside = np.zeros(n, dtype=bool)
+        inside[self.index(within)] = True
+        up = np.where(inside & (self.parent >= 0), self.parent, np.arange(n))
+        while True:
+            jumped = up[up]
+            if np.array_equal(jumped, up):
+                break
+            up = jumped
+        parents = self.parent[self.index(ids)]
+        return self.nodes[up[parents[parents >= 0]]]
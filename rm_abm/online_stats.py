@@ -0,0 +1,136 @@
+'''
+Summaries of phage affinity, kept by the model as it runs.
+
+RunningStats keeps the count, mean and variance of a stream of values
+with Welford's method (adding a batch at a time, as in Chan et al.),
+and their min and max. It can be merged, e.g. across the steps of a
+run (see aggregators.DescendentsAggregator) or the runs of a parameter
+point.
+
+affinity_reporters are model reporters that give, at every step, what
+helper_functions.get_population_means gives from the agent data,
+optionally for each methylation or last_infected. These are not
+streaming statistics: the phage of a step are all in the model's
+phage arrays, so each step is summarized exactly, with NumPy, and
+nothing is carried from one step to the next.
+'''
+import numpy as np
+
+GROUP_KEYS = [0, 1, -1] # -1 stands in for None
+GROUP_NAMES = {0 : "0", 1 : "1", -1 : "none"}
+
+
+class RunningStats(object):
+    '''Count, mean, variance, min and max of a stream of values'''
+
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0 # sum of squared differences from the mean
+        self.min = np.inf
+        self.max = -np.inf
+
+    def combine(self, n, mean, m2, low, high):
+        if n == 0:
+            return
+        total = self.n + n
+        delta = mean - self.mean
+        self.mean += delta * n / total
+        self.m2 += m2 + delta**2 * self.n * n / total
+        self.n = total
+        self.min = min(self.min, low)
+        self.max = max(self.max, high)
+
+    def update(self, values):
+        '''Add a batch of values'''
+        values = np.asarray(values, dtype=float).ravel()
+        if len(values) > 0:
+            mean = values.mean()
+            self.combine(len(values), mean, ((values - mean)**2).sum(),
+                         values.min(), values.max())
+        return self
+
+    def merge(self, other):
+        self.combine(other.n, other.mean, other.m2, other.min, other.max)
+        return self
+
+    @property
+    def variance(self):
+        '''The sample variance (ddof=1, as pandas)'''
+        return self.m2 / (self.n - 1) if self.n > 1 else np.nan
+
+    @property
+    def std(self):
+        return np.sqrt(self.variance)
+
+    def summary(self):
+        if self.n == 0:
+            return {"mean" : np.nan, "std" : np.nan,
+                    "min" : np.nan, "max" : np.nan}
+        return {"mean" : self.mean, "std" : self.std,
+                "min" : self.min, "max" : self.max}
+
+
+class AffinityStats(object):
+    '''Exact summaries of the affinity of the phage for genotype at the
+    current step, for all phage or for each value of by ("methylation"
+    or "last_infected"). Computed once per step from that step's phage
+    only.
+
+    '''
+
+    def __init__(self, genotype=0, by=None):
+        if by not in (None, "methylation", "last_infected"):
+            raise ValueError("Can't group affinities by %s" % by)
+        self.genotype = genotype
+        self.by = by
+        self.step = None
+        self.values = {}
+
+    def variables(self):
+        '''The names of the summaries, as in get_population_means'''
+        names = ["pop_mean", "pop_std", "pop_median", "pop_max", "pop_min"]
+        if self.by is None:
+            return names
+        return ["%s_%s_%s" % (name, self.by, GROUP_NAMES[key])
+                for key in GROUP_KEYS for name in names]
+
+    def summarize(self, values):
+        '''mean, std (ddof=1, as pandas), median, max and min'''
+        if len(values) == 0:
+            return [np.nan] * 5
+        std = values.std(ddof=1) if len(values) > 1 else np.nan
+        return [values.mean(), std, np.median(values), values.max(),
+                values.min()]
+
+    def update(self, model):
+        '''The summaries at the model's current step'''
+        if model.schedule.steps == self.step:
+            return self.values
+        self.step = model.schedule.steps
+        phage = model.phage_arrays()
+        affinity = phage["affinity"][:, self.genotype]
+        if self.by is None:
+            summaries = self.summarize(affinity)
+        else:
+            summaries = []
+            for key in GROUP_KEYS:
+                summaries += self.summarize(affinity[phage[self.by] == key])
+        self.values = dict(zip(self.variables(), summaries))
+        return self.values
+
+
+def get_affinity_stats(model, genotype=0, by=None):
+    '''The model's AffinityStats, made on first use'''
+    key = (genotype, by)
+    if key not in model.affinity_trackers:
+        model.affinity_trackers[key] = AffinityStats(genotype, by)
+    return model.affinity_trackers[key]
+
+
+def affinity_reporters(genotype=0, by=None):
+    '''Model reporters for the summaries of AffinityStats'''
+    def reporter(var):
+        return lambda m : get_affinity_stats(m, genotype, by).update(m)[var]
+    return {var : reporter(var)
+            for var in AffinityStats(genotype, by).variables()}
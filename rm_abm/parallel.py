@@ -0,0 +1,98 @@
+'''
+Runs the work of a runner across a pool of worker processes.
+
+The runners hold reporters and aggregators that are often lambdas,
+which can't be pickled. So the runner is put in a module global
+before the pool is started, and the workers, which are forked, find
+it there. Only the tasks and the results cross between processes.
+
+A ProcessPoolExecutor only takes the fork context from Python 3.7, so
+older Pythons use a multiprocessing Pool instead.
+'''
+import inspect
+import multiprocessing
+import random
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+_shared = None # the object the workers call, inherited through fork
+
+
+def _run_chunk(method_name, chunk):
+    method = getattr(_shared, method_name)
+    results = []
+    for seed, task in chunk:
+        # forked workers start with the parent's random state
+        np.random.seed(seed)
+        random.seed(seed)
+        results.append(method(task))
+    return results
+
+
+def _run_chunk_args(args):
+    return _run_chunk(*args)
+
+
+def executor_results(context, workers, method_name, chunked, ordered):
+    '''The results of each chunk, from a ProcessPoolExecutor'''
+    with ProcessPoolExecutor(max_workers=workers,
+                             mp_context=context) as executor:
+        futures = [executor.submit(_run_chunk, method_name, chunk)
+                   for chunk in chunked]
+        if not ordered:
+            futures = as_completed(futures)
+        for future in futures:
+            yield future.result()
+
+
+def pool_results(context, workers, method_name, chunked, ordered):
+    '''The results of each chunk, from a multiprocessing Pool'''
+    with context.Pool(workers) as pool:
+        run = pool.imap if ordered else pool.imap_unordered
+        for results in run(_run_chunk_args,
+                           [(method_name, chunk) for chunk in chunked]):
+            yield results
+
+
+def chunks(sequence, chunksize):
+    for i in range(0, len(sequence), chunksize):
+        yield sequence[i:i + chunksize]
+
+
+def run_in_pool(shared, method_name, tasks, workers=None, chunksize=1,
+                ordered=True):
+    '''Call shared.method_name(task) for each task in worker processes,
+    yielding the results.
+
+    Args:
+    shared: the object to call, shared with the workers through fork
+    method_name (str): name of the method of shared to call
+    tasks: the arguments of each call. These and the results must be
+        picklable
+    workers (int): number of processes, by default one per CPU
+    chunksize (int): number of tasks sent to a worker at a time
+    ordered (bool): yield the results in the order of tasks, otherwise
+        as they complete
+
+    Each task is run after seeding NumPy with a seed drawn from the
+    parent's NumPy state, so seeding the parent makes the results
+    reproducible.
+    '''
+    global _shared
+    tasks = list(tasks)
+    seeds = np.random.randint(2**31 - 1, size=len(tasks)).tolist()
+    context = multiprocessing.get_context("fork")
+    chunked = list(chunks(list(zip(seeds, tasks)), chunksize))
+    if "mp_context" in inspect.signature(ProcessPoolExecutor).parameters:
+        results = executor_results
+    else: # no mp_context before Python 3.7
+        results = pool_results
+    _shared = shared
+    try:
+        for chunk_results in results(context, workers, method_name, chunked,
+                                     ordered):
+            for result in chunk_results:
+                yield result
+    finally:
+        _shared = None
@@ -1,5 +1,7 @@
 from . import helper_functions
 from .rm_abm import *
+from .lineage import lineage_reporters
+from .online_stats import affinity_reporters
 
 parameters = {"phage_burst_size" :      10,
               "phage_mutation_step" :   [0.01, 0.1],
@@ -48,10 +50,12 @@ parameters_lifehistory = {"phage_burst_size" :      [5, 10, 25],
 
 
 
-agent_reporters = {"breed" : lambda a : a.breed,
-                   "methylation" : lambda a: a.methylation,
-                   "last_infected" : lambda a: a.last_infected,
-                   "genotype" : lambda a: a.genotype,
+## attribute names and columnar reporters, so that the array models
+## are collected from their arrays
+agent_reporters = {"breed" : "breed",
+                   "methylation" : "methylation",
+                   "last_infected" : "last_infected",
+                   "genotype" : "genotype",
                    "parent" : helper_functions.get_parent,
                    "infected" : helper_functions.get_infected_ID,
                    "affinity_0" : helper_functions.get_affinity(0),
@@ -63,6 +67,12 @@ model_reporters = {
             "bacteria_meth_1" : lambda m: get_breed_filtered_count(Bacteria,by_methylation(1))(m),
             "phage_meth_1" : lambda m: get_breed_filtered_count(Phage,by_methylation(1))(m)}
 
+## the output of get_manipulated_descendents at each step, see lineage.py
+lineage_model_reporters = dict(model_reporters, **lineage_reporters())
+
+## get_population_means at each step, see online_stats.py
+affinity_model_reporters = dict(model_reporters, **affinity_reporters())
+
 def get_variable_parameters(par):
     return [param for param, val in par.items() if isinstance(val, list)]
 
@@ -0,0 +1,102 @@
+import zlib
+
+import numpy as np
+
+
+def state_seed(source=np.random):
+    '''A seed for another generator, taken from the state of source
+    (a RandomState or np.random) without drawing from it, so it
+    follows np.random.seed'''
+    key, position = source.get_state()[1:3]
+    return zlib.crc32(key.tobytes() + np.int64(position).tobytes())
+
+
+class RandomStream(object):
+    '''A source of random numbers owned by a model. Uniforms are
+    generated in blocks and draws are served from the block, which is
+    refilled when it runs out. This avoids the overhead of a NumPy call
+    for each scalar draw.
+
+    Implements the part of the numpy.random interface that the model
+    uses (random, binomial, choice and permutation), so either can be
+    passed where a source of randomness is expected.
+    '''
+
+    def __init__(self, block_size=4096, source=None):
+        '''
+        Args:
+        block_size (int): number of uniforms generated at a time
+        source (np.random.RandomState): where the uniforms come from.
+            Defaults to the global NumPy state, so np.random.seed
+            still makes runs reproducible.
+        '''
+        self.block_size = block_size
+        self.source = source
+        self.block = np.empty(0)
+        self.position = 0
+
+    def get_source(self):
+        if self.source is None:
+            return np.random
+        return self.source
+
+    def refill(self, n):
+        '''Generate a new block with at least n uniforms'''
+        self.block = self.get_source().random_sample(max(n, self.block_size))
+        self.position = 0
+
+    def reset(self):
+        '''Drop the rest of the block, so the next draws are new'''
+        self.block = np.empty(0)
+        self.position = 0
+
+    def random(self, size=None):
+        '''Uniform draws on [0,1)'''
+        if size is None:
+            if self.position >= len(self.block):
+                self.refill(1)
+            u = self.block[self.position]
+            self.position += 1
+            return u
+        n = int(np.prod(size))
+        if self.position + n > len(self.block):
+            if n > self.block_size:
+                return self.get_source().random_sample(size)
+            self.refill(n)
+        u = self.block[self.position:self.position + n]
+        self.position += n
+        return u.reshape(size)
+
+    def bernoulli(self, p, size=None):
+        '''1 with probability p, otherwise 0. p may be an array.'''
+        if size is None and np.ndim(p) == 0:
+            if self.random() < p:
+                return 1
+            return 0
+        if size is None:
+            size = np.shape(p)
+        return (self.random(size) < p).astype(int)
+
+    def binomial(self, n, p, size=None):
+        if n == 1:
+            return self.bernoulli(p, size)
+        return self.get_source().binomial(n, p, size)
+
+    def choice(self, a, size=None, p=None):
+        '''Draw from the values a (or range(a) if a is an int), with
+        probabilities p.
+
+        '''
+        if isinstance(a, (int, np.integer)):
+            a = np.arange(a)
+        a = np.asarray(a)
+        u = self.random(size)
+        if p is None:
+            idx = np.floor(u * len(a)).astype(int)
+        else:
+            idx = np.searchsorted(np.cumsum(p), u, side="right")
+        return a[np.minimum(idx, len(a) - 1)]
+
+    def permutation(self, n):
+        '''A random permutation of range(n)'''
+        return np.argsort(self.random(n))
@@ -0,0 +1,193 @@
+'''
+Writes the results of a sweep as a partitioned Parquet dataset, and
+loads slices of it back.
+
+The files of an analysis are laid out as
+
+    root/analysis=<analysis>/commit=<commit>/<p>=<value>/.../<name>.parquet
+
+with one directory level for each of the partition_by parameters, and
+one file per writer (e.g. per SLURM script) in each partition. The
+partition columns are left out of the files. The columns are typed,
+compressed, and each row group keeps the min and max of its columns,
+so load_results only opens the files of matching partitions, only
+reads the columns asked for, and skips the row groups that can't match
+the other conditions.
+
+pyarrow is only needed here.
+'''
+import os
+from uuid import uuid4
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_string_dtype
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+
+def require_pyarrow():
+    if pa is None:
+        raise ImportError("pyarrow is needed to write and read Parquet "
+                          "results")
+
+
+def partition_dir(key, value):
+    return "%s=%s" % (key, value)
+
+
+def parse_partition(value):
+    '''The value of a partition directory: an int, float or string'''
+    for convert in (int, float):
+        try:
+            return convert(value)
+        except ValueError:
+            pass
+    return value
+
+
+def typed(df):
+    '''df with numeric object columns (e.g. a reporter that is
+    sometimes None) as floats and other object columns as strings'''
+    df = df.copy()
+    for col in df.columns:
+        if df[col].dtype == object or is_string_dtype(df[col].dtype):
+            try:
+                df[col] = pd.to_numeric(df[col]).astype(np.float64)
+            except (ValueError, TypeError):
+                df[col] = df[col].astype(str)
+    return df
+
+
+class ResultSink(object):
+    '''Writes data frames to the partitions of an analysis.
+
+    Rows are buffered by partition and written as row groups of
+    row_group_size rows, to one file (name) per partition, which is
+    kept open until the sink is closed. The columns of a partition
+    keep the types of the first rows written to it.
+
+    Use as a context manager, or call close.
+    '''
+
+    def __init__(self, root, analysis, commit, partition_by=(), name=None,
+                 row_group_size=2**16, compression="zstd"):
+        require_pyarrow()
+        self.root = os.path.join(root, partition_dir("analysis", analysis),
+                                 partition_dir("commit", commit))
+        self.partition_by = list(partition_by)
+        self.name = name or uuid4().hex
+        self.row_group_size = row_group_size
+        self.compression = compression
+        self.buffers = {}
+        self.writers = {}
+
+    def write(self, df):
+        missing = [key for key in self.partition_by if key not in df]
+        if missing:
+            raise KeyError("Can't partition by %s, not in the data" % missing)
+        if len(df) == 0:
+            return
+        if self.partition_by:
+            groups = df.groupby(self.partition_by, sort=False, dropna=False)
+        else:
+            groups = [((), df)]
+        for values, group in groups:
+            if not isinstance(values, tuple):
+                values = (values,)
+            buffer = self.buffers.setdefault(values, [])
+            buffer.append(group.drop(columns=self.partition_by))
+            if sum(len(part) for part in buffer) >= self.row_group_size:
+                self.flush(values)
+
+    def flush(self, values):
+        '''Write the rows buffered for the partition values'''
+        buffer = self.buffers.pop(values, [])
+        if len(buffer) == 0:
+            return
+        df = typed(pd.concat(buffer, ignore_index=True))
+        writer = self.writers.get(values)
+        if writer is None:
+            path = os.path.join(self.root,
+                                *[partition_dir(key, value) for key, value
+                                  in zip(self.partition_by, values)])
+            os.makedirs(path, exist_ok=True)
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            writer = pq.ParquetWriter(os.path.join(path,
+                                                   self.name + ".parquet"),
+                                      table.schema,
+                                      compression=self.compression,
+                                      write_statistics=True)
+            self.writers[values] = writer
+        else:
+            table = pa.Table.from_pandas(df, schema=writer.schema,
+                                         preserve_index=False)
+        writer.write_table(table, row_group_size=self.row_group_size)
+
+    def close(self):
+        for values in list(self.buffers):
+            self.flush(values)
+        for writer in self.writers.values():
+            writer.close()
+        self.writers = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def load_results(root, analysis, commit=None, columns=None, **where):
+    '''The results of an analysis as one data frame.
+
+    commit: one commit, or all of them if None
+    columns: the columns to read, or all of them
+    where: column -> value or list of values. Partition columns choose
+        the files that are read; other columns are filtered as the
+        files are read, skipping row groups by their statistics.
+
+    The analysis, commit and partition columns are added to the data.
+    '''
+    require_pyarrow()
+    where = {key : list(value) if isinstance(value, (list, tuple, set))
+             else [value] for key, value in where.items()}
+    top = os.path.join(root, partition_dir("analysis", analysis))
+    frames = []
+    for path, dirs, files in os.walk(top):
+        dirs.sort()
+        parts = {"analysis" : analysis}
+        for level in os.path.relpath(path, top).split(os.sep):
+            if "=" in level:
+                key, value = level.split("=", 1)
+                parts[key] = value if key == "commit" else\
+                             parse_partition(value)
+        if (commit is not None and parts.get("commit", commit) != commit) or\
+           any(key in parts and parts[key] not in values
+               for key, values in where.items()):
+            dirs[:] = [] # nothing below matches either
+            continue
+        filters = [(key, "in", values) for key, values in where.items()
+                   if key not in parts]
+        for file_name in sorted(files):
+            if not file_name.endswith(".parquet"):
+                continue
+            read_columns = None if columns is None else\
+                           [col for col in columns if col not in parts]
+            df = pq.read_table(os.path.join(path, file_name),
+                               columns=read_columns,
+                               filters=filters or None).to_pandas()
+            for key, value in parts.items():
+                if columns is None or key in columns:
+                    df[key] = value
+            frames.append(df)
+    if len(frames) == 0:
+        return pd.DataFrame(columns=columns)
+    df = pd.concat(frames, ignore_index=True)
+    if columns is not None:
+        df = df[[col for col in columns if col in df]]
+    return df
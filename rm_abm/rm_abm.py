@@ -1,10 +1,17 @@
-from mesa import Model, Agent
-from mesa.datacollection import DataCollector
+from mesa import Model
+from .datacollection import ColumnarDataCollector
 from .wolfsheep_schedule import RandomActivationByBreed # from WolfSheep
-from .evolvable import EvolvableVector, EvolvableVectorConstrained
+from .slot_schedule import SlotActivationByBreed
+from .evolvable import (EvolvableVector, EvolvableVectorConstrained,
+                        EvolvablePopulation, EvolvablePopulationConstrained,
+                        get_tradeoff_projection)
 from matplotlib import pyplot as plt
 from collections import defaultdict
-from intervaltree import Interval, IntervalTree
+from .encounter import EncounterIndex
+from .infection import resolve_infections
+from .burst import burst_progeny, NO_METHYLATION
+from .random_stream import RandomStream, state_seed
+from .lineage import FOUNDING_LINEAGE, SPIKE_IN_LINEAGE
 import numpy as np
 import pandas as pd
 import random
@@ -16,6 +23,7 @@ def by_genotype(g):
             return True
         else:
             return False
+    wrapper.counted = {"genotype" : g} # the schedule keeps this count
     return wrapper
 
 def by_methylation(m):
@@ -25,25 +33,19 @@ def by_methylation(m):
             return True
         else:
             return False
+    wrapper.counted = {"methylation" : m} # the schedule keeps this count
     return wrapper
 
-def bernoulli(p):
-    '''Return a bernoulli random variable'''
-    return np.random.binomial(1,p)
-
-def index_of_first(lst, pred):
-    '''Get the index of the first object where pred is true'''
-    for i,v in enumerate(lst):
-        if pred(v):
-            return i
-    return None
-
 def get_breed_filtered_count(breed_class, L):
     '''
     Returns the current number of agents of a certain breed
-    where L -> True
+    where L -> True. Filters made by by_genotype and by_methylation are
+    read from the schedule's counts rather than by scanning the agents.
     '''
+    counted = getattr(L, "counted", None)
     def wrapper(model):
+        if counted is not None and hasattr(model.schedule, "count"):
+            return model.schedule.count(breed_class, **counted)
         return len(list(filter(L, model.schedule.agents_by_breed[breed_class].values())))
     return wrapper
 
@@ -71,6 +73,9 @@ class BaseModel(Model):
                  verbose=False,
                  latency = 0.5,
                  epi_inheritance = 1,
+                 collection_policy = None,
+                 on_absorbing = None,
+                 seed = None,
                  **kwargs):
         '''
         Create a new Phage-Bacteria model with the given parameters.
@@ -96,6 +101,17 @@ class BaseModel(Model):
         verbose (bool)                    print info about the simulation
         latency (float)             
         epi_inheritance (float or string) odds that the progeny gets the parent's methylation state. Otherwise gets None. If "genetic" then the phage inherits its parent's methylation state
+        collection_policy                 when agent data is collected, see
+                                          datacollection.CollectionPolicy
+        on_absorbing (str)                what to do once no phage are left, free or in
+                                          a host: None runs on as usual, "stop" stops
+                                          the run, "fast_forward" runs the remaining
+                                          steps only adding bacteria
+        seed (int)                        if given, seeds NumPy and Python's random
+                                          first, as the mesa Model does. Otherwise
+                                          the model's seed is taken from the NumPy
+                                          state. Other streams, such as the agent
+                                          sample of the datacollector, start from it
         '''
         
         # set parameters
@@ -117,12 +133,42 @@ class BaseModel(Model):
         self.agent_width = 0.0001
         self.latency = latency
         self.epi_inheritance = epi_inheritance
+        if seed is not None:
+            np.random.seed(seed)
+            random.seed(seed)
+        self.seed = state_seed() if seed is None else seed
+        self.rng = RandomStream()
+        if on_absorbing not in (None, "stop", "fast_forward"):
+            raise ValueError("Unknown on_absorbing: %s" % on_absorbing)
+        self.on_absorbing = on_absorbing
+        self.absorbed = False
+        self.spiked = False # has spike-in phage
+        self.hosted = defaultdict(int) # phage inside bacteria, by lineage
+        self.lineage_trackers = {} # see lineage.get_lineage_tracker
+        self.affinity_trackers = {} # see online_stats.get_affinity_stats
 
         if self.encounter_width > 1 or self.encounter_width < 0:
             raise ValueError("Encounter width must be between 0 and 1")
         
-        self.schedule = RandomActivationByBreed(self)
+        self.schedule = self.make_schedule()
         
+        model_reporters, agent_reporters = self.default_reporters()
+        
+        self.datacollector = ColumnarDataCollector(model_reporters = model_reporters,
+                                                   agent_reporters=agent_reporters,
+                                                   policy=collection_policy)
+
+        self.current_ID = 0
+        # Create phage
+        self.add_phage()
+        #Create bacteria
+        self.add_bacteria(self.initial_bacteria)
+
+        self.running = True
+
+    def default_reporters(self):
+        '''The model and agent reporters of the model's own
+        datacollector'''
         model_reporters = {
             "phage" : lambda m : m.schedule.get_breed_count(Phage),
             "bacteria" : lambda m :  m.schedule.get_breed_count(Bacteria),
@@ -135,17 +181,10 @@ class BaseModel(Model):
             "methylation" : lambda a: a.methylation,
             "genotype" : lambda a: a.genotype,
             "inactivation" : lambda a: a.inactivation}
-        
-        self.datacollector = DataCollector(model_reporters = model_reporters,
-                                           agent_reporters=agent_reporters)
+        return model_reporters, agent_reporters
 
-        self.current_ID = 0
-        # Create phage
-        self.add_phage()
-        #Create bacteria
-        self.add_bacteria(self.initial_bacteria)
-
-        self.running = True
+    def make_schedule(self):
+        return SlotActivationByBreed(self)
 
     def get_next_ID(self):
         self.current_ID += 1
@@ -154,23 +193,37 @@ class BaseModel(Model):
     def get_evolvable_vector(self, probs):
         return EvolvableVector(probs,
                                self.phage_mutation_step,
-                               self.phage_mutation_freq)
+                               self.phage_mutation_freq,
+                               self.rng)
+
+    def get_evolvable_population(self, matrix):
+        return EvolvablePopulation(matrix,
+                                   self.phage_mutation_step,
+                                   self.phage_mutation_freq,
+                                   self.rng)
+
+    def mutate_affinity(self, affinity):
+        '''Return an EvolvablePopulation of mutated copies of the rows of
+        an affinity matrix.
+
+        '''
+        return self.get_evolvable_population(affinity).offspring()
     
     def add_phage(self):
         #Create phage
         #phage start with affinity according to a symmetric matrix
         affinity = np.array([[1-self.phage_off_diagonal, self.phage_off_diagonal],
                              [self.phage_off_diagonal, 1-self.phage_off_diagonal]])
-        
-        for i in range(self.initial_phage):
-            # sample methylation
-            rm_probs = [1-self.initial_fraction_p_m1,
-                        self.initial_fraction_p_m1]
-            rm = np.random.choice([0,1],p=rm_probs)
-            # sample genotypes
-            g_probs = [1-self.initial_fraction_p_g1,
-                       self.initial_fraction_p_g1]
-            g = np.random.choice([0,1], p=g_probs)
+        # sample methylation
+        rm_probs = [1-self.initial_fraction_p_m1,
+                    self.initial_fraction_p_m1]
+        methylations = self.rng.choice([0,1], self.initial_phage, p=rm_probs)
+        # sample genotypes
+        g_probs = [1-self.initial_fraction_p_g1,
+                   self.initial_fraction_p_g1]
+        genotypes = self.rng.choice([0,1], self.initial_phage, p=g_probs)
+
+        for rm, g in zip(methylations.tolist(), genotypes.tolist()):
             # assign affinity based on genotype
             p_affinity = self.get_evolvable_vector(
                 affinity[g,:].copy())
@@ -181,12 +234,14 @@ class BaseModel(Model):
                 rm,
                 self.phage_inactivation_time,
                 p_affinity,
-                0) # parent is 0 for first generation
+                0, # parent is 0 for first generation
+                lineage = FOUNDING_LINEAGE)
             self.schedule.add(phage)
 
     def add_bacteria(self, num):
-        for i in range(num):
-            g = np.random.choice([0,1],p=[1-self.fraction_b_m1, self.fraction_b_m1])
+        genotypes = self.rng.choice([0,1], num,
+                                    p=[1-self.fraction_b_m1, self.fraction_b_m1])
+        for g in genotypes.tolist():
             if g == 0:
                 bacteria = Bacteria(self, self.get_next_ID(), g, g,
                                     self.re_degrade_foreign_0)
@@ -196,22 +251,184 @@ class BaseModel(Model):
             else:
                 raise(ValueError("Unknown genotype"))
             self.schedule.add(bacteria)
+
+    def add_spike_in(self, affinity_0, methylation):
+        '''Add phage_burst_size-1 genotype 0 phage with the given affinity
+        for genotype 0 and methylation. These all have parent -1, and
+        are the SPIKE_IN_LINEAGE.
+
+        '''
+        self.spiked = True
+        p_affinity = self.get_evolvable_vector(np.array([affinity_0, 1-affinity_0]))
+
+        for i in range(1,self.phage_burst_size,1):
+            phage = Phage(
+                self,
+                i*-10, 
+                0, #genotype 0
+                methylation,
+                self.phage_inactivation_time,
+                p_affinity,
+                -1, #all have parent -1
+                lineage = SPIKE_IN_LINEAGE)
+        
+            self.schedule.add(phage)
+        # a burn-in that was absorbed (or stopped) has phage again
+        self.absorbed = False
+        self.running = True
             
     def step(self):
+        if self.absorbed:
+            self.step_absorbed()
+            return
         self.datacollector.collect(self)
-        # Shuffle the location of agents each time
-        self.tree = IntervalTree()
-        for unique_id, agent in self.schedule.agents_by_breed[Bacteria].items():
-            pos = random.random()
-            self.tree.add(Interval(pos, pos + self.agent_width, agent))
-        self.schedule.step()
+        self.schedule.step_breed(Phage) # inactivation
+        self.infect()
+        self.lysed = []
+        self.schedule.step_breed(Bacteria)
+        self.burst(self.lysed)
+        self.end_step()
+
+    def end_step(self):
+        '''Advance the clock, add the step's bacteria and check whether
+        the model is absorbed'''
+        self.schedule.steps += 1
+        self.schedule.time += 1
         if self.verbose:
             print([self.schedule.time,
                    self.schedule.get_breed_count(Phage),
                    self.schedule.get_breed_count(Bacteria)])
         self.add_bacteria(self.bacteria_per_step)
+        if self.on_absorbing is not None and not self.absorbed:
+            self.absorbed = self.is_absorbing()
+            if self.absorbed and self.on_absorbing == "stop":
+                self.running = False
+        # the fate of a spike-in is settled once its lineage dies out
+        if self.on_absorbing == "stop" and self.spiked and self.running and\
+           self.lineage_extinct(SPIKE_IN_LINEAGE):
+            self.running = False
+
+    def is_absorbing(self):
+        '''True when there are no phage, free or in a host. From then on
+        a step only adds bacteria.
+
+        '''
+        return self.schedule.get_breed_count(Phage) == 0 and\
+            not any(self.hosted.values())
+
+    def phage_arrays(self, infecting=False):
+        '''The lineage, methylation, last_infected (both -1 for None)
+        and affinity of the phage in the schedule, or of the phage
+        inside bacteria if infecting, as arrays'''
+        if infecting:
+            phage = [b.phage for b in
+                     self.schedule.agents_by_breed[Bacteria].values()
+                     if b.phage is not None]
+        else:
+            phage = list(self.schedule.agents_by_breed[Phage].values())
+        last_infected = [-1 if p.last_infected is None else p.last_infected
+                         for p in phage]
+        return {"lineage" : np.array([p.lineage for p in phage], dtype=int),
+                "methylation" : np.array([p.methylation_code for p in phage],
+                                         dtype=int),
+                "last_infected" : np.array(last_infected, dtype=int),
+                "affinity" : np.array([p.affinity.vector for p in phage],
+                                      dtype=float).reshape(-1, 2)}
+
+    def lineage_extinct(self, lineage):
+        '''True when no phage of lineage are left, free or in a host'''
+        return self.schedule.count(Phage, lineage=lineage) == 0 and\
+            self.hosted[lineage] == 0
+
+    def step_absorbed(self):
+        '''A step once the model is absorbed. Nothing can infect, lyse or
+        burst, so only the data is collected and bacteria added.
+
+        '''
+        self.datacollector.collect(self)
+        self.end_step()
         
-    def run_model(self, step_count=200):
+    def infect(self):
+        '''Let every phage try to infect the bacteria it encounters. All
+        infections in a step are resolved at once.
+
+        '''
+        phage = list(self.schedule.agents_by_breed[Phage].values())
+        bacteria = list(self.schedule.agents_by_breed[Bacteria].values())
+        # Shuffle the location of agents each time
+        index = EncounterIndex(self.rng.random(len(bacteria)),
+                               self.agent_width)
+        window, encountered = index.pairs(self.rng.random(len(phage)),
+                                          self.encounter_width)
+        affinity = np.array([p.affinity.vector for p in phage]).reshape(-1, 2)
+        genotype = np.array([b.genotype for b in bacteria], dtype=int)
+        infected = np.array([b.phage is not None for b in bacteria], dtype=bool)
+        probs = affinity[window, genotype[encountered]]
+        dead, infecting, targets = resolve_infections(window, encountered,
+                                                      probs, infected,
+                                                      self.rng)
+        for i in dead:
+            phage[i].dead = True # set to remove from schedule
+        for i, j in zip(infecting, targets):
+            bacteria[j].phage = phage[i]
+            self.hosted[phage[i].lineage] += 1
+
+    def burst(self, lysed):
+        '''Produce the progeny of all the bacteria that lysed this step at
+        once.
+
+        '''
+        if len(lysed) == 0:
+            return
+        infecting = [b.phage for b in lysed]
+        for p in infecting:
+            self.hosted[p.lineage] -= 1
+        progeny = burst_progeny(
+            self.phage_burst_size,
+            self.epi_inheritance,
+            self.mutate_affinity,
+            np.array([p.unique_id for p in infecting]),
+            np.array([p.genotype for p in infecting]),
+            np.array([p.methylation_code for p in infecting]),
+            np.array([p.affinity.vector for p in infecting]),
+            np.array([p.lineage for p in infecting]),
+            np.array([b.genotype for b in lysed]),
+            np.array([b.methylation for b in lysed]),
+            np.array([b.re_degrade_foreign for b in lysed]),
+            self.rng)
+        affinities = progeny["affinity"]
+        n = self.phage_burst_size
+        columns = zip(progeny["genotype"].tolist(),
+                      progeny["methylation"].tolist(),
+                      range(len(affinities)),
+                      progeny["parent"].tolist(),
+                      progeny["lineage"].tolist(),
+                      progeny["last_infected"].tolist())
+        for (genotype, methylation, row, parent, lineage,
+             last_infected) in columns:
+            if methylation == NO_METHYLATION:
+                methylation = None
+            if affinities.mutated[row]:
+                affinity = affinities.view(row)
+            else: # share the parent's affinity
+                affinity = infecting[row // n].affinity
+            phage = Phage(
+                self,
+                self.get_next_ID(),
+                genotype,
+                methylation,
+                self.phage_inactivation_time,
+                affinity,
+                parent,
+                last_infected = last_infected,
+                lineage = lineage)
+            self.schedule.add(phage)
+
+    def run_model(self, step_count=200, checkpoint=None):
+        '''Run step_count steps, or until the model stops running.
+        checkpoint (a checkpoint.Checkpoint) saves a snapshot of the
+        model every so many steps.'''
+        self.datacollector.final_step = self.schedule.steps + step_count - 1
         if self.verbose:
             print('Initial number phage: ', 
                 self.schedule.get_breed_count(Phage))
@@ -219,7 +436,16 @@ class BaseModel(Model):
                 self.schedule.get_breed_count(Bacteria))
 
         for i in range(step_count):
+            if not self.running:
+                break
             self.step()
+            if not self.running and i < step_count - 1:
+                # stopped early: collect the state it stopped in
+                self.datacollector.final_step = self.schedule.steps
+                self.datacollector.collect(self)
+            # after the collect, so a resumed run that stopped is complete
+            if checkpoint is not None:
+                checkpoint.step(self)
 
         if self.verbose:
             print('')
@@ -241,30 +467,15 @@ class SpikeIn(BaseModel):
         self.spike_in_affinity_0 = spike_in_affinity_0
         self.spike_in_methylation = spike_in_methylation
 
-        p_affinity = self.get_evolvable_vector(np.array([spike_in_affinity_0, 1-spike_in_affinity_0]))
-
-        for i in range(1,self.phage_burst_size,1):
-            phage = Phage(
-                self,
-                i*-10, 
-                0, #genotype 0
-                self.spike_in_methylation,
-                self.phage_inactivation_time,
-                p_affinity,
-                -1) #all have parent -1
-        
-            self.schedule.add(phage)
+        self.add_spike_in(self.spike_in_affinity_0, self.spike_in_methylation)
 
 
 class TradeOff(BaseModel):
 
     def __init__(self, shape = 2, **kwargs):
         
-        vec = np.array(np.arange(0.0,1.1,0.01))
-        max_x = np.array(list(map(lambda s: (1-s)**shape, vec)))
-        max_y = np.array(list(map(lambda s: (s)**shape, vec)))
-        bounding_line = np.array([max_x,max_y])
-        self.bounding_line = bounding_line.transpose()
+        self.projection = get_tradeoff_projection(shape)
+        self.bounding_line = self.projection.bounding_line
         self.shape = shape
         
         BaseModel.__init__(self, **kwargs)
@@ -274,12 +485,27 @@ class TradeOff(BaseModel):
         if self.shape == 0:
             return EvolvableVector(probs,
                                    self.phage_mutation_step,
-                                   self.phage_mutation_freq)
+                                   self.phage_mutation_freq,
+                                   self.rng)
         else:
             return EvolvableVectorConstrained(probs,
                                           self.phage_mutation_step,
                                           self.phage_mutation_freq,
-                                          self.bounding_line)
+                                          self.bounding_line,
+                                          self.rng)
+
+    def get_evolvable_population(self, matrix):
+        if self.shape == 0:
+            return EvolvablePopulation(matrix,
+                                       self.phage_mutation_step,
+                                       self.phage_mutation_freq,
+                                       self.rng)
+        else:
+            return EvolvablePopulationConstrained(matrix,
+                                                  self.phage_mutation_step,
+                                                  self.phage_mutation_freq,
+                                                  self.projection,
+                                                  self.rng)
 
 class TradeOffSpikeIn(TradeOff):
 
@@ -291,32 +517,49 @@ class TradeOffSpikeIn(TradeOff):
         self.spike_in_affinity_0 = spike_in_affinity_0
         self.spike_in_methylation = spike_in_methylation
 
-        p_affinity = self.get_evolvable_vector(np.array([spike_in_affinity_0, 1-spike_in_affinity_0]))
-
-        for i in range(1,self.phage_burst_size,1):
-            phage = Phage(
-                self,
-                i*-10, 
-                0, #genotype 0
-                self.spike_in_methylation,
-                self.phage_inactivation_time,
-                p_affinity,
-                -1) #all have parent -1
-        
-            self.schedule.add(phage)
+        self.add_spike_in(self.spike_in_affinity_0, self.spike_in_methylation)
         
         
 
 
-class Phage(Agent):
+PHAGE = 0 # breed codes
+BACTERIA = 1
+
+
+class CompactAgent(object):
+    '''A mesa agent without a per-instance __dict__. The breed is shared
+    by the class, as a string and as a small int. schedule_slot is set
+    by SlotActivationByBreed.
+
+    '''
+    __slots__ = ("model", "unique_id", "schedule_slot")
+    breed = None
+    breed_code = None
+
+    def step(self):
+        pass
+
+    def advance(self):
+        pass
+
+
+class Phage(CompactAgent):
     '''A phage that recognizes and infects bacteria'''
+    __slots__ = ("genotype", "methylation_code", "inactivation", "affinity",
+                 "parent", "dead", "last_infected", "lineage")
+    breed = "Phage"
+    breed_code = PHAGE
+
     def __init__(self, model, unique_id, genotype,
                  methylation, inactivation,
-                 affinity, parent, last_infected = None):
+                 affinity, parent, last_infected = None,
+                 lineage = FOUNDING_LINEAGE):
         '''
         Args:
         affinity : an EvolvableVector with indicies corresponding 
-                   to bacterial genotypes
+                   to bacterial genotypes. It is not modified, so may be
+                   shared with other phage
+        lineage : a tag inherited from the parent, see lineage.py
         '''
         self.model = model
         self.genotype = genotype
@@ -324,19 +567,31 @@ class Phage(Agent):
         self.inactivation = inactivation
         self.affinity = affinity
         self.unique_id = unique_id
-        self.breed = "Phage"
         self.parent = parent
         self.dead = False
         self.last_infected = last_infected
+        self.lineage = lineage
         if not unique_id:
             print(unique_id)
             raise ValueError
 
+    @property
+    def methylation(self):
+        if self.methylation_code == NO_METHYLATION:
+            return None
+        return self.methylation_code
+
+    @methylation.setter
+    def methylation(self, methylation):
+        if methylation is None:
+            self.methylation_code = NO_METHYLATION
+        else:
+            self.methylation_code = methylation
+
     def step(self):
-        inactivated = self.inactivate()
-        if not inactivated:
-            self.infect()
-        
+        '''Infection is resolved for all phage at once by BaseModel.infect'''
+        self.inactivate()
+
     def inactivate(self):
         '''Remove from schedule if longer than inactivation parameter. Or if
         phage infected last step.  Else decrement counter.
@@ -346,47 +601,15 @@ class Phage(Agent):
         if (self.inactivation < 0) or self.dead:
             self.model.schedule.remove(self)
             return True
-        
-    def infect(self):
-        ''' '''
-        pos = random.random()
-        encounter_radius = self.model.encounter_width/2
-        if (pos - encounter_radius) < 0: # if near lower boundary
-            remainder = abs(pos - encounter_radius)
-            lwr = self.model.tree[0:(pos + encounter_radius)]
-            upr = self.model.tree[(1 - remainder):1]
-            encountered = [i.data for i in lwr.union(upr)]
-        elif (pos + encounter_radius) > 1:
-            remainder = (pos + encounter_radius) - 1
-            lwr = self.model.tree[0:remainder]
-            upr = self.model.tree[(pos - encounter_radius):1]
-            encountered = [i.data for i in lwr.union(upr)]
-        else:
-            intervals = self.model.tree[(pos - encounter_radius):\
-                                  (pos + encounter_radius)]
-            encountered = [i.data for i in intervals]
-        if len(encountered) > 0:
-            random.shuffle(encountered)
-            genotypes = map(lambda x: x.genotype, encountered)
-            genotypes = np.array(list(genotypes))
-            infection_probs = self.affinity.vector[genotypes]
-            ## Infection probability = odds of infecting a genotype if
-            ## it's the only bacteria in the encounter
-            ## radius. Otherwise its infection probability/n where n
-            ## is the number of agents
-            #if np.sum(infection_probs) > 0:
-            bernoullis = map(bernoulli, infection_probs)
-            to_infect = index_of_first(bernoullis, lambda x: x == 1)
-            if to_infect is not None:
-                target = encountered[to_infect]
-                if target.phage is not None: # die if already infected
-                    self.dead = True
-                else:
-                    target.phage = self
-                    self.dead = True # set to remove from schedule
 
-class Bacteria(Agent):
+class Bacteria(CompactAgent):
     '''A bacteria with a methylation pattern and a coat protein type'''
+    __slots__ = ("genotype", "methylation", "phage", "re_degrade_foreign",
+                 "established")
+    breed = "Bacteria"
+    breed_code = BACTERIA
+    inactivation = np.nan
+    last_infected = None # This just simplifies the agent reporters.
     
     def __init__(self, model, unique_id, genotype, methylation, re_degrade_foreign):
         self.model = model
@@ -395,9 +618,6 @@ class Bacteria(Agent):
         self.phage = None
         self.re_degrade_foreign = re_degrade_foreign
         self.unique_id = unique_id
-        self.breed = "Bacteria"
-        self.inactivation = np.nan
-        self.last_infected = None # This just simplifies the agent reporters.
         self.established = False
         if not unique_id:
             raise ValueError
@@ -406,60 +626,11 @@ class Bacteria(Agent):
         if self.phage:
             if self.maybe_degrade():
                 ## phage dies
+                self.model.hosted[self.phage.lineage] -= 1
                 self.phage = None
-                self.infected = None
-            elif bernoulli(self.model.latency):
-                ## cell dies, phage are produced
-                if (self.model.epi_inheritance != -1) and\
-                   (self.model.epi_inheritance != -2): # This is epigenetic inheritance
-                    for i in range(self.model.phage_burst_size):
-                        if bernoulli(self.model.epi_inheritance):
-                            methylation = self.methylation # Inherits from bacteria
-                        else:
-                            methylation = None # Can get a "None" inheritance
-                        phage = Phage(
-                            self.model,
-                            self.model.get_next_ID(),
-                            self.phage.genotype,
-                            methylation,
-                            self.model.phage_inactivation_time,
-                            self.phage.affinity.copy(), ## mutations possible here
-                            self.phage.unique_id,
-                            last_infected = self.genotype) 
-                        self.model.schedule.add(phage)
-                elif self.model.epi_inheritance == -1: # This is genetic inheritance
-                    for i in range(self.model.phage_burst_size):
-                        if bernoulli(self.re_degrade_foreign): #mutates at 1-re_degrade_foreign
-                            methylation = self.phage.methylation #inherits parent's methylation,
-                        else: # methylation mutation
-                            if self.phage.methylation == 0:
-                                methylation = 1 
-                            else:
-                                methylation = 0
-                        phage = Phage(
-                            self.model,
-                            self.model.get_next_ID(),
-                            self.phage.genotype,
-                            methylation, 
-                            self.model.phage_inactivation_time,
-                            self.phage.affinity.copy(), ## mutations possible here
-                            self.phage.unique_id,
-                            last_infected = self.genotype) 
-                        self.model.schedule.add(phage)
-                elif self.model.epi_inheritance == -2: #Flip a coin for methylations state
-                    for i in range(self.model.phage_burst_size):
-                        phage = Phage(
-                            self.model,
-                            self.model.get_next_ID(),
-                            self.phage.genotype,
-                            np.random.choice([0,1]), #Random
-                            self.model.phage_inactivation_time,
-                            self.phage.affinity.copy(), ## mutations possible here
-                            self.phage.unique_id,
-                            last_infected = self.genotype) 
-                        self.model.schedule.add(phage)
-                else:
-                    raise ValueError("Don't know how to deal with inheritance")    
+            elif self.model.rng.bernoulli(self.model.latency):
+                ## cell dies, phage are produced by BaseModel.burst
+                self.model.lysed.append(self)
                 self.model.schedule.remove(self)
 
 
@@ -469,7 +640,7 @@ class Bacteria(Agent):
             if self.methylation == self.phage.methylation:
                 return False
             else:
-                if bernoulli(self.re_degrade_foreign):
+                if self.model.rng.bernoulli(self.re_degrade_foreign):
                     return True
                 else:
                     self.established = True
@@ -0,0 +1,172 @@
+from collections import defaultdict
+
+import numpy as np
+
+from .wolfsheep_schedule import RandomActivationByBreed
+
+
+class SlotView(object):
+    '''Read-only, dict-like view of the agents of some breeds, keyed by
+    unique_id. Supports the parts of the dict interface the models and
+    reporters use. Its length is the schedule's live count, and values,
+    keys and items are iterators over the slots.
+
+    '''
+
+    def __init__(self, schedule, breed_classes):
+        self.schedule = schedule
+        self.breed_classes = breed_classes
+
+    def values(self):
+        for breed_class in self.breed_classes:
+            for agent in self.schedule.slots.get(breed_class, ()):
+                if agent is not None:
+                    yield agent
+
+    def keys(self):
+        return (agent.unique_id for agent in self.values())
+
+    def items(self):
+        return ((agent.unique_id, agent) for agent in self.values())
+
+    def __iter__(self):
+        return self.keys()
+
+    def __len__(self):
+        return sum(self.schedule.get_breed_count(breed_class)
+                   for breed_class in self.breed_classes)
+
+
+class BreedViews(object):
+    '''Stands in for the agents_by_breed dict of RandomActivationByBreed'''
+
+    def __init__(self, schedule):
+        self.schedule = schedule
+
+    def __getitem__(self, breed_class):
+        return SlotView(self.schedule, [breed_class])
+
+    def __iter__(self):
+        return iter(self.schedule.slots)
+
+    def keys(self):
+        return self.schedule.slots.keys()
+
+    def values(self):
+        return [self[breed_class] for breed_class in self.schedule.slots]
+
+    def items(self):
+        return [(breed_class, self[breed_class])
+                for breed_class in self.schedule.slots]
+
+
+class SlotActivationByBreed(RandomActivationByBreed):
+    '''
+    A RandomActivationByBreed that keeps the agents of each breed in a
+    dense list of slots instead of dicts. Each agent records its slot,
+    so removing it just leaves a tombstone (None) in its place. The
+    tombstones are swept out once per step of the breed. The
+    activation order is a single random permutation of the slots.
+
+    Agents must have a schedule_slot attribute.
+    '''
+
+    def __init__(self, model):
+        self.model = model
+        self.steps = 0
+        self.time = 0
+        self.slots = {}
+        self.tombstones = {}
+        self.counts = defaultdict(int)
+        self.counters = {}
+
+    def get_slots(self, breed_class):
+        if breed_class not in self.slots:
+            self.slots[breed_class] = []
+            self.tombstones[breed_class] = 0
+        return self.slots[breed_class]
+
+    @property
+    def agents(self):
+        return SlotView(self, list(self.slots))
+
+    @property
+    def agents_by_breed(self):
+        return BreedViews(self)
+
+    def add(self, agent):
+        '''
+        Add an Agent object to the schedule
+
+        Args:
+            agent: An Agent to be added to the schedule.
+        '''
+        slots = self.get_slots(type(agent))
+        agent.schedule_slot = len(slots)
+        slots.append(agent)
+        self.counts[self.count_key(agent)] += 1
+        for counter in self.counters.values():
+            counter.add(agent)
+
+    def remove(self, agent):
+        '''
+        Remove an agent from the schedule, leaving a tombstone in its
+        slot.
+        '''
+        agent_class = type(agent)
+        self.slots[agent_class][agent.schedule_slot] = None
+        self.tombstones[agent_class] += 1
+        self.counts[self.count_key(agent)] -= 1
+        for counter in self.counters.values():
+            counter.remove(agent)
+
+    def compact(self, breed_class):
+        '''Sweep the tombstones out of a breed's slots'''
+        if self.tombstones.get(breed_class, 0) == 0:
+            return
+        slots = [agent for agent in self.slots[breed_class]
+                 if agent is not None]
+        for i, agent in enumerate(slots):
+            agent.schedule_slot = i
+        self.slots[breed_class] = slots
+        self.tombstones[breed_class] = 0
+
+    def step(self, by_breed=True):
+        '''
+        Executes the step of each agent breed, one at a time, in random
+        order.
+        '''
+        for agent_class in list(self.slots):
+            self.step_breed(agent_class)
+        self.steps += 1
+        self.time += 1
+
+    def step_breed(self, breed):
+        '''
+        Run all agents of a given breed in a random order, then sweep
+        out the agents that were removed.
+
+        Args:
+            breed: Class object of the breed to run.
+        '''
+        self.compact(breed)
+        slots = self.get_slots(breed)
+        rng = getattr(self.model, "rng", np.random)
+        # agents added during the step are not run until the next one
+        for i in rng.permutation(len(slots)).tolist():
+            agent = slots[i]
+            if agent is not None:
+                agent.step()
+        self.compact(breed)
+
+    def get_breed_count(self, breed_class):
+        '''
+        Returns the current number of agents of certain breed in the queue.
+        '''
+        if breed_class not in self.slots:
+            return 0
+        return len(self.slots[breed_class]) - self.tombstones[breed_class]
+
+    def get_agent_count(self):
+        return sum(self.get_breed_count(breed_class)
+                   for breed_class in self.slots)
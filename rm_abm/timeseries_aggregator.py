@@ -1,13 +1,43 @@
-from mesa.datacollection import DataCollector
+from .datacollection import ColumnarDataCollector, batch_to_df
 import pandas as pd
+from .hdf_functions import HDFWriter, DATA_COLUMNS
 from .helper_functions import make_list_float, make_iterable, unpack_params
+from .array_model import get_array_model
+from .parallel import run_in_pool
+from .checkpoint import Checkpoint
+from .aggregators import get_aggregator
+import copy
+import os
 
 
 class TimeseriesRunner():
 
     def __init__(self, model_class, parameters, max_steps, iterations,
                  agent_reporters={}, agent_aggregator=None,
-                 model_reporters={}, model_aggregator=None):
+                 model_reporters={}, model_aggregator=None,
+                 array_engine=False, collection_policy=None,
+                 checkpoint_dir=None, checkpoint_every=50,
+                 on_absorbing=None):
+        '''If array_engine is True, run the array-backed version of
+        model_class instead. collection_policy sets when agent data is
+        collected (see datacollection.CollectionPolicy); model data is
+        collected at every step.
+
+        If checkpoint_dir is given, each run saves a snapshot there
+        every checkpoint_every steps, and a run with a snapshot resumes
+        from it rather than starting over. The snapshot is removed when
+        the run is done, and one saved with other parameters or another
+        model is an error.
+
+        on_absorbing is passed to the models (see BaseModel). With
+        "stop" a run's data ends at the step it stopped in.
+
+        agent_aggregator is a function of a run's agent data frame, or
+        an aggregator fed each step as the run goes (see aggregators.py).
+
+        '''
+        if array_engine:
+            model_class = get_array_model(model_class)
         self.model_class = model_class
         self.max_steps = max_steps
         self.iterations = iterations
@@ -17,50 +47,87 @@ class TimeseriesRunner():
         self.parameters = unpack_params(self.parameters)
         self.agent_reporters = agent_reporters
         self.model_reporters = model_reporters
-        self.agent_aggregator = agent_aggregator
+        self.agent_aggregator = get_aggregator(agent_aggregator)
         self.model_aggregator = model_aggregator
+        self.collection_policy = collection_policy
+        self.checkpoint_dir = checkpoint_dir
+        self.checkpoint_every = checkpoint_every
+        self.on_absorbing = on_absorbing
         #
         self.models = self.create_models()
 
-    def create_models(self):
-        '''Return a tuple of parameter combinations and models to run.
-        key is (run, iteration, *parameters)
+    def tasks(self):
+        '''Yield the key and the model arguments of each run. key is
+        (run, iteration, *parameters)
 
         '''
         run = 0
-        ag_rep = self.agent_reporters
-        mod_rep = self.model_reporters
         for kwargs in self.parameters:
             for iteration in range(self.iterations):
-                model = self.model_class(**kwargs)
-                model.datacollector = DataCollector(agent_reporters=ag_rep,
-                                                    model_reporters=mod_rep)
                 key = [run, iteration] + [kwargs[i] for i in self.param_keys]
-                yield key,model
+                yield key, kwargs
                 run += 1
-                                
-
-    def agent_vars_to_df(self, agent_vars, model_key):
-        key_names = ["Run", "Iteration"]+\
-                    self.param_keys+\
-                    ["Step", "AgentID"]
-        var_names = self.agent_reporters.keys()
-        data = {}
-        for step in range(self.max_steps):
-            for entries in zip(*[agent_vars[v][step] for v in var_names]):
-                agent_id = entries[0][0]
-                vals = [i[1] for i in entries]
-                key = tuple(model_key + [step, agent_id])
-                data[key] = dict(zip(var_names, vals))
-        df = pd.DataFrame.from_dict(data, orient="index")
-        df.index.names = key_names
-        df.reset_index(inplace=True)
-        return df
+
+    def create_collector(self):
+        collector = ColumnarDataCollector(agent_reporters=self.agent_reporters,
+                                          model_reporters=self.model_reporters,
+                                          policy=self.collection_policy)
+        if self.agent_aggregator is not None:
+            collector.agent_sink = self.new_aggregator()
+        return collector
+
+    def new_aggregator(self):
+        '''A fresh copy of agent_aggregator for a run'''
+        aggregator = copy.deepcopy(self.agent_aggregator)
+        self.restore_aggregator(aggregator)
+        aggregator.init(["Step", "AgentID"] + list(self.agent_reporters.keys()))
+        return aggregator
+
+    def restore_aggregator(self, aggregator):
+        '''Put back what a run's aggregator left out when pickled'''
+        if aggregator is not None and hasattr(aggregator, "restore"):
+            aggregator.restore(self.agent_aggregator)
+
+    def create_model(self, kwargs):
+        model = self.model_class(on_absorbing=self.on_absorbing, **kwargs)
+        model.datacollector = self.create_collector()
+        return model
+
+    def create_models(self):
+        '''Return a tuple of parameter combinations and models to run.
+        key is (run, iteration, *parameters)
+
+        '''
+        for key, kwargs in self.tasks():
+            yield key, self.create_model(kwargs)
+
+    def agent_batches(self, datacollector, model_key, steps_per_batch=1):
+        '''Yield the agent data as data frames of steps_per_batch
+        collected steps each (everything if None), built from the
+        collector's columns.
+
+        '''
+        key_names = ["Run", "Iteration"] + self.param_keys
+        columns = ["Step", "AgentID"] + list(self.agent_reporters.keys())
+        for batch in datacollector.agent_batches(steps_per_batch):
+            yield batch_to_df(batch, key_names, model_key, columns)
+
+    def agent_vars_to_df(self, datacollector, model_key):
+        '''Build the agent data frame from the collector's columns'''
+        batches = list(self.agent_batches(datacollector, model_key, None))
+        if len(batches) == 0:
+            return pd.DataFrame(columns=["Run", "Iteration"] +\
+                                self.param_keys + ["Step", "AgentID"] +\
+                                list(self.agent_reporters.keys()))
+        return batches[0]
 
     def model_vars_to_df(self, model_vars, model_key):
         '''Add model parameters to the model output'''
         model_var_names = list(model_vars.keys())
-        model_vars["Step"] = list(range(self.max_steps))
+        # a run stopped early has fewer than max_steps steps
+        steps = len(next(iter(model_vars.values()))) if model_vars\
+                else self.max_steps
+        model_vars["Step"] = list(range(steps))
         model_key_names = ["Run", "Iteration"] + self.param_keys
         ## Add the parameters of the model run to the model_vars dict
         for key,value in zip(model_key_names, model_key):
@@ -74,37 +141,121 @@ class TimeseriesRunner():
             df[k] = p
         return df
     
-    def dataframes(self):
+    def run(self, model_key, model):
+        '''Run a model up to max_steps, from its snapshot if it has one.
+        Returns the model that was run.
+
+        '''
+        if self.checkpoint_dir is None:
+            model.run_model(self.max_steps - model.schedule.steps)
+            return model
+        os.makedirs(self.checkpoint_dir, exist_ok=True)
+        path = os.path.join(self.checkpoint_dir,
+                            "run-%i.pkl.gz" % model_key[0])
+        checkpoint = Checkpoint(path, self.checkpoint_every,
+                                self.checkpoint_key(model_key))
+        if checkpoint.exists():
+            keep_agents = model.datacollector.keep_agents
+            model = checkpoint.load(self.model_reporters,
+                                    self.agent_reporters)
+            model.datacollector.keep_agents = keep_agents
+        model.run_model(max(self.max_steps - model.schedule.steps, 0),
+                        checkpoint)
+        checkpoint.remove()
+        return model
+
+    def checkpoint_key(self, model_key):
+        '''What a run's snapshot is saved with: the model, the run, its
+        parameters and max_steps'''
+        return (self.model_class.__name__, self.max_steps,
+                tuple(zip(["Run", "Iteration"] + self.param_keys,
+                          model_key)))
+
+    def frames(self, model_key, model, aggregated_only=False):
+        '''Run a model, returning the tuple yielded by dataframes. With
+        aggregated_only the agent data is only given to the aggregator,
+        not kept.
+
+        '''
+        model.datacollector.keep_agents = not aggregated_only
+        model = self.run(model_key, model)
+        collector = model.datacollector
+        self.restore_aggregator(collector.agent_sink)
+        df_agents = self.agent_vars_to_df(collector, model_key)
+        df_model = self.model_vars_to_df(collector.model_vars, model_key)
+        if collector.agent_sink is None:
+            agent_aggregated = None
+        else:
+            agent_aggregated = collector.agent_sink.finalize(
+                ["Run", "Iteration"] + self.param_keys, model_key)
+            agent_aggregated = self.ensure_parameters(agent_aggregated,
+                                                      model_key)
+        if self.model_aggregator is None:
+            model_aggregated = None
+        else:
+            model_aggregated = self.model_aggregator(df_model)
+            model_aggregated = self.ensure_parameters(model_aggregated,
+                                                      model_key)
+        if aggregated_only: # don't send the raw data back
+            df_agents, df_model = None, None
+        return tuple([dict(zip(self.param_keys, model_key)),
+                      df_agents, df_model,
+                      agent_aggregated, model_aggregated])
+
+    def run_task(self, task):
+        '''Build and run the model of a task, in a worker'''
+        model_key, kwargs, aggregated_only = task
+        return self.frames(model_key, self.create_model(kwargs),
+                           aggregated_only)
+
+    def dataframes(self, workers=None, chunksize=1, ordered=True,
+                   aggregated_only=False):
         '''yields tuple: parameters, agents, model, agg. agents, agg. model
         
         Aggregated variables will always contain the model's
         parameters.
 
+        If workers is given, the runs are spread over that many
+        processes (see parallel.run_in_pool), chunksize runs at a
+        time, and yielded in order or, if not ordered, as they finish.
+        With aggregated_only the agent and model frames are None, and
+        no run keeps its agent data beyond what the aggregator needs.
+
         '''
-        n_cycles = len(self.parameters) * self.iterations
-        for model_key, model in self.models:
-            model.run_model(self.max_steps)
-            agent_vars = model.datacollector.agent_vars
-            model_vars = model.datacollector.model_vars
-            df_agents = self.agent_vars_to_df(agent_vars, model_key)
-            df_model = self.model_vars_to_df(model_vars, model_key)
-            if self.agent_aggregator is None:
-                agent_aggregated = None
-            else:
-                agent_aggregated = self.agent_aggregator(df_agents)
-                agent_aggregated = self.ensure_parameters(agent_aggregated,
-                                                          model_key)
-            if self.model_aggregator is None:
-                model_aggregated = None
-            else:
-                model_aggregated = self.model_aggregator(df_model)
-                model_aggregated = self.ensure_parameters(model_aggregated,
-                                                          model_key)
-            yield tuple([dict(zip(self.param_keys, model_key)),
-                         df_agents, df_model,
-                         agent_aggregated, model_aggregated])
-                   
-    
-                
-                
-                
+        if workers is None:
+            for model_key, model in self.models:
+                yield self.frames(model_key, model, aggregated_only)
+        else:
+            tasks = [(key, kwargs, aggregated_only)
+                     for key, kwargs in self.tasks()]
+            for frames in run_in_pool(self, "run_task", tasks, workers,
+                                      chunksize, ordered):
+                yield frames
+
+    def write_hdf(self, hdf_path, hdf_var, steps_per_batch=10, **kwargs):
+        '''Run every model and append its agent data to the hdf store
+        in batches of steps_per_batch steps, rather than building the
+        whole data frame. One HDFWriter (kwargs) writes all the runs,
+        under one hash; the swept parameters are data columns.
+
+        '''
+        kwargs.setdefault("data_columns", DATA_COLUMNS + self.param_keys)
+        with HDFWriter(hdf_path, hdf_var, **kwargs) as writer:
+            for model_key, model in self.models:
+                model = self.run(model_key, model)
+                for df in self.agent_batches(model.datacollector, model_key,
+                                             steps_per_batch):
+                    writer.append(df)
+
+    def write_results(self, sink, frame="agg_agent", workers=None,
+                      chunksize=1, ordered=True):
+        '''Run every model (as dataframes) and write one of its frames,
+        "agent", "model", "agg_agent" or "agg_model", to sink (e.g. a
+        result_sink.ResultSink), run by run. The sink is left open.
+
+        '''
+        index = ["agent", "model", "agg_agent", "agg_model"].index(frame) + 1
+        for frames in self.dataframes(workers, chunksize, ordered,
+                                      aggregated_only=frame.startswith("agg")):
+            if frames[index] is not None:
+                sink.write(frames[index])
@@ -1,103 +1,97 @@
 from collections import defaultdict
 from itertools import product
-from mesa.datacollection import DataCollector
 import pandas as pd
 import numpy as np
-from uuid import uuid4
-from pandas import HDFStore
 import numbers, os
 
-from .hdf_functions import hdf_exist_p, write_to_hdf
+from .hdf_functions import HDFWriter, DATA_COLUMNS
+from .datacollection import ColumnarDataCollector, batch_to_df
 from .helper_functions import make_list_float, make_iterable, unpack_params
 
 
-def data_to_df(data_dictionary, param_keys):
+def data_to_df(batches):
     '''Converts agent data as collected by timeseries_runner to pandas
     data frame
     
-    data_dictionary : the data collected by the function
-    param_keys : the parameters being iterated over
+    batches : the record batches yielded by timeseries_generator
 
     '''
-    df = pd.DataFrame.from_dict(data_dictionary, orient="index")
-    df.index.names = ["Run", "Iteration", "Step", "AgentID"] +\
-                     list(param_keys)
-    df.reset_index(inplace=True)
-    return df
+    if len(batches) == 0:
+        return pd.DataFrame()
+    return pd.concat(batches, ignore_index=True)
 
 
 def timeseries_generator(model_class, parameters, max_steps,
-                        iterations, agent_reporters, param_keys):
+                        iterations, agent_reporters, param_keys,
+                        steps_per_batch=1):
     """
     Runs model for each parameter in parameters. Collects agent level
     data at each tick.
 
-    Yields tuple: ( tuple: (iteration, step, agent_id, *parameters)
-                    dict: { reporter_name : value} )
+    Yields record batches: data frames with the columns Run,
+    Iteration, Step, AgentID, *parameters and one per reporter, of
+    steps_per_batch steps each.
 
     """
 
-    var_names = agent_reporters.keys()
+    key_names = ["Run", "Iteration"]
+    columns = ["Step", "AgentID"]
     run = 0
     for kwargs in log_progress(parameters): # defaults to logging the progress
         for iteration in range(iterations):
             model = model_class(**kwargs)
-            model.datacollector = DataCollector(agent_reporters=agent_reporters)
+            model.datacollector = ColumnarDataCollector(agent_reporters=agent_reporters)
             model.run_model(max_steps)
-            agent_vars = model.datacollector.agent_vars
-            for step in range(max_steps):
-                ## each "entry" looks like ( [agent_id, val], [agent_id, val2], ...)
-                ## the values are ordered by agent_reporter name
-                for entries in zip(*[ agent_vars[v][step] for v in var_names]): 
-                    agent_id = entries[0][0] # each first entry should be the same
-                    vals = [i[1] for i in entries]
-                    key = tuple([run, iteration, step, agent_id]+\
-                                [kwargs[i] for i in param_keys])
-                    yield key, dict(zip( var_names, vals))
+            params = {i : kwargs[i] for i in param_keys}
+            for batch in model.datacollector.agent_batches(steps_per_batch):
+                batch = dict(batch, **params)
+                yield batch_to_df(batch, key_names, [run, iteration],
+                                  columns + list(param_keys) +\
+                                  list(agent_reporters.keys()))
             run += 1
         
                         
 def timeseries_runner(model_class, parameters, max_steps, iterations,
                       agent_reporters={}, model_reporters={},
-                      hdf=None, chunksize = 30000):
+                      hdf=None, chunksize=None, sink=None, **hdf_kwargs):
     '''This function has a similar goal as the batch runner class.
     However, it returns data about individual agents at each step and
     for each parameter set.
 
-    hdf: tuple: ( path-to-hdf, variable-to-store-data-in)
+    hdf: tuple: ( path-to-hdf, variable-to-store-data-in). The data is
+    written by one HDFWriter (hdf_kwargs, e.g. buffer_bytes), with the
+    swept parameters as data columns.
 
-    '''
+    chunksize: if given, the rows are written chunksize at a time (the
+    writer's buffer_rows), as well as whenever the buffer is full.
+
+    sink: if given, the data is written to it (e.g. a
+    result_sink.ResultSink, which is left open) instead.
 
-    if hdf and not chunksize:
-        raise ValueError("Must specify chunksize is hdf is specified")
+    '''
 
     if hdf and not ( len(hdf) == 2):
         raise ValueError("hdf should be a tuple: ( path-to-hdf, variable-to-store-data-in)")
     
-    if hdf:
-        hdf_path, hdf_var = hdf
-        hash_id = uuid4().hex #this is to keep track of all the results of a single batch run
-        
-    param_keys = parameters.keys()
+    param_keys = list(parameters.keys())
     parameters = {param : make_list_float(val) for param,val in parameters.items()}
     parameters = unpack_params(parameters)
 
-    data = {}
-    n = 0
-    for key, val in timeseries_generator(model_class, parameters, max_steps,
-                                        iterations, agent_reporters, param_keys):
-        data[ key ] = val
-        n += 1
-        if hdf and (n > chunksize): 
-            df = data_to_df(data, param_keys)
-            write_to_hdf(hdf_path, df, hdf_var, hash_id)
-            data = {}
-            n = 0
-    df = data_to_df(data, param_keys)
+    batches = timeseries_generator(model_class, parameters, max_steps,
+                                   iterations, agent_reporters, param_keys)
+    if sink is not None:
+        for batch in batches:
+            sink.write(batch)
+        return
     if not hdf:
-        return df
-    else:
-        write_to_hdf(hdf_path, df, hdf_var, hash_id)
+        return data_to_df(list(batches))
+    hdf_path, hdf_var = hdf
+    hdf_kwargs.setdefault("data_columns", DATA_COLUMNS + param_keys)
+    hdf_kwargs.setdefault("buffer_rows", chunksize)
+    # one writer, and one hash, for all the results of a batch run
+    with HDFWriter(hdf_path, hdf_var, **hdf_kwargs) as writer:
+        for batch in batches:
+            writer.append(batch)
 
 def log_progress(sequence, every=None, size=None):
     from ipywidgets import IntProgress, HTML, VBox
@@ -3,6 +3,26 @@ from collections import defaultdict
 
 from mesa.time import RandomActivation
 
+ANY = object() # matches any value in RandomActivationByBreed.count
+
+
+class PredicateCounter(object):
+    '''The number of scheduled agents of a breed where predicate is
+    True'''
+
+    def __init__(self, breed_class, predicate):
+        self.breed_class = breed_class
+        self.predicate = predicate
+        self.count = 0
+
+    def add(self, agent):
+        if type(agent) is self.breed_class and self.predicate(agent):
+            self.count += 1
+
+    def remove(self, agent):
+        if type(agent) is self.breed_class and self.predicate(agent):
+            self.count -= 1
+
 
 class RandomActivationByBreed(RandomActivation):
     '''
@@ -13,12 +33,25 @@ class RandomActivationByBreed(RandomActivation):
     default behavior for an ABM.
 
     Assumes that all agents have a step() method.
+
+    Keeps a live count of the agents of each (breed, methylation,
+    genotype, lineage), and of any predicates added with register_counter, so
+    reporters don't have to scan the agents. The counted attributes
+    must not change while an agent is scheduled.
     '''
     agents_by_breed = defaultdict(dict)
 
     def __init__(self, model):
         super().__init__(model)
         self.agents_by_breed = defaultdict(dict)
+        self.counts = defaultdict(int)
+        self.counters = {}
+
+    def count_key(self, agent):
+        return (type(agent),
+                getattr(agent, "methylation", None),
+                getattr(agent, "genotype", None),
+                getattr(agent, "lineage", None))
 
     def add(self, agent):
         '''
@@ -31,6 +64,9 @@ class RandomActivationByBreed(RandomActivation):
         self.agents[agent.unique_id] = agent
         agent_class = type(agent)
         self.agents_by_breed[agent_class][agent.unique_id] = agent
+        self.counts[self.count_key(agent)] += 1
+        for counter in self.counters.values():
+            counter.add(agent)
 
     def remove(self, agent):
         '''
@@ -41,6 +77,9 @@ class RandomActivationByBreed(RandomActivation):
 
         agent_class = type(agent)
         del self.agents_by_breed[agent_class][agent.unique_id]
+        self.counts[self.count_key(agent)] -= 1
+        for counter in self.counters.values():
+            counter.remove(agent)
 
     def step(self, by_breed=True):
         '''
@@ -75,3 +114,32 @@ class RandomActivationByBreed(RandomActivation):
         Returns the current number of agents of certain breed in the queue.
         '''
         return len(self.agents_by_breed[breed_class].values())
+
+    def count(self, breed_class, methylation=ANY, genotype=ANY, lineage=ANY):
+        '''
+        Returns the current number of agents of a breed with the given
+        methylation, genotype and lineage. Leave any out to count all
+        values.
+        '''
+        total = 0
+        for (breed, m, g, l), n in self.counts.items():
+            if breed is breed_class and\
+               (methylation is ANY or m == methylation) and\
+               (genotype is ANY or g == genotype) and\
+               (lineage is ANY or l == lineage):
+                total += n
+        return total
+
+    def register_counter(self, name, breed_class, predicate):
+        '''
+        Keep a live count of the agents of a breed where predicate is
+        True, readable with get_counter(name). The predicate is
+        evaluated when an agent is added and when it is removed.
+        '''
+        counter = PredicateCounter(breed_class, predicate)
+        for agent in self.agents_by_breed[breed_class].values():
+            counter.add(agent)
+        self.counters[name] = counter
+
+    def get_counter(self, name):
+        return self.counters[name].count
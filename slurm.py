@@ -5,11 +5,20 @@ import os
 
 
 class SLURM():
-    def __init__(self, model_class,time="15:00", mem=1500):
+    def __init__(self, model_class,time="15:00", mem=1500, array_engine=False,
+                 output_format="csv", partition_by=()):
+        '''With output_format "parquet" the scripts write their output
+        with rm_abm.result_sink.ResultSink, partitioned by the
+        partition_by parameters, instead of a csv each.'''
+        if output_format not in ("csv", "parquet"):
+            raise ValueError("output_format must be csv or parquet")
+        if array_engine:
+            model_class = "Array" + model_class
         self.model_class = model_class
         self.time=time
         self.mem=mem
-        pass
+        self.output_format = output_format
+        self.partition_by = list(partition_by)
     
     def get_slurm_head(self, hash_name):
         format_str = '''#!/bin/bash
@@ -25,14 +34,27 @@ cd ~/rm-abm2
         
 python << EOF
 from rm_abm.rm_abm import *
+from rm_abm.array_model import *
 from rm_abm import timeseries_aggregator
+from rm_abm import aggregators
+from rm_abm import adaptive
 from mesa.batchrunner import BatchRunner
+from rm_abm.batch_runner import ColumnarBatchRunner
+from functools import partial
 from rm_abm import helper_functions
 from rm_abm import parameters
 import pandas as pd'''
         return format_str % (self.time, self.mem, hash_name)
 
     def get_slurm_tail(self, script_name, repo_name, hash_name):
+        if self.output_format == "parquet":
+            format_str = '''from rm_abm.result_sink import ResultSink
+with ResultSink("output", "%s", "%s", partition_by=%r, name="%s") as sink:
+    sink.write(out)
+EOF
+echo success'''
+            return format_str % (script_name, repo_name, self.partition_by,
+                                 hash_name)
         format_str = '''out.to_csv("output/output-%s-%s/%s.csv")
 EOF
 echo success'''
@@ -41,10 +63,10 @@ echo success'''
     def get_slurm_script(self, parameter_string, steps, reps, script_name, repo_name, hash_name):
         return "\n".join([
             self.get_slurm_head(hash_name),
-            self.get_slurm_code(parameter_string, steps, reps),
+            self.get_slurm_code(parameter_string, steps, reps, hash_name),
             self.get_slurm_tail(script_name, repo_name, hash_name)])
     
-    def get_slurm_code(self, parameter_string, steps, reps):
+    def get_slurm_code(self, parameter_string, steps, reps, hash_name):
         return ""
     
 
@@ -53,10 +75,10 @@ class SBatchRunner(SLURM):
         
         SLURM.__init__(self, model_class, **kwargs)
 
-    def get_slurm_code(self, parameter_string, steps, reps):
+    def get_slurm_code(self, parameter_string, steps, reps, hash_name):
         format_str = """
-batch_run = BatchRunner(
-        %s, 
+batch_run = ColumnarBatchRunner(
+        partial(%s, collection_policy="off"), # only the end is used
         %s, 
         iterations=%i, 
         max_steps=%i,
@@ -69,23 +91,68 @@ out = batch_run.get_agent_vars_dataframe()
 
 class STimeseriesRunner(SLURM):
 
-    def __init__(self, model_class,agent_aggregator="helper_functions.get_manipulated_descendents",**kwargs):
-        
+    def __init__(self, model_class,agent_aggregator="aggregators.DescendentsAggregator()",
+                 precision=None, max_reps=100, checkpoint=False, **kwargs):
+        '''If precision (aggregated variable -> target half-width of its
+        confidence interval) is given, each parameter point starts with
+        reps runs and gets more until the targets or max_reps are
+        reached (see rm_abm.adaptive).
+
+        If checkpoint, the runs of a script save snapshots in
+        checkpoints/<hash>, so the script resumes them if resubmitted.'''
         SLURM.__init__(self, model_class, **kwargs)
         self.agent_aggregator = agent_aggregator
+        self.precision = precision
+        self.max_reps = max_reps
+        self.checkpoint = checkpoint
+        self.agent_reporters = "parameters.agent_reporters"
+        self.model_reporters = "parameters.model_reporters"
+        self.model_aggregator = "None"
+        self.collection_policy = "None"
+        self.output = "agg_agent" # which aggregated frame is written
 
-    def get_slurm_code(self, parameter_string, steps, reps):
+    def get_slurm_code(self, parameter_string, steps, reps, hash_name):
+        if self.precision is None:
+            runner_class = "timeseries_aggregator.TimeseriesRunner"
+            reps_string = "%i" % reps
+        else:
+            runner_class = "adaptive.AdaptiveTimeseriesRunner"
+            reps_string = "%i, %r, %i" % (reps, self.precision, self.max_reps)
         format_str = """
-runner = timeseries_aggregator.TimeseriesRunner(%s, 
+runner = %s(%s, 
                           %s,
-                          %i, %i, 
-                          agent_reporters=parameters.agent_reporters,
+                          %i, %s, 
+                          agent_reporters=%s,
                           agent_aggregator=%s,
-                          model_reporters=parameters.model_reporters,
-                          model_aggregator=None)
+                          model_reporters=%s,
+                          model_aggregator=%s,
+                          collection_policy=%s%s)
+
+out = pd.concat([%s for param_dict, agent_data, model_data, agg_agent, agg_model in runner.dataframes(aggregated_only=True)])"""
+        if self.checkpoint: # resumed if resubmitted
+            checkpoint_string = ',\n                          checkpoint_dir="checkpoints/%s"' % hash_name
+        else:
+            checkpoint_string = ""
+        return format_str % (runner_class, self.model_class, parameter_string,
+                             steps, reps_string, self.agent_reporters,
+                             self.agent_aggregator, self.model_reporters,
+                             self.model_aggregator, self.collection_policy,
+                             checkpoint_string, self.output)
+
+
+class SLineageRunner(STimeseriesRunner):
+    '''An STimeseriesRunner for spike-in models that gives the output of
+    get_manipulated_descendents from the lineage the models track as
+    they run (see rm_abm.lineage), without collecting agent data.'''
 
-out = pd.concat([agg_agent for param_dict, agent_data, model_data, agg_agent, agg_model in runner.dataframes()])"""
-        return format_str % (self.model_class, parameter_string, steps, reps, self.agent_aggregator)
+    def __init__(self, model_class, **kwargs):
+        STimeseriesRunner.__init__(self, model_class, agent_aggregator="None",
+                                   **kwargs)
+        self.agent_reporters = "{}"
+        self.model_reporters = "parameters.lineage_model_reporters"
+        self.model_aggregator = "helper_functions.get_lineage_descendents"
+        self.collection_policy = '"off"'
+        self.output = "agg_model"
 
     
 class Analysis():
@@ -102,10 +169,17 @@ class Analysis():
         self.unpacked_params = unpack_params(parameters)
 
     def write_scripts(self):
-        os.makedirs("output/output-%s-%s/" % (self.name, self.commit))
+        if self.slurm_class.output_format == "csv": # a ResultSink makes its own
+            os.makedirs("output/output-%s-%s/" % (self.name, self.commit))
         os.makedirs("scripts/scripts-%s-%s/" %  (self.name, self.commit)) 
+        # an adaptive runner decides the number of runs itself, so each
+        # parameter point gets one script
+        if getattr(self.slurm_class, "precision", None) is None:
+            n_scripts = self.addl_reps
+        else:
+            n_scripts = 1
         for param_set in self.unpacked_params:
-            for i in range(self.addl_reps):
+            for i in range(n_scripts):
                 unique_id = uuid4().hex
                 out_script = self.slurm_class.\
                              get_slurm_script(param_set.__str__(),
@@ -0,0 +1,53 @@
+'''
+AdaptiveTimeseriesRunner must stop running a parameter point once its
+outputs are known to the given precision, or it has had max_iterations.
+'''
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from rm_abm.rm_abm import BaseModel, Phage
+from rm_abm.adaptive import AdaptiveTimeseriesRunner, half_width, run_value
+
+
+def test_half_width():
+    values = np.random.RandomState(0).normal(size=12)
+    low, high = stats.t.interval(0.9, 11, loc=values.mean(),
+                                 scale=stats.sem(values))
+    assert np.isclose(half_width(values, 0.9), (high - low) / 2)
+    assert half_width([1.0]) == np.inf
+    assert half_width([1.0, np.nan, np.inf]) == np.inf
+    assert half_width([2.0, 2.0, np.nan]) == 0
+
+
+def test_run_value():
+    frames = ({}, None, None, None,
+              pd.DataFrame({"x" : [1.0, 3.0, np.nan]}))
+    assert run_value(frames, "x") == 2.0
+
+
+def final_phage(df):
+    return pd.DataFrame({"final_phage" : [df["phage"].iloc[-1]]})
+
+
+def test_stopping():
+    np.random.seed(1)
+    runner = AdaptiveTimeseriesRunner(
+        BaseModel, {"initial_phage" : [0, 30]}, 5, 2,
+        precision={"final_phage" : 1}, max_iterations=6,
+        round_iterations=2,
+        model_reporters={"phage" : lambda m:
+                         m.schedule.get_breed_count(Phage)},
+        model_aggregator=final_phage)
+    frames = list(runner.dataframes())
+    # without phage there is nothing to know after the first round; with
+    # them the runs go on to max_iterations
+    assert runner.counts == [2, 6]
+    assert len(frames) == 8
+    assert runner.half_widths(0)["final_phage"] == 0
+    assert runner.half_widths(1)["final_phage"] > 1
+    runs = sorted(f[4]["Run"].iloc[0] for f in frames)
+    assert runs == [0, 1, 6, 7, 8, 9, 10, 11]
+    values = [f[4]["final_phage"].iloc[0] for f in frames
+              if f[4]["initial_phage"].iloc[0] == 30]
+    assert values == runner.values[1]["final_phage"]
@@ -0,0 +1,74 @@
+'''
+The incremental aggregators must give, through TimeseriesRunner, what
+the functions of the whole agent data frame they stand in for give.
+'''
+import numpy as np
+import pandas as pd
+import pytest
+
+from rm_abm import parameters
+from rm_abm.rm_abm import SpikeIn, TradeOffSpikeIn
+from rm_abm.aggregators import (AgentAggregator, DataFrameAggregator,
+                                DescendentsAggregator, FoundersAggregator,
+                                get_aggregator)
+from rm_abm.helper_functions import (get_manipulated_descendents,
+                                     founders_analysis)
+from rm_abm.timeseries_aggregator import TimeseriesRunner
+
+
+def aggregated(model_class, parameter_values, steps, aggregator, seed,
+               aggregated_only=False):
+    np.random.seed(seed)
+    runner = TimeseriesRunner(model_class, parameter_values, steps, 2,
+                              agent_reporters=parameters.agent_reporters,
+                              agent_aggregator=aggregator)
+    return [frames[3] for frames in
+            runner.dataframes(aggregated_only=aggregated_only)]
+
+
+def assert_like(frames, expected):
+    assert len(frames) == len(expected)
+    for df, other in zip(frames, expected):
+        assert list(df.columns) == list(other.columns)
+        assert len(df) == len(other)
+        for column in df.columns:
+            values = pd.to_numeric(df[column], errors="coerce").values
+            others = pd.to_numeric(other[column], errors="coerce").values
+            assert np.allclose(values.astype(float), others.astype(float),
+                               equal_nan=True), column
+
+
+def test_descendents():
+    parameter_values = {"initial_phage" : 10, "spike_in_affinity_0" : 0.7,
+                        "phage_mutation_step" : 0.1,
+                        "phage_mutation_freq" : 0.1}
+    expected = aggregated(SpikeIn, parameter_values, 25,
+                          get_manipulated_descendents, 3)
+    assert all(df.descendents[0] > 0 for df in expected)
+    assert_like(aggregated(SpikeIn, parameter_values, 25,
+                           DescendentsAggregator(), 3), expected)
+    # without keeping the agent data
+    assert_like(aggregated(SpikeIn, parameter_values, 25,
+                           DescendentsAggregator(), 3, True), expected)
+
+
+@pytest.mark.parametrize("model_class,initial_phage,mutation",
+                         [(SpikeIn, 10, 0.1), (TradeOffSpikeIn, 30, 0.2)])
+def test_founders(model_class, initial_phage, mutation):
+    parameter_values = {"initial_phage" : initial_phage,
+                        "phage_mutation_step" : mutation,
+                        "phage_mutation_freq" : 0.3}
+    expected = aggregated(model_class, parameter_values, 40,
+                          founders_analysis, 1)
+    assert all(len(df) > 0 for df in expected)
+    assert_like(aggregated(model_class, parameter_values, 40,
+                           FoundersAggregator(), 1, True), expected)
+
+
+def test_get_aggregator():
+    with pytest.raises(TypeError):
+        AgentAggregator()
+    assert isinstance(get_aggregator(len), DataFrameAggregator)
+    aggregator = FoundersAggregator()
+    assert get_aggregator(aggregator) is aggregator
+    assert get_aggregator(None) is None
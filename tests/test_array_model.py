@@ -0,0 +1,63 @@
+'''
+The array engine must simulate the same model as the agent engine.
+The two draw their randomness differently, so the runs are compared
+through the mean phage and bacteria counts over many seeds.
+'''
+import numpy as np
+import pandas as pd
+import pytest
+
+from rm_abm.rm_abm import BaseModel, TradeOff
+from rm_abm.array_model import get_array_model
+from rm_abm.datacollection import ColumnarDataCollector
+from rm_abm import parameters
+
+SEEDS = range(20)
+STEPS = 40
+
+
+def mean_counts(model_class, **kwargs):
+    '''The mean over the steps of the phage and bacteria counts of each
+    seeded run'''
+    counts = []
+    for seed in SEEDS:
+        np.random.seed(seed)
+        model = model_class(initial_phage=20, phage_mutation_freq=0.1,
+                            phage_mutation_step=0.1, **kwargs)
+        model.run_model(STEPS)
+        df = model.datacollector.get_model_vars_dataframe()
+        counts.append(df[["phage", "bacteria"]].mean().values)
+    return np.array(counts)
+
+
+@pytest.mark.parametrize("model_class", [BaseModel, TradeOff])
+@pytest.mark.parametrize("epi_inheritance", [1, 0.5, -1])
+def test_same_mean_counts(model_class, epi_inheritance):
+    agents = mean_counts(model_class, epi_inheritance=epi_inheritance)
+    arrays = mean_counts(get_array_model(model_class),
+                         epi_inheritance=epi_inheritance)
+    difference = agents.mean(axis=0) - arrays.mean(axis=0)
+    error = np.sqrt(agents.var(axis=0, ddof=1) / len(agents) +
+                    arrays.var(axis=0, ddof=1) / len(arrays))
+    assert (np.abs(difference) < 4 * error).all()
+
+
+def test_same_columns():
+    frames = []
+    for model_class in [BaseModel, get_array_model(BaseModel)]:
+        np.random.seed(0)
+        model = model_class()
+        model.datacollector = ColumnarDataCollector(
+            model_reporters=parameters.model_reporters,
+            agent_reporters=parameters.agent_reporters)
+        model.run_model(5)
+        frames.append(pd.DataFrame(model.datacollector.get_agent_columns()))
+    assert list(frames[0].columns) == list(frames[1].columns)
+    assert (frames[0].dtypes == frames[1].dtypes).all()
+    assert (frames[0].Step.unique() == np.arange(5)).all()
+
+
+def test_get_array_model():
+    array_model = get_array_model(TradeOff)
+    assert issubclass(array_model, TradeOff)
+    assert get_array_model(array_model) is array_model
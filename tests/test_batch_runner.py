@@ -0,0 +1,78 @@
+'''
+ColumnarBatchRunner must give the data frames of the mesa BatchRunner:
+a row per run of model variables, and a row per agent at the end of
+each run, keyed by the parameters, Run and AgentID.
+'''
+from itertools import product
+
+import numpy as np
+import pandas as pd
+
+from rm_abm.rm_abm import BaseModel, Phage
+from rm_abm.batch_runner import ColumnarBatchRunner
+
+parameter_values = {"initial_phage" : [10, 30], "latency" : 0.5}
+model_reporters = {"phage" : lambda m: m.schedule.get_breed_count(Phage),
+                   "steps" : lambda m: m.schedule.steps,
+                   "agents" : lambda m: m.schedule.get_agent_count()}
+agent_reporters = {"breed" : "breed",
+                   "methylation" : lambda a: a.methylation}
+
+
+def mesa_frames(iterations, max_steps):
+    '''The frames of the mesa BatchRunner, run by hand as it runs'''
+    model_rows, agent_rows = [], []
+    run = 0
+    for initial_phage, latency in product([10, 30], [0.5]):
+        for _ in range(iterations):
+            model = BaseModel(initial_phage=initial_phage, latency=latency)
+            while model.running and model.schedule.steps < max_steps:
+                model.step()
+            key = {"initial_phage" : initial_phage, "latency" : latency,
+                   "Run" : run}
+            model_rows.append(dict(key, **{var : reporter(model) for
+                                           var, reporter in
+                                           model_reporters.items()}))
+            for agent in model.schedule.agents.values():
+                agent_rows.append(dict(key, AgentID=agent.unique_id,
+                                       breed=agent.breed,
+                                       methylation=agent.methylation))
+            run += 1
+    return pd.DataFrame(model_rows), pd.DataFrame(agent_rows)
+
+
+def test_like_mesa():
+    np.random.seed(0)
+    expected_model, expected_agents = mesa_frames(2, 6)
+    np.random.seed(0)
+    runner = ColumnarBatchRunner(BaseModel, parameter_values, 2, 6,
+                                 model_reporters, agent_reporters)
+    runner.run_all()
+    pd.testing.assert_frame_equal(runner.get_model_vars_dataframe(),
+                                  expected_model, check_dtype=False)
+    agents = runner.get_agent_vars_dataframe()
+    assert list(agents.columns) == list(expected_agents.columns)
+    assert len(agents) == len(expected_agents)
+    for var in agents.columns:
+        assert [None if pd.isna(v) else v for v in agents[var]] ==\
+            [None if pd.isna(v) else v for v in expected_agents[var]]
+
+
+def test_workers():
+    runs = []
+    for i in range(2):
+        np.random.seed(1)
+        runner = ColumnarBatchRunner(BaseModel, parameter_values, 2, 6,
+                                     model_reporters, agent_reporters,
+                                     workers=2)
+        runner.run_all()
+        runs.append((runner.get_model_vars_dataframe(),
+                     runner.get_agent_vars_dataframe()))
+    models, agents = runs[0]
+    assert models["Run"].tolist() == [0, 1, 2, 3]
+    assert models["initial_phage"].tolist() == [10, 10, 30, 30]
+    assert (models["steps"] == 6).all()
+    assert agents.groupby("Run").size().tolist() == models["agents"].tolist()
+    # seeded from the parent, the workers' runs are reproducible
+    pd.testing.assert_frame_equal(models, runs[1][0])
+    pd.testing.assert_frame_equal(agents, runs[1][1])
@@ -0,0 +1,97 @@
+'''
+burst_progeny must give every lysed bacterium burst_size progeny that
+inherit as each epi_inheritance mode says.
+'''
+import numpy as np
+import pytest
+
+from rm_abm.burst import burst_progeny, progeny_methylation, NO_METHYLATION
+from rm_abm.evolvable import EvolvablePopulation
+
+BURST_SIZE = 3
+
+
+def lysed(n, rng):
+    return {"phage_id" : np.arange(1, n + 1),
+            "phage_genotype" : rng.randint(2, size=n),
+            "phage_methylation" : rng.randint(2, size=n),
+            "phage_affinity" : rng.random_sample((n, 2)),
+            "phage_lineage" : rng.choice([0, -1], n),
+            "bacteria_genotype" : rng.randint(2, size=n),
+            "bacteria_methylation" : rng.randint(2, size=n),
+            "re_degrade_foreign" : np.full(n, 0.9)}
+
+
+def unmutated(matrix):
+    return EvolvablePopulation(matrix, 0, 0).offspring()
+
+
+@pytest.mark.parametrize("epi_inheritance", [1, 0.5, 0, -1, -2])
+def test_progeny(epi_inheritance):
+    cells = lysed(50, np.random.RandomState(0))
+    progeny = burst_progeny(BURST_SIZE, epi_inheritance, unmutated,
+                            **cells)
+    for column in ["genotype", "methylation", "parent", "lineage",
+                   "last_infected"]:
+        assert len(progeny[column]) == 50 * BURST_SIZE
+    repeat = lambda values: np.repeat(values, BURST_SIZE, axis=0)
+    assert (progeny["genotype"] == repeat(cells["phage_genotype"])).all()
+    assert (progeny["parent"] == repeat(cells["phage_id"])).all()
+    assert (progeny["lineage"] == repeat(cells["phage_lineage"])).all()
+    assert (progeny["last_infected"] ==
+            repeat(cells["bacteria_genotype"])).all()
+    assert np.allclose(progeny["affinity"].matrix,
+                       repeat(cells["phage_affinity"]))
+    assert not progeny["affinity"].mutated.any()
+
+
+def test_epigenetic_inheritance():
+    cells = lysed(2000, np.random.RandomState(1))
+    np.random.seed(1)
+    methylation = progeny_methylation(BURST_SIZE, 0.5,
+                                      cells["phage_methylation"],
+                                      cells["bacteria_methylation"],
+                                      cells["re_degrade_foreign"])
+    inherits = methylation != NO_METHYLATION
+    host = np.repeat(cells["bacteria_methylation"], BURST_SIZE)
+    assert (methylation[inherits] == host[inherits]).all()
+    assert abs(inherits.mean() - 0.5) < 0.02
+    always = progeny_methylation(BURST_SIZE, 1, cells["phage_methylation"],
+                                 cells["bacteria_methylation"],
+                                 cells["re_degrade_foreign"])
+    assert (always == host).all()
+
+
+def test_genetic_inheritance():
+    cells = lysed(2000, np.random.RandomState(2))
+    np.random.seed(2)
+    methylation = progeny_methylation(BURST_SIZE, -1,
+                                      cells["phage_methylation"],
+                                      cells["bacteria_methylation"],
+                                      cells["re_degrade_foreign"])
+    parent = np.repeat(cells["phage_methylation"], BURST_SIZE)
+    # flips at 1 - re_degrade_foreign
+    assert abs((methylation != parent).mean() - 0.1) < 0.02
+    assert set(methylation.tolist()) <= {0, 1}
+
+
+def test_random_methylation():
+    cells = lysed(2000, np.random.RandomState(3))
+    np.random.seed(3)
+    methylation = progeny_methylation(BURST_SIZE, -2,
+                                      cells["phage_methylation"],
+                                      cells["bacteria_methylation"],
+                                      cells["re_degrade_foreign"])
+    assert abs(methylation.mean() - 0.5) < 0.02
+
+
+def test_mutation():
+    cells = lysed(100, np.random.RandomState(4))
+    mutate = lambda matrix: EvolvablePopulation(matrix, 0.1, 0.5).offspring()
+    np.random.seed(4)
+    progeny = burst_progeny(BURST_SIZE, 1, mutate, **cells)
+    parents = np.repeat(cells["phage_affinity"], BURST_SIZE, axis=0)
+    changed = ~np.isclose(progeny["affinity"].matrix, parents).all(axis=1)
+    assert changed.any()
+    # a row only changes if a mutation was drawn for it
+    assert not (changed & ~progeny["affinity"].mutated).any()
@@ -0,0 +1,86 @@
+'''
+A run resumed from its snapshot must give what the run gives when it is
+never stopped.
+'''
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from rm_abm.rm_abm import BaseModel, Phage
+from rm_abm.checkpoint import Checkpoint, save_snapshot, load_snapshot
+from rm_abm.timeseries_aggregator import TimeseriesRunner
+
+model_reporters = {"phage" : lambda m: m.schedule.get_breed_count(Phage)}
+agent_reporters = {"breed" : "breed", "methylation" : "methylation"}
+
+
+def make_runner(directory, parameters, max_steps, **kwargs):
+    return TimeseriesRunner(BaseModel, parameters, max_steps, 1,
+                            agent_reporters=agent_reporters,
+                            model_reporters=model_reporters,
+                            checkpoint_dir=str(directory), checkpoint_every=5,
+                            **kwargs)
+
+
+def uninterrupted(directory, seed, parameters, max_steps, **kwargs):
+    np.random.seed(seed)
+    runner = make_runner(directory, parameters, max_steps, **kwargs)
+    frames = next(runner.dataframes())
+    # the snapshot goes once the run is done
+    assert os.listdir(str(directory)) == []
+    return frames
+
+
+def resumed(directory, seed, parameters, max_steps, steps, **kwargs):
+    '''Run the first steps, as a run that is killed, then run it again'''
+    np.random.seed(seed)
+    runner = make_runner(directory, parameters, max_steps, **kwargs)
+    key, kwargs = next(runner.tasks())
+    path = os.path.join(str(directory), "run-0.pkl.gz")
+    checkpoint = Checkpoint(path, 5, runner.checkpoint_key(key))
+    runner.create_model(kwargs).run_model(steps, checkpoint)
+    assert checkpoint.exists()
+    # another process, in another random state, picks the run up
+    np.random.seed(seed + 1)
+    return runner.frames(key, runner.create_model(kwargs))
+
+
+def assert_frames_equal(frames, other):
+    assert frames[0] == other[0]
+    for df, other_df in zip(frames[1:3], other[1:3]):
+        pd.testing.assert_frame_equal(df, other_df)
+
+
+def test_resume(tmp_path):
+    parameters = {"initial_phage" : 20}
+    expected = uninterrupted(tmp_path, 0, parameters, 20)
+    assert_frames_equal(resumed(tmp_path, 0, parameters, 20, 13), expected)
+    assert os.listdir(str(tmp_path)) == []
+
+
+def test_resume_stopped(tmp_path):
+    '''A run that stopped on a step it saved a snapshot at resumes as
+    complete'''
+    parameters = {"initial_phage" : 3, "phage_inactivation_time" : 1}
+    expected = uninterrupted(tmp_path, 3, parameters, 40, on_absorbing="stop")
+    last = expected[2]["Step"].max() # the step it stopped in
+    assert last < 39 and last % 5 == 0
+    assert_frames_equal(resumed(tmp_path, 3, parameters, 40, 40,
+                                on_absorbing="stop"), expected)
+
+
+def test_key(tmp_path):
+    np.random.seed(4)
+    model = BaseModel(initial_phage=5)
+    model.run_model(3)
+    path = str(tmp_path / "snapshot.pkl.gz")
+    save_snapshot(model, path, key=("a", 1))
+    loaded = load_snapshot(path, key=("a", 1))
+    assert loaded.schedule.steps == 3
+    assert loaded.datacollector.model_reporters["phage"] is not None
+    with pytest.raises(ValueError):
+        load_snapshot(path, key=("b", 1))
+    with pytest.raises(ValueError):
+        Checkpoint(path, key=("a", 2)).load()
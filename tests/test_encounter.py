@@ -0,0 +1,82 @@
+'''
+EncounterIndex must find the same bacteria as the IntervalTree the
+model used to build every step.
+'''
+import numpy as np
+import pytest
+
+from rm_abm.encounter import EncounterIndex
+
+intervaltree = pytest.importorskip("intervaltree")
+
+AGENT_WIDTH = 0.0001
+
+
+def make_tree(positions):
+    tree = intervaltree.IntervalTree()
+    for i, pos in enumerate(positions):
+        tree.add(intervaltree.Interval(pos, pos + AGENT_WIDTH, i))
+    return tree
+
+
+def tree_encounters(tree, center, encounter_width):
+    '''The agents found by the IntervalTree queries of Phage.infect'''
+    radius = encounter_width/2
+    if (center - radius) < 0: # if near lower boundary
+        remainder = abs(center - radius)
+        found = tree[0:(center + radius)] | tree[(1 - remainder):1]
+    elif (center + radius) > 1:
+        remainder = (center + radius) - 1
+        found = tree[0:remainder] | tree[(center - radius):1]
+    else:
+        found = tree[(center - radius):(center + radius)]
+    return sorted(i.data for i in found)
+
+
+def index_encounters(positions, centers, encounter_width):
+    index = EncounterIndex(positions, AGENT_WIDTH)
+    indptr, indices = index.query(centers, encounter_width)
+    return [sorted(indices[indptr[i]:indptr[i+1]].tolist())
+            for i in range(len(centers))]
+
+
+@pytest.mark.parametrize("encounter_width", [0.001, 0.01, 0.1, 0.5])
+def test_same_as_interval_tree(encounter_width):
+    rng = np.random.RandomState(0)
+    positions = rng.random_sample(500)
+    centers = rng.random_sample(200)
+    found = index_encounters(positions, centers, encounter_width)
+    tree = make_tree(positions)
+    for center, agents in zip(centers, found):
+        assert agents == tree_encounters(tree, center, encounter_width)
+
+
+def test_wrap_around():
+    positions = np.array([0.001, 0.3, 0.6, 0.9995, 0.99995])
+    centers = np.array([0.002, 0.999, 0.5])
+    found = index_encounters(positions, centers, 0.01)
+    assert found[0] == [0, 3, 4] # wraps below 0
+    assert found[1] == [0, 3, 4] # wraps above 1
+    assert found[2] == []
+    tree = make_tree(positions)
+    for center, agents in zip(centers, found):
+        assert agents == tree_encounters(tree, center, 0.01)
+
+
+def test_whole_world():
+    positions = np.random.RandomState(1).random_sample(50)
+    found = index_encounters(positions, np.array([0.3]), 1)
+    assert found[0] == list(range(50))
+
+
+def test_pairs():
+    positions = np.random.RandomState(2).random_sample(100)
+    centers = np.random.RandomState(3).random_sample(20)
+    index = EncounterIndex(positions, AGENT_WIDTH)
+    window, agents = index.pairs(centers, 0.05)
+    indptr, indices = index.query(centers, 0.05)
+    assert (agents == indices).all()
+    assert (np.bincount(window, minlength=20) == np.diff(indptr)).all()
+    distance = np.abs(positions[agents] - centers[window])
+    distance = np.minimum(distance, 1 - distance) # around the circle
+    assert (distance <= 0.025 + AGENT_WIDTH).all()
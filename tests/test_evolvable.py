@@ -0,0 +1,96 @@
+'''
+EvolvablePopulation must mutate its rows as EvolvableVector mutates a
+single vector, and the trade-off projection of a population must be
+that of each of its rows.
+'''
+import numpy as np
+
+from rm_abm.evolvable import (EvolvableVector, EvolvablePopulation,
+                              EvolvableVectorConstrained,
+                              EvolvablePopulationConstrained,
+                              get_tradeoff_projection)
+
+
+def test_population_mutation():
+    matrix = np.tile([0.5, 0.5], (20000, 1))
+    np.random.seed(0)
+    offspring = EvolvablePopulation(matrix, 0.1, 0.2).offspring()
+    steps = offspring.matrix - matrix
+    assert np.isin(np.round(steps, 10), [-0.1, 0, 0.1]).all()
+    # each entry mutates with probability 0.2, in either direction
+    assert abs((steps != 0).mean() - 0.2) < 0.01
+    assert abs(steps[steps != 0].mean()) < 0.01
+    assert (offspring.mutated == (steps != 0).any(axis=1)).all()
+
+
+def test_population_like_vectors():
+    '''The entries move as much as an EvolvableVector's do'''
+    np.random.seed(1)
+    vector = EvolvableVector(np.array([0.3, 0.7]), 0.05, 0.5)
+    vector_steps = np.array([vector.copy().vector - vector.vector
+                             for i in range(5000)])
+    population = EvolvablePopulation(np.tile([0.3, 0.7], (5000, 1)),
+                                     0.05, 0.5)
+    population_steps = population.offspring().matrix - population.matrix
+    assert abs(np.abs(vector_steps).mean() -
+               np.abs(population_steps).mean()) < 0.002
+
+
+def test_constrained_to_unit():
+    matrix = np.array([[0.99, 0.01], [0.0, 1.0]])
+    np.random.seed(2)
+    offspring = EvolvablePopulation(matrix, 0.5, 1).offspring()
+    assert ((offspring.matrix >= 0) & (offspring.matrix <= 1)).all()
+
+
+def test_rows_and_views():
+    population = EvolvablePopulation(np.random.RandomState(3)
+                                     .random_sample((10, 2)), 0.1, 0.5)
+    offspring = population.offspring(rows=[2, 2, 5])
+    assert len(offspring) == 3
+    view = offspring[1]
+    assert isinstance(view, EvolvableVector)
+    # the view shares the population's read-only memory
+    assert np.shares_memory(view.vector, offspring.matrix)
+    assert not offspring.matrix.flags.writeable
+
+
+def test_projection_shared():
+    assert get_tradeoff_projection(2) is get_tradeoff_projection(2)
+    assert get_tradeoff_projection(2) is not get_tradeoff_projection(3)
+    assert not get_tradeoff_projection(2).bounding_line.flags.writeable
+
+
+def test_projection_like_vectors():
+    '''project gives each row what EvolvableVectorConstrained gives
+    the row alone'''
+    projection = get_tradeoff_projection(2)
+    points = np.random.RandomState(4).random_sample((200, 2)) * 1.2 - 0.1
+    points[:50] = points[50:100] # repeated points are projected once
+    projected = projection.project(points)
+    for point, row in zip(points, projected):
+        vector = EvolvableVectorConstrained(point, 0, 0,
+                                            projection.bounding_line)
+        assert np.allclose(vector.vector, row)
+
+
+def test_projection_below_curve():
+    projection = get_tradeoff_projection(2)
+    below = np.array([[0.1, 0.1], [0.2, 0.3]])
+    assert np.allclose(projection.project(below), below)
+    above = np.array([[0.9, 0.9]])
+    on_line = projection.project(above)[0]
+    distance = ((projection.bounding_line - on_line)**2).sum(axis=1)
+    assert np.isclose(distance.min(), 0)
+
+
+def test_constrained_population():
+    projection = get_tradeoff_projection(2)
+    np.random.seed(5)
+    population = EvolvablePopulationConstrained(
+        np.tile([0.5, 0.2], (100, 1)), 0.2, 0.5, projection)
+    offspring = population.offspring()
+    assert np.allclose(offspring.matrix, projection.project(offspring.matrix))
+    view = offspring[0]
+    assert isinstance(view, EvolvableVectorConstrained)
+    assert view.bounding_line is projection.bounding_line
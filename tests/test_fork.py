@@ -0,0 +1,91 @@
+'''
+A clone of a model must run as the model would, apart from the other
+clones, and a spike-in forked from an absorbed burn-in must run.
+'''
+import numpy as np
+import pandas as pd
+import pytest
+
+from rm_abm.rm_abm import TradeOff, TradeOffSpikeIn, Phage
+from rm_abm.array_model import ArrayTradeOff
+from rm_abm.fork import ModelFork, ForkedTimeseriesRunner, spike_in
+from rm_abm.lineage import get_lineage_tracker
+
+
+@pytest.mark.parametrize("model_class", [TradeOff, ArrayTradeOff])
+@pytest.mark.parametrize("on_absorbing", ["stop", "fast_forward"])
+def test_spike_in_after_absorbing(model_class, on_absorbing):
+    np.random.seed(0)
+    # no phage, so the burn-in is absorbed at its first step
+    model = model_class(initial_phage=0, phage_burst_size=10,
+                        on_absorbing=on_absorbing)
+    model.run_model(3)
+    assert model.absorbed
+    forked = spike_in(ModelFork(model).clone(), 0.9, 0)
+    assert forked.running and not forked.absorbed
+    descendents = []
+    for i in range(6):
+        forked.step()
+        descendents.append(get_lineage_tracker(forked).update(forked)
+                           ["descendents"])
+    # the spike-ins infect, burst and are inactivated
+    assert len(set(descendents)) > 1
+
+
+@pytest.mark.parametrize("model_class", [TradeOff, ArrayTradeOff])
+def test_clone_runs_as_original(model_class):
+    np.random.seed(1)
+    model = model_class(initial_phage=20)
+    model.run_model(5)
+    clone = ModelFork(model).clone()
+    model.rng.reset() # as the clone's is
+    state = np.random.get_state()
+    model.run_model(5)
+    np.random.set_state(state)
+    clone.run_model(5)
+    collectors = [model.datacollector, clone.datacollector]
+    pd.testing.assert_frame_equal(*[c.get_model_vars_dataframe()
+                                    for c in collectors])
+    pd.testing.assert_frame_equal(*[c.get_agent_vars_dataframe()
+                                    for c in collectors])
+
+
+def test_clones_independent():
+    np.random.seed(2)
+    model = TradeOff(initial_phage=20)
+    model.run_model(3)
+    fork = ModelFork(model)
+    clones = [fork.clone(), fork.clone()]
+    count = model.schedule.get_breed_count(Phage)
+    spike_in(clones[0], 0.5, 0)
+    clones[0].run_model(3)
+    assert model.schedule.steps == clones[1].schedule.steps == 3
+    assert model.schedule.get_breed_count(Phage) ==\
+        clones[1].schedule.get_breed_count(Phage) == count
+    # the read-only affinity vectors are shared, not copied
+    vectors = {id(p.affinity.vector) for p in
+               model.schedule.agents_by_breed[Phage].values()}
+    assert {id(p.affinity.vector) for p in
+            clones[1].schedule.agents_by_breed[Phage].values()} <= vectors
+
+
+def test_forked_runner():
+    np.random.seed(3)
+    runner = ForkedTimeseriesRunner(
+        TradeOffSpikeIn, {"spike_in_affinity_0" : [0.2, 0.8],
+                          "initial_phage" : 10}, 10, 2, fork_step=4,
+        model_reporters={"phage" : lambda m:
+                         m.schedule.get_breed_count(Phage)})
+    assert [len(tasks) for kwargs, tasks in runner.groups()] == [2, 2]
+    # yielded a burn-in at a time
+    frames = {f[2]["Run"].iloc[0] : f[2] for f in runner.dataframes()}
+    assert [frames[run]["spike_in_affinity_0"].iloc[0] for run in range(4)]\
+        == [0.2, 0.2, 0.8, 0.8]
+    assert all(len(df) == 10 for df in frames.values())
+    # the forks of a burn-in share its steps before fork_step
+    by_run = {run : df["phage"].tolist() for run, df in frames.items()}
+    for first, second in [(0, 2), (1, 3)]:
+        assert by_run[first][:4] == by_run[second][:4]
+        # and the spike-in phage are added at fork_step
+        assert by_run[first][4] > by_run[first][3] or\
+            by_run[second][4] > by_run[second][3]
@@ -0,0 +1,113 @@
+'''
+What HDFWriter writes must read back as it was given, and read_hdf_runs
+give the rows of each writing.
+'''
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("tables")
+
+from rm_abm import timeseries_runner
+from rm_abm.rm_abm import BaseModel
+from rm_abm.hdf_functions import (HDFWriter, read_hdf_runs, write_to_hdf,
+                                  compact_dtypes)
+
+
+def agent_frame(run, n=6, methylation=0):
+    rng = np.random.RandomState(run)
+    return pd.DataFrame({"Run" : run, "Step" : np.arange(n) // 2,
+                         "AgentID" : np.arange(n) + 100 * run,
+                         "breed" : ["Phage", "Bacteria"] * (n // 2),
+                         "methylation" : [methylation] * n,
+                         "affinity_0" : rng.random_sample(n)})
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / "out.h5")
+    frames = [agent_frame(0), agent_frame(1, methylation=None),
+              agent_frame(2, 4, methylation=1)]
+    with HDFWriter(path, "agents") as writer:
+        for df in frames:
+            writer.append(df)
+    stored = pd.read_hdf(path, "agents")
+    expected = pd.concat(frames, ignore_index=True)
+    assert stored.dtypes["affinity_0"] == np.float64
+    assert stored.dtypes["methylation"] == np.float64 # None is nan
+    assert (stored["affinity_0"].values == expected["affinity_0"]).all()
+    assert np.array_equal(stored["methylation"].values,
+                          pd.to_numeric(expected["methylation"]).values
+                          .astype(float), equal_nan=True)
+    for col in ["Run", "Step", "AgentID", "breed"]:
+        assert stored[col].tolist() == expected[col].tolist()
+    # data columns can be selected on
+    selected = pd.read_hdf(path, "agents", where="Run == 1 & breed == 'Phage'")
+    assert selected["AgentID"].tolist() == [100, 102, 104]
+
+
+def test_runs(tmp_path):
+    path = str(tmp_path / "out.h5")
+    write_to_hdf(path, agent_frame(0), "agents", hash_id="a")
+    write_to_hdf(path, agent_frame(1, 4), "agents", hash_id="b")
+    runs = read_hdf_runs(path, "agents")
+    assert runs.to_dict("records") == [{"hash" : "a", "start" : 0, "stop" : 6},
+                                       {"hash" : "b", "start" : 6,
+                                        "stop" : 10}]
+    assert len(pd.read_hdf(path, "agents")) == 10
+
+
+def test_buffer_rows(tmp_path):
+    path = str(tmp_path / "out.h5")
+    with HDFWriter(path, "agents", buffer_rows=10) as writer:
+        writer.append(agent_frame(0))
+        assert writer.rows == 0
+        writer.append(agent_frame(1))
+        assert writer.rows == 12 and writer.buffered_rows == 0
+        writer.append(agent_frame(2))
+    assert len(pd.read_hdf(path, "agents")) == 18
+
+
+def test_float32(tmp_path):
+    path = str(tmp_path / "out.h5")
+    df = agent_frame(0)
+    write_to_hdf(path, df, "agents", float_dtype=np.float32)
+    stored = pd.read_hdf(path, "agents")
+    assert stored.dtypes["affinity_0"] == np.float32
+    assert np.allclose(stored["affinity_0"], df["affinity_0"], atol=1e-7)
+    dtypes = compact_dtypes(df, np.float32, exact=["affinity_0"])
+    assert dtypes["affinity_0"] == np.float64
+    assert dtypes["Step"] == np.int32
+
+
+def test_missing_ints(tmp_path):
+    path = str(tmp_path / "out.h5")
+    missing = agent_frame(1).astype({"Step" : object})
+    missing.loc[0, "Step"] = None
+    with pytest.raises(ValueError):
+        with HDFWriter(path, "agents") as writer:
+            writer.append(agent_frame(0))
+            writer.flush()
+            writer.append(missing)
+    # the store is closed, with the rows written before
+    assert len(pd.read_hdf(path, "agents")) == 6
+
+
+def test_timeseries_runner(tmp_path, monkeypatch):
+    monkeypatch.setattr(timeseries_runner, "log_progress", lambda s: s)
+    path = str(tmp_path / "out.h5")
+    arguments = (BaseModel, {"initial_phage" : [5, 10]}, 4, 1)
+    agent_reporters = {"breed" : "breed", "methylation" : "methylation"}
+    np.random.seed(0)
+    expected = timeseries_runner.timeseries_runner(
+        *arguments, agent_reporters=agent_reporters)
+    np.random.seed(0)
+    timeseries_runner.timeseries_runner(*arguments,
+                                        agent_reporters=agent_reporters,
+                                        hdf=(path, "agents"), chunksize=50)
+    stored = pd.read_hdf(path, "agents")
+    assert len(read_hdf_runs(path, "agents")) == 1
+    assert stored["breed"].tolist() == expected["breed"].tolist()
+    for col in expected.columns.drop("breed"):
+        assert np.array_equal(stored[col].values.astype(float),
+                              pd.to_numeric(expected[col]).values.astype(float),
+                              equal_nan=True)
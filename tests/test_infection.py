@@ -0,0 +1,73 @@
+'''
+resolve_infections must give each bacterium at most one phage, as the
+phage acting one at a time did.
+'''
+import numpy as np
+
+from rm_abm.infection import choose_targets, resolve_infections
+from rm_abm.random_stream import RandomStream
+
+
+def random_encounters(rng, n_phage, n_bacteria, n_encounters):
+    window = rng.randint(n_phage, size=n_encounters)
+    encountered = rng.randint(n_bacteria, size=n_encounters)
+    return window, encountered
+
+
+def test_resolve_infections():
+    rng = np.random.RandomState(0)
+    for trial in range(50):
+        window, encountered = random_encounters(rng, 30, 20, 100)
+        probs = rng.random_sample(len(window))
+        infected = rng.random_sample(20) < 0.3
+        dead, infecting, targets = resolve_infections(window, encountered,
+                                                      probs, infected,
+                                                      RandomStream())
+        # every phage that reaches a target dies, infecting or not
+        assert set(infecting) <= set(dead)
+        assert len(set(targets)) == len(targets)
+        assert not infected[targets].any()
+        # each infection is one of the phage's encounters
+        pairs = set(zip(window.tolist(), encountered.tolist()))
+        assert set(zip(infecting.tolist(), targets.tolist())) <= pairs
+
+
+def test_certain_infections():
+    window = np.array([0, 1, 2, 2])
+    encountered = np.array([0, 1, 2, 2])
+    infected = np.array([False, True, False])
+    dead, infecting, targets = resolve_infections(window, encountered,
+                                                  np.ones(4), infected)
+    assert sorted(dead) == [0, 1, 2]
+    # phage 1 reached an infected bacterium and dies without infecting
+    assert sorted(zip(infecting.tolist(), targets.tolist())) ==\
+        [(0, 0), (2, 2)]
+
+
+def test_first_phage_wins():
+    '''Two phage going for one bacterium each infect half the time'''
+    window = np.array([0, 1])
+    encountered = np.array([0, 0])
+    np.random.seed(1)
+    winners = []
+    for trial in range(2000):
+        dead, infecting, targets = resolve_infections(
+            window, encountered, np.ones(2), np.array([False]))
+        assert sorted(dead) == [0, 1] and len(infecting) == 1
+        winners.append(infecting[0])
+    assert abs(np.mean(winners) - 0.5) < 0.05
+
+
+def test_choose_targets():
+    '''A phage chooses among its successful encounters uniformly'''
+    window = np.zeros(4, dtype=int)
+    encountered = np.arange(4)
+    probs = np.array([1, 1, 0, 1])
+    np.random.seed(2)
+    counts = np.zeros(4)
+    for trial in range(3000):
+        chosen, target = choose_targets(window, encountered, probs)
+        assert chosen.tolist() == [0]
+        counts[target[0]] += 1
+    assert counts[2] == 0
+    assert (np.abs(counts[[0, 1, 3]] / 3000 - 1/3) < 0.05).all()
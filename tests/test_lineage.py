@@ -0,0 +1,104 @@
+'''
+The lineage tags must mark the descendents of the spike-ins, and the
+lineage reporters give what get_manipulated_descendents finds in the
+agent data. LineageIndex must find what scanning the data once per
+generation finds.
+'''
+import numpy as np
+import pandas as pd
+import pytest
+
+from rm_abm import parameters
+from rm_abm.rm_abm import SpikeIn, TradeOffSpikeIn
+from rm_abm.datacollection import ColumnarDataCollector
+from rm_abm.helper_functions import (get_manipulated_descendents,
+                                     get_lineage_descendents,
+                                     get_descendents, get_all_founders)
+from rm_abm.lineage import SPIKE_IN_LINEAGE, FOUNDING_LINEAGE, LineageIndex
+
+agent_reporters = dict(parameters.agent_reporters,
+                       lineage=lambda a: getattr(a, "lineage", None))
+
+
+def spike_in_run(model_class, seed, steps=20):
+    np.random.seed(seed)
+    model = model_class(initial_phage=10, spike_in_affinity_0=0.7,
+                        phage_mutation_step=0.1, phage_mutation_freq=0.1)
+    model.datacollector = ColumnarDataCollector(
+        parameters.lineage_model_reporters, agent_reporters)
+    model.run_model(steps)
+    agents = model.datacollector.get_agent_vars_dataframe().reset_index()
+    models = model.datacollector.get_model_vars_dataframe()
+    models["Step"] = range(len(models))
+    return model, agents, models
+
+
+@pytest.mark.parametrize("model_class", [SpikeIn, TradeOffSpikeIn])
+def test_tracker(model_class):
+    model, agents, models = spike_in_run(model_class, 0)
+    expected = get_manipulated_descendents(agents)
+    tracked = get_lineage_descendents(models)[expected.columns]
+    assert expected.descendents[0] > 0
+    assert np.allclose(tracked.values.astype(float),
+                       expected.values.astype(float), equal_nan=True)
+
+
+def test_tags():
+    model, agents, models = spike_in_run(SpikeIn, 1)
+    phage = agents[agents.breed == "Phage"]
+    spike_ins = phage.AgentID.isin(get_descendents(agents, -1))
+    assert spike_ins.any() and not spike_ins.all()
+    assert (phage.lineage[spike_ins] == SPIKE_IN_LINEAGE).all()
+    assert (phage.lineage[~spike_ins] == FOUNDING_LINEAGE).all()
+
+
+def scanned_descendents(data, ids):
+    '''get_descendents, scanning the data once per generation'''
+    lineage_ids = list(ids)
+    descendents = data[data.parent.isin(lineage_ids)]
+    while descendents.shape[0] > 0:
+        child_ids = list(descendents.AgentID)
+        lineage_ids = lineage_ids + child_ids
+        descendents = data[data.parent.isin(child_ids)]
+    return set(lineage_ids)
+
+
+def scanned_founders(experiment, meth):
+    '''The IDs get_all_founders finds, walking up from each agent'''
+    invaders = experiment[(experiment.breed == "Phage") &
+                          (experiment.methylation == meth)]
+    parents = dict(zip(invaders.AgentID, invaders.parent))
+    final = invaders[invaders.Step == invaders.Step.max()].AgentID
+    founders = set()
+    for invader in final:
+        parent = parents[invader]
+        while parent in parents:
+            parent = parents[parent]
+        founders.add(parent)
+    return founders
+
+
+def test_index_small():
+    # -1 <- 1 <- 2 <- 4, 1 <- 3, and 7 <- 8 where 7 is not an agent
+    data = pd.DataFrame({"AgentID" : [1, 2, 3, 4, 8, 1, 50],
+                         "parent" : [-1, 1, 1, 2, 7, -1, None]})
+    index = LineageIndex(data)
+    assert set(index.descendents([1]).tolist()) == {1, 2, 3, 4}
+    assert set(index.descendents([-1]).tolist()) == {-1, 1, 2, 3, 4}
+    assert set(index.descendents([7, 99]).tolist()) == {7, 8, 99}
+    assert set(index.descendents([4]).tolist()) == {4}
+    assert index.nearest_ancestors([4, 3, 8], [1, 2, 4]).tolist() ==\
+        [-1, -1, 7]
+    assert index.nearest_ancestors([4, 3, 8], [2, 4]).tolist() == [1, 1, 7]
+
+
+@pytest.mark.parametrize("seed", [0, 1])
+def test_index_like_scans(seed):
+    model, agents, models = spike_in_run(SpikeIn, seed, 30)
+    for ids in [{-1}, set(agents.AgentID[:5])]:
+        assert get_descendents(agents, ids) == scanned_descendents(agents, ids)
+    assert get_descendents(agents, -1) == scanned_descendents(agents, [-1])
+    for meth in [0, 1]:
+        founders = get_all_founders(agents, meth)
+        expected = scanned_founders(agents, meth)
+        assert set(founders.AgentID) == expected & set(agents.AgentID)
@@ -0,0 +1,52 @@
+'''
+RunningStats must give the summaries of all the values it was given,
+however they were batched and merged, and the affinity reporters what
+get_population_means finds in the agent data.
+'''
+import numpy as np
+import pytest
+
+from rm_abm import parameters
+from rm_abm.rm_abm import BaseModel
+from rm_abm.array_model import ArrayBaseModel
+from rm_abm.datacollection import ColumnarDataCollector
+from rm_abm.helper_functions import get_population_means
+from rm_abm.online_stats import RunningStats, affinity_reporters
+
+
+def test_running_stats():
+    values = np.random.RandomState(0).normal(3, 2, size=1000)
+    stats = RunningStats()
+    for batch in np.array_split(values[:600], 7):
+        stats.update(batch)
+    other = RunningStats().update(values[600:]).update([])
+    summary = stats.merge(other).summary()
+    assert stats.n == 1000
+    assert np.isclose(summary["mean"], values.mean())
+    assert np.isclose(summary["std"], values.std(ddof=1))
+    assert summary["min"] == values.min() and summary["max"] == values.max()
+    assert np.isnan(RunningStats().summary()["mean"])
+    assert np.isnan(RunningStats().update([1.0]).std)
+
+
+@pytest.mark.parametrize("model_class", [BaseModel, ArrayBaseModel])
+def test_like_population_means(model_class):
+    np.random.seed(1)
+    model = model_class(initial_phage=30, initial_fraction_p_m1=0.5,
+                        phage_mutation_step=0.1, phage_mutation_freq=0.2)
+    reporters = dict(affinity_reporters(),
+                     **affinity_reporters(by="methylation"))
+    model.datacollector = ColumnarDataCollector(reporters,
+                                                parameters.agent_reporters)
+    model.run_model(15)
+    agents = model.datacollector.get_agent_vars_dataframe().reset_index()
+    reported = model.datacollector.get_model_vars_dataframe()
+    names = ["pop_mean", "pop_std", "pop_median", "pop_max", "pop_min"]
+    for methylation, suffix in [("both", ""), (0, "_methylation_0"),
+                                (1, "_methylation_1")]:
+        expected = get_population_means(agents, [], methylation)
+        assert len(expected) > 0
+        steps = expected.Step.values
+        for name in names:
+            assert np.allclose(reported[name + suffix].values[steps],
+                               expected[name].values, equal_nan=True)
@@ -0,0 +1,70 @@
+'''
+run_in_pool must give what calling the tasks in turn gives, each seeded
+from the parent's random state, with the Pool fallback too.
+'''
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from rm_abm import parallel
+from rm_abm.rm_abm import BaseModel, Phage
+from rm_abm.timeseries_aggregator import TimeseriesRunner
+
+
+class Shared(object):
+    def __init__(self):
+        self.offset = lambda x: x + 100 # can't be pickled
+
+    def draw(self, task):
+        return self.offset(task), np.random.randint(1000), random.random()
+
+
+def serial(shared, method_name, tasks):
+    '''The results of the tasks, seeded as the workers seed them'''
+    seeds = np.random.randint(2**31 - 1, size=len(tasks)).tolist()
+    results = []
+    for seed, task in zip(seeds, tasks):
+        np.random.seed(seed)
+        random.seed(seed)
+        results.append(getattr(shared, method_name)(task))
+    return results
+
+
+@pytest.fixture(params=["executor", "pool"])
+def pool(request, monkeypatch):
+    if request.param == "pool":
+        monkeypatch.setattr(parallel, "executor_results",
+                            parallel.pool_results)
+
+
+def test_like_serial(pool):
+    tasks = list(range(10))
+    np.random.seed(0)
+    expected = serial(Shared(), "draw", tasks)
+    np.random.seed(0)
+    assert list(parallel.run_in_pool(Shared(), "draw", tasks, 2, 3)) ==\
+        expected
+    np.random.seed(0)
+    unordered = parallel.run_in_pool(Shared(), "draw", tasks, 3,
+                                     ordered=False)
+    assert sorted(unordered) == sorted(expected)
+    assert parallel._shared is None
+
+
+def test_dataframes(pool):
+    runner = TimeseriesRunner(BaseModel, {"initial_phage" : [10, 20]}, 5, 2,
+                              agent_reporters={"breed" : "breed"},
+                              model_reporters={"phage" : lambda m:
+                                  m.schedule.get_breed_count(Phage)})
+    tasks = [(key, kwargs, False) for key, kwargs in runner.tasks()]
+    np.random.seed(1)
+    expected = serial(runner, "run_task", tasks)
+    np.random.seed(1)
+    frames = list(runner.dataframes(workers=2))
+    assert len(frames) == len(expected) == 4
+    for ours, theirs in zip(frames, expected):
+        assert ours[0] == theirs[0]
+        for df, other in zip(ours[1:3], theirs[1:3]):
+            pd.testing.assert_frame_equal(df, other)
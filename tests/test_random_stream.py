@@ -0,0 +1,78 @@
+'''
+RandomStream must give the draws of the numpy.random functions it
+stands in for, reproducibly under np.random.seed.
+'''
+import numpy as np
+
+from rm_abm.random_stream import RandomStream
+
+
+def test_seeded():
+    draws = []
+    for i in range(2):
+        np.random.seed(0)
+        stream = RandomStream(block_size=16)
+        draws.append([stream.random() for j in range(40)] +
+                     stream.random(30).tolist())
+    assert draws[0] == draws[1]
+
+
+def test_blocks():
+    '''Draws continue across blocks in the order NumPy made them'''
+    np.random.seed(1)
+    stream = RandomStream(block_size=8)
+    draws = [stream.random() for j in range(5)] + stream.random(3).tolist()
+    np.random.seed(1)
+    assert np.allclose(draws, np.random.random_sample(8))
+    # larger than a block, straight from NumPy
+    assert stream.random(100).shape == (100,)
+    assert stream.random((2, 3)).shape == (2, 3)
+
+
+def test_reset():
+    np.random.seed(2)
+    stream = RandomStream(block_size=8)
+    first = stream.random()
+    stream.reset()
+    np.random.seed(2)
+    assert stream.random() == first
+
+
+def test_bernoulli():
+    np.random.seed(3)
+    stream = RandomStream()
+    assert stream.bernoulli(0) == 0 and stream.bernoulli(1) == 1
+    assert abs(np.mean([stream.bernoulli(0.3) for i in range(20000)]) -
+               0.3) < 0.01
+    p = np.array([0.1, 0.9])
+    assert abs(stream.bernoulli(np.tile(p, 10000)).reshape(-1, 2)
+               .mean(axis=0) - p).max() < 0.01
+    assert abs(stream.binomial(1, 0.6, 20000).mean() - 0.6) < 0.01
+
+
+def test_choice():
+    np.random.seed(4)
+    stream = RandomStream()
+    draws = stream.choice([0, 1, 2], 30000, p=[0.2, 0.5, 0.3])
+    assert abs(np.bincount(draws) / 30000 - [0.2, 0.5, 0.3]).max() < 0.01
+    draws = stream.choice(4, 20000)
+    assert abs(np.bincount(draws) / 20000 - 0.25).max() < 0.01
+    assert stream.choice([5, 6], p=[0, 1]) == 6
+
+
+def test_permutation():
+    np.random.seed(5)
+    stream = RandomStream()
+    permutation = stream.permutation(50)
+    assert sorted(permutation.tolist()) == list(range(50))
+    assert permutation.tolist() != list(range(50))
+
+
+def test_own_source():
+    '''A stream with its own RandomState leaves NumPy's alone'''
+    np.random.seed(6)
+    expected = np.random.random_sample()
+    np.random.seed(6)
+    stream = RandomStream(source=np.random.RandomState(0))
+    stream.random(10)
+    assert np.random.random_sample() == expected
@@ -0,0 +1,122 @@
+'''
+What a ResultSink writes must load back with load_results, sliced by
+partition, commit, column and value.
+'''
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pq = pytest.importorskip("pyarrow.parquet")
+
+from rm_abm import timeseries_runner
+from rm_abm.rm_abm import BaseModel
+from rm_abm.result_sink import ResultSink, load_results
+
+
+def results(run, mutation, n=8):
+    rng = np.random.RandomState(run)
+    return pd.DataFrame({"Run" : run, "mutation" : mutation,
+                         "Step" : np.arange(n),
+                         "breed" : ["Phage", "Bacteria"] * (n // 2),
+                         "methylation" : [0, None] * (n // 2),
+                         "affinity_0" : rng.random_sample(n)})
+
+
+def by_rows(df):
+    return df.sort_values(["Run", "Step"]).reset_index(drop=True)
+
+
+@pytest.fixture
+def sweep(tmp_path):
+    '''Two writers of one commit, as two scripts of a sweep, and one
+    of another commit'''
+    root = str(tmp_path)
+    frames = {"abc" : [], "def" : []}
+    for commit, name, runs in [("abc", "first", [0, 1]),
+                               ("abc", "second", [2, 3]),
+                               ("def", "first", [4])]:
+        with ResultSink(root, "sweep", commit, ["mutation"], name,
+                        row_group_size=4) as sink:
+            for run in runs:
+                df = results(run, [0.1, 0.25][run % 2])
+                sink.write(df)
+                frames[commit].append(df)
+    return root, {commit : pd.concat(dfs, ignore_index=True)
+                  for commit, dfs in frames.items()}
+
+
+def test_round_trip(sweep):
+    root, frames = sweep
+    loaded = load_results(root, "sweep", "abc")
+    expected = frames["abc"]
+    assert set(loaded.columns) == set(expected.columns) | {"analysis",
+                                                           "commit"}
+    assert (loaded["commit"] == "abc").all()
+    loaded = by_rows(loaded)[expected.columns]
+    assert loaded["mutation"].tolist() == expected["mutation"].tolist()
+    assert loaded["breed"].tolist() == expected["breed"].tolist()
+    assert (loaded["affinity_0"].values == expected["affinity_0"]).all()
+    # None in a numeric column is nan
+    assert loaded["methylation"].dtype == np.float64
+    assert loaded["methylation"].isnull().sum() == len(loaded) // 2
+    assert len(load_results(root, "sweep")) == 40
+    assert len(load_results(root, "other")) == 0
+
+
+def test_layout(sweep):
+    root, frames = sweep
+    path = os.path.join(root, "analysis=sweep", "commit=abc", "mutation=0.25")
+    assert sorted(os.listdir(path)) == ["first.parquet", "second.parquet"]
+    parquet = pq.ParquetFile(os.path.join(path, "first.parquet"))
+    # the partition column is left out, and row groups are of 4 rows
+    assert "mutation" not in parquet.schema_arrow.names
+    assert parquet.num_row_groups == 2
+
+
+def test_where(sweep):
+    root, frames = sweep
+    loaded = load_results(root, "sweep", "abc", mutation=0.25)
+    assert sorted(set(loaded["Run"])) == [1, 3]
+    loaded = load_results(root, "sweep", columns=["Run", "affinity_0"],
+                          mutation=[0.1], Step=[0, 1], breed="Phage")
+    assert list(loaded.columns) == ["Run", "affinity_0"]
+    expected = pd.concat(frames.values())
+    expected = expected[(expected.mutation == 0.1) &
+                        expected.Step.isin([0, 1]) &
+                        (expected.breed == "Phage")]
+    assert len(expected) > 0
+    assert sorted(loaded["Run"]) == sorted(expected["Run"])
+    assert np.allclose(sorted(loaded["affinity_0"]),
+                       sorted(expected["affinity_0"]))
+
+
+def test_missing_partition(tmp_path):
+    with ResultSink(str(tmp_path), "sweep", "abc", ["latency"]) as sink:
+        with pytest.raises(KeyError):
+            sink.write(results(0, 0.1))
+
+
+def test_timeseries_runner(tmp_path, monkeypatch):
+    monkeypatch.setattr(timeseries_runner, "log_progress", lambda s: s)
+    arguments = (BaseModel, {"initial_phage" : [5, 10]}, 4, 1)
+    agent_reporters = {"breed" : "breed", "methylation" : "methylation"}
+    np.random.seed(0)
+    expected = timeseries_runner.timeseries_runner(
+        *arguments, agent_reporters=agent_reporters)
+    np.random.seed(0)
+    with ResultSink(str(tmp_path), "runs", "abc", ["initial_phage"]) as sink:
+        timeseries_runner.timeseries_runner(*arguments,
+                                            agent_reporters=agent_reporters,
+                                            sink=sink)
+    loaded = load_results(str(tmp_path), "runs", columns=list(expected))
+    loaded = loaded.sort_values(["Run", "Step", "AgentID"])
+    expected = expected.sort_values(["Run", "Step", "AgentID"])
+    assert len(loaded) == len(expected)
+    assert loaded["breed"].tolist() == expected["breed"].tolist()
+    assert loaded["initial_phage"].tolist() ==\
+        expected["initial_phage"].tolist()
+    assert np.array_equal(loaded["methylation"].values.astype(float),
+                          pd.to_numeric(expected["methylation"]).values
+                          .astype(float), equal_nan=True)
@@ -0,0 +1,97 @@
+'''
+The agent-based models in rm_abm.py.
+'''
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from rm_abm.rm_abm import BaseModel, SpikeIn, Phage, Bacteria
+from rm_abm.lineage import SPIKE_IN_LINEAGE
+
+
+def test_compact_agents():
+    np.random.seed(0)
+    model = BaseModel()
+    for breed in [Phage, Bacteria]:
+        agent = next(iter(model.schedule.agents_by_breed[breed].values()))
+        assert not hasattr(agent, "__dict__")
+    phage = next(iter(model.schedule.agents_by_breed[Phage].values()))
+    phage.methylation = None
+    assert phage.methylation is None
+    phage.methylation = 0
+    assert phage.methylation == 0
+
+
+def test_unmutated_progeny_share_affinity():
+    np.random.seed(1)
+    model = BaseModel(initial_phage=50, phage_mutation_freq=0)
+    affinities = {id(p.affinity) for p in
+                  model.schedule.agents_by_breed[Phage].values()}
+    model.run_model(10)
+    phage = list(model.schedule.agents_by_breed[Phage].values())
+    assert any(p.parent != 0 for p in phage) # progeny were born
+    # without mutation no new affinity vectors are made
+    assert {id(p.affinity) for p in phage} <= affinities
+    assert not phage[0].affinity.vector.flags.writeable
+
+
+def test_absorbing_counts():
+    '''The live counts of phage in hosts give what scanning gives'''
+    np.random.seed(2)
+    model = SpikeIn(initial_phage=30, spike_in_affinity_0=0.5,
+                    phage_inactivation_time=2)
+    hosting = 0
+    for step in range(30):
+        model.step()
+        hosted = Counter(b.phage.lineage for b in
+                         model.schedule.agents_by_breed[Bacteria].values()
+                         if b.phage is not None)
+        assert {k : v for k, v in model.hosted.items() if v} == hosted
+        hosting += SPIKE_IN_LINEAGE in hosted
+        lineages = Counter(p.lineage for p in
+                           model.schedule.agents_by_breed[Phage].values())
+        assert model.is_absorbing() ==\
+            (not lineages and not hosted)
+        assert model.lineage_extinct(SPIKE_IN_LINEAGE) ==\
+            (not lineages[SPIKE_IN_LINEAGE] and not hosted[SPIKE_IN_LINEAGE])
+    assert hosting # the spike-ins infected
+
+
+def run_absorbing(on_absorbing):
+    np.random.seed(3)
+    model = BaseModel(initial_phage=3, phage_inactivation_time=1,
+                      on_absorbing=on_absorbing)
+    model.run_model(40)
+    return model, model.datacollector.get_model_vars_dataframe()
+
+
+def test_on_absorbing():
+    model, expected = run_absorbing(None)
+    assert not model.absorbed
+    model, stopped = run_absorbing("stop")
+    # the phage die out at step 35, which is the last one collected
+    assert model.absorbed and not model.running
+    assert model.schedule.steps == 35 and len(stopped) == 36
+    pd.testing.assert_frame_equal(stopped, expected.iloc[:36])
+    model, forwarded = run_absorbing("fast_forward")
+    assert model.absorbed and model.schedule.steps == 40
+    # only the bacteria are added from then on, without the phage steps
+    pd.testing.assert_frame_equal(forwarded.iloc[:36], expected.iloc[:36])
+    columns = ["phage", "bacteria"]
+    pd.testing.assert_frame_equal(forwarded[columns], expected[columns])
+    with pytest.raises(ValueError):
+        BaseModel(on_absorbing="sometimes")
+
+
+def test_spike_in_extinct():
+    '''A spike-in run stops once the spike-in lineage is gone, though
+    other phage are left'''
+    np.random.seed(3)
+    model = SpikeIn(initial_phage=30, spike_in_affinity_0=0.05,
+                    on_absorbing="stop")
+    model.run_model(60)
+    assert not model.running and model.schedule.steps < 60
+    assert model.lineage_extinct(SPIKE_IN_LINEAGE)
+    assert not model.absorbed and model.schedule.get_breed_count(Phage) > 0
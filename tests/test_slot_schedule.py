@@ -0,0 +1,81 @@
+'''
+SlotActivationByBreed must behave as a schedule of the agents added and
+not removed, with views that count without scanning.
+'''
+import numpy as np
+
+from rm_abm.slot_schedule import SlotActivationByBreed
+
+
+class Agent(object):
+    def __init__(self, model, unique_id, removes=False):
+        self.model = model
+        self.unique_id = unique_id
+        self.removes = removes
+        self.steps = 0
+
+    def step(self):
+        self.steps += 1
+        self.model.order.append(self.unique_id)
+        if self.removes:
+            self.model.schedule.remove(self)
+
+
+class Other(Agent):
+    pass
+
+
+class Model(object):
+    def __init__(self):
+        self.order = []
+        self.schedule = SlotActivationByBreed(self)
+
+
+def test_add_remove():
+    model = Model()
+    schedule = model.schedule
+    agents = [Agent(model, i) for i in range(1, 11)]
+    for agent in agents:
+        schedule.add(agent)
+    schedule.add(Other(model, 11))
+    for agent in agents[::3]:
+        schedule.remove(agent)
+    assert schedule.get_breed_count(Agent) == 6
+    assert len(schedule.agents_by_breed[Agent]) == 6
+    assert len(schedule.agents) == schedule.get_agent_count() == 7
+    assert sorted(schedule.agents_by_breed[Agent].keys()) ==\
+        [2, 3, 5, 6, 8, 9]
+    assert dict(schedule.agents.items())[11].unique_id == 11
+    # the tombstones are swept out, and the slots renumbered
+    schedule.compact(Agent)
+    slots = schedule.get_slots(Agent)
+    assert None not in slots
+    assert [agent.schedule_slot for agent in slots] == list(range(6))
+
+
+def test_views_are_live():
+    model = Model()
+    schedule = model.schedule
+    view = schedule.agents_by_breed[Agent]
+    values = view.values()
+    assert iter(values) is values # an iterator, not a list
+    assert len(view) == 0
+    schedule.add(Agent(model, 1))
+    assert len(view) == 1
+    assert [agent.unique_id for agent in view.values()] == [1]
+
+
+def test_step_breed():
+    model = Model()
+    schedule = model.schedule
+    for i in range(1, 21):
+        schedule.add(Agent(model, i, removes=(i % 2 == 0)))
+    np.random.seed(0)
+    schedule.step_breed(Agent)
+    # every agent runs once, in a random order
+    assert sorted(model.order) == list(range(1, 21))
+    assert model.order != list(range(1, 21))
+    # the agents that removed themselves are gone
+    assert sorted(schedule.agents_by_breed[Agent].keys()) ==\
+        list(range(1, 21, 2))
+    assert len(schedule.get_slots(Agent)) == 10
@@ -0,0 +1,81 @@
+'''
+The record batches of the runners must hold the collector's agent data,
+with the run key in front, however they are cut.
+'''
+import numpy as np
+import pandas as pd
+import pytest
+
+from rm_abm import timeseries_runner
+from rm_abm.rm_abm import BaseModel
+from rm_abm.datacollection import ColumnarDataCollector, batch_to_df
+from rm_abm.timeseries_aggregator import TimeseriesRunner
+
+agent_reporters = {"breed" : "breed", "methylation" : "methylation",
+                   "genotype" : "genotype"}
+
+
+@pytest.fixture(autouse=True)
+def no_progress_bar(monkeypatch):
+    monkeypatch.setattr(timeseries_runner, "log_progress", lambda s: s)
+
+
+def collected(seed, steps=8, **kwargs):
+    np.random.seed(seed)
+    model = BaseModel(initial_phage=20, **kwargs)
+    model.datacollector = ColumnarDataCollector(agent_reporters=agent_reporters)
+    model.run_model(steps)
+    return model.datacollector
+
+
+def test_batch_to_df():
+    batch = {"Step" : np.array([0, 0, 1]), "x" : np.array([1.0, 2.0, 3.0])}
+    df = batch_to_df(batch, ["Run", "a"], [3, "b"], ["x", "Step"])
+    assert list(df.columns) == ["Run", "a", "x", "Step"]
+    assert df["Run"].tolist() == [3, 3, 3] and df["a"].tolist() == ["b"] * 3
+    assert df["x"].tolist() == [1.0, 2.0, 3.0]
+
+
+def test_batches_cover_the_run():
+    collector = collected(0)
+    whole = collector.get_agent_vars_dataframe().reset_index()
+    for steps_per_batch in [1, 3, None]:
+        batches = list(collector.agent_batches(steps_per_batch))
+        if steps_per_batch == 1:
+            assert len(batches) == 8
+            assert all(len(set(b["Step"])) == 1 for b in batches)
+        df = pd.concat([pd.DataFrame(b) for b in batches], ignore_index=True)
+        pd.testing.assert_frame_equal(df, whole)
+
+
+def test_agent_vars_to_df():
+    runner = TimeseriesRunner(BaseModel, {"initial_phage" : 20}, 8, 1,
+                              agent_reporters=agent_reporters)
+    collector = collected(1)
+    key = [0, 0, 20]
+    df = runner.agent_vars_to_df(collector, key)
+    assert list(df.columns) == ["Run", "Iteration", "initial_phage", "Step",
+                                "AgentID"] + list(agent_reporters)
+    batches = pd.concat(runner.agent_batches(collector, key, 3),
+                        ignore_index=True)
+    pd.testing.assert_frame_equal(batches, df)
+    whole = collector.get_agent_vars_dataframe().reset_index()
+    pd.testing.assert_frame_equal(df[whole.columns], whole)
+
+
+def test_timeseries_runner():
+    np.random.seed(2)
+    df = timeseries_runner.timeseries_runner(
+        BaseModel, {"initial_phage" : 20, "latency" : [0.1, 0.5]}, 6, 2,
+        agent_reporters=agent_reporters)
+    assert list(df.columns) == ["Run", "Iteration", "Step", "AgentID",
+                                "initial_phage", "latency"] +\
+                               list(agent_reporters)
+    assert sorted(set(df["Run"])) == [0, 1, 2, 3]
+    assert set(df.groupby("Run")["latency"].first()) == {0.1, 0.5}
+    # the first run is what its collector collected
+    whole = collected(2, 6, latency=0.1).get_agent_vars_dataframe()\
+                                         .reset_index()
+    first = df[df["Run"] == 0].reset_index(drop=True)
+    pd.testing.assert_frame_equal(first[whole.columns], whole,
+                                  check_dtype=False)
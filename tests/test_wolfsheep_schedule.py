@@ -0,0 +1,54 @@
+'''
+The live counts of the schedules must equal counts made by scanning
+the agents, at every step of a run.
+'''
+import numpy as np
+import pytest
+
+from rm_abm.rm_abm import (BaseModel, Phage, Bacteria, by_methylation,
+                           by_genotype, get_breed_filtered_count)
+from rm_abm.array_model import get_array_model
+from rm_abm.wolfsheep_schedule import RandomActivationByBreed
+
+
+class DictScheduleModel(BaseModel):
+    def make_schedule(self):
+        return RandomActivationByBreed(self)
+
+
+def scanned(model, breed, predicate):
+    return sum(1 for agent in model.schedule.agents_by_breed[breed].values()
+               if predicate(agent))
+
+
+@pytest.mark.parametrize("model_class", [BaseModel, DictScheduleModel,
+                                         get_array_model(BaseModel)])
+def test_counts(model_class):
+    np.random.seed(0)
+    model = model_class(initial_phage=30, initial_fraction_p_m1=0.5,
+                        initial_fraction_p_g1=0.5, epi_inheritance=0.5)
+    for step in range(15):
+        model.step()
+        for breed in [Phage, Bacteria]:
+            for value in [0, 1, None]:
+                filtered = by_methylation(value)
+                assert get_breed_filtered_count(breed, filtered)(model) ==\
+                    scanned(model, breed, filtered)
+            for value in [0, 1]:
+                filtered = by_genotype(value)
+                assert get_breed_filtered_count(breed, filtered)(model) ==\
+                    scanned(model, breed, filtered)
+            assert model.schedule.count(breed) ==\
+                model.schedule.get_breed_count(breed) ==\
+                scanned(model, breed, lambda a: True)
+
+
+def test_register_counter():
+    np.random.seed(1)
+    model = BaseModel(initial_phage=30)
+    model.schedule.register_counter("genotype_1", Bacteria,
+                                    lambda b: b.genotype == 1)
+    for step in range(10):
+        model.step()
+        assert model.schedule.get_counter("genotype_1") ==\
+            scanned(model, Bacteria, lambda b: b.genotype == 1)